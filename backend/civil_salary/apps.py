@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CivilSalaryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'civil_salary'
+
+    def ready(self):
+        import civil_salary.signals
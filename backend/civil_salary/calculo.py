@@ -0,0 +1,65 @@
+import numpy as np
+
+NIVELES_ANTIGUEDAD = ('junior', 'pleno', 'senior')
+CAMPOS_ESCENARIO = ('departamento', 'formacion',
+                    'antiguedad', 'ubicacion', 'actividad')
+
+
+def clasificar_antiguedad(tabla, antiguedad):
+    """
+    Índice en NIVELES_ANTIGUEDAD para cada antigüedad (array), -1 si queda
+    fuera de los rangos ant_*_min/ant_*_max.
+    """
+    ant = np.asarray(antiguedad, dtype=np.float64)
+    return np.select(
+        [(ant <= tabla['ant_junior_min']) |
+         ((tabla['ant_junior_min'] < ant) & (ant <= tabla['ant_junior_max'])),
+         (tabla['ant_pleno_min'] <= ant) & (ant <= tabla['ant_pleno_max']),
+         (tabla['ant_senior_min'] <= ant) & (ant <= tabla['ant_senior_max'])],
+        [0, 1, 2], default=-1)
+
+
+def calcular(tabla, escenarios, niveles=None):
+    """
+    Arancel mensual, por hora y por día de muchos escenarios a la vez.
+    Los factores se buscan en la tabla de incidencias (un dict) y la cadena
+    de multiplicaciones y redondeos se hace sobre vectores, en el mismo
+    orden que el cálculo individual para dar exactamente los mismos valores.
+    Devuelve arrays alineados con `escenarios`. Si ya se conocen los
+    `niveles` de antigüedad (índices en NIVELES_ANTIGUEDAD) no hace falta
+    la antigüedad en años.
+    """
+    if niveles is None:
+        niveles = clasificar_antiguedad(
+            tabla, [e['antiguedad'] for e in escenarios])
+    niveles = np.asarray(niveles)
+    if (niveles < 0).any():
+        raise ValueError("Antigüedad fuera de los rangos configurados")
+
+    # Un factor departamental por departamento, redondeado como siempre
+    ipc_nacional = tabla['ipc_nacional']
+    departamentales = {
+        d: round(tabla[f"fce_{d}"] * (tabla[f"ipc_{d}"] / ipc_nacional), 2)
+        for d in {e['departamento'] for e in escenarios}
+    }
+
+    factor_antiguedad = np.array([
+        tabla[f"ant_{NIVELES_ANTIGUEDAD[n]}_{e['ubicacion'].lower()}"]
+        for n, e in zip(niveles, escenarios)])
+    factor_formacion = np.array(
+        [tabla[f"form_{e['formacion']}"] for e in escenarios])
+    factor_departamental = np.array(
+        [departamentales[e['departamento']] for e in escenarios])
+    factor_actividad = np.array(
+        [tabla[f"actividad_{e['actividad']}"] for e in escenarios])
+
+    mensual = np.round(tabla['salario_mensual_base'] * factor_antiguedad * factor_formacion *
+                       factor_departamental * factor_actividad, 0)
+    hora = np.round(mensual / 240, 0)
+    diario = np.round(hora * 8, 0)
+    return {
+        'nivel_antiguedad': [NIVELES_ANTIGUEDAD[n] for n in niveles],
+        'mensual': mensual,
+        'hora': hora,
+        'diario': diario,
+    }
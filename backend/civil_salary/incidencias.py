@@ -0,0 +1,134 @@
+import threading
+import time
+from bisect import bisect_right
+from types import MappingProxyType
+from django.db import transaction
+from django.utils import timezone
+from .models import IncidenciasLaborales, VersionIncidencias
+from utils.versiones import bump_on_commit, bump_version, ejecutar_tras_commit, get_version
+
+INCIDENCIAS_VERSION_KEY = 'incidencias_version'
+HISTORIAL_VERSION_KEY = 'incidencias_historial_version'
+# Con un cache local por proceso, otro worker podría no ver el cambio de
+# versión; como máximo se sirve una tabla de hace SNAPSHOT_TTL segundos
+SNAPSHOT_TTL = 5 * 60
+
+
+def bump_incidencias_version():
+    return bump_version(INCIDENCIAS_VERSION_KEY)
+
+
+class TablaIncidencias:
+    """Copia inmutable de todas las incidencias: nombre -> valor (float)."""
+
+    def __init__(self, version, filas):
+        self.version = version
+        self.cargada = time.monotonic()
+        self.valores = MappingProxyType(
+            {nombre: float(valor) for nombre, valor in filas})
+        self.formaciones = tuple(self._sufijos('form_'))
+        self.actividades = tuple(self._sufijos('actividad_'))
+
+    def _sufijos(self, prefijo):
+        return [nombre[len(prefijo):] for nombre in self.valores if nombre.startswith(prefijo)]
+
+    def __getitem__(self, nombre):
+        return self.valores[nombre]
+
+
+_tabla = None
+_lock = threading.Lock()
+
+
+def get_incidencias():
+    """
+    Tabla de incidencias del proceso. Solo consulta la base cuando cambia
+    la versión (ver signals.py) o vence SNAPSHOT_TTL; el resto del tiempo
+    calcular un arancel no hace ninguna consulta.
+    """
+    global _tabla
+    version = get_version(INCIDENCIAS_VERSION_KEY)
+    tabla = _tabla
+    if tabla is not None and tabla.version == version and \
+            time.monotonic() - tabla.cargada < SNAPSHOT_TTL:
+        return tabla
+
+    with _lock:
+        if _tabla is tabla:
+            _tabla = cargar_incidencias(version)
+        return _tabla
+
+
+def cargar_incidencias(version=None):
+    return TablaIncidencias(version, IncidenciasLaborales.objects.order_by(
+        'id').values_list('nombre', 'valor'))
+
+
+class HistorialIncidencias:
+    """
+    Todas las versiones de incidencias como intervalos [vigente_desde,
+    siguiente vigente_desde). Encontrar la tabla de una fecha es una
+    búsqueda binaria en memoria, sin consultas.
+    """
+
+    def __init__(self, version, versiones):
+        self.version = version
+        self.cargada = time.monotonic()
+        self.desde = []
+        self.tablas = []
+        for vigente_desde, valores in versiones:
+            self.desde.append(vigente_desde)
+            self.tablas.append(TablaIncidencias(vigente_desde, valores.items()))
+
+    def vigente(self, fecha):
+        # None si la fecha es anterior a la primera versión
+        i = bisect_right(self.desde, fecha) - 1
+        return self.tablas[i] if i >= 0 else None
+
+
+_historial = None
+_lock_historial = threading.Lock()
+
+
+def get_historial():
+    global _historial
+    version = get_version(HISTORIAL_VERSION_KEY)
+    historial = _historial
+    if historial is not None and historial.version == version and \
+            time.monotonic() - historial.cargada < SNAPSHOT_TTL:
+        return historial
+
+    with _lock_historial:
+        if _historial is historial:
+            _historial = HistorialIncidencias(version, VersionIncidencias.objects.order_by(
+                'vigente_desde', 'id').values_list('vigente_desde', 'valores'))
+        return _historial
+
+
+def incidencias_en(fecha):
+    """Tabla de incidencias vigente en `fecha` (datetime), o None."""
+    return get_historial().vigente(fecha)
+
+
+def registrar_version(vigente_desde=None):
+    """
+    Guarda las incidencias actuales como una versión vigente desde
+    `vigente_desde` (por defecto ahora). Sin fecha explícita no se crea
+    nada si los valores son iguales a los de la última versión.
+    """
+    valores = dict(cargar_incidencias().valores)
+    if vigente_desde is None:
+        ultima = VersionIncidencias.objects.order_by(
+            'vigente_desde', 'id').values_list('valores', flat=True).last()
+        if ultima == valores:
+            return None
+    with transaction.atomic():
+        version = VersionIncidencias.objects.create(
+            vigente_desde=vigente_desde or timezone.now(), valores=valores)
+        bump_on_commit(HISTORIAL_VERSION_KEY)
+    return version
+
+
+def registrar_version_tras_commit():
+    # Una versión por transacción, con los valores ya confirmados
+    ejecutar_tras_commit('version_incidencias', registrar_version)
@@ -1,4 +1,5 @@
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from civil_salary.models import IncidenciasLaborales
 
 
@@ -69,14 +70,17 @@ class Command(BaseCommand):
             **incidencia_actividad,
         }
 
-        for incidencia, valor in incidencias.items():
-            if not IncidenciasLaborales.objects.filter(nombre=incidencia).exists():
-                IncidenciasLaborales.objects.create(
-                    nombre=incidencia,
-                    valor=valor
-                )
-                self.stdout.write(self.style.SUCCESS(
-                    f"Incidencia creada: {incidencia}"))
-            else:
-                self.stdout.write(self.style.WARNING(
-                    f"{incidencia} ya existe"))
+        # En una transacción: la matriz y el historial se generan una sola
+        # vez, con la tabla completa
+        with transaction.atomic():
+            for incidencia, valor in incidencias.items():
+                if not IncidenciasLaborales.objects.filter(nombre=incidencia).exists():
+                    IncidenciasLaborales.objects.create(
+                        nombre=incidencia,
+                        valor=valor
+                    )
+                    self.stdout.write(self.style.SUCCESS(
+                        f"Incidencia creada: {incidencia}"))
+                else:
+                    self.stdout.write(self.style.WARNING(
+                        f"{incidencia} ya existe"))
@@ -1,7 +1,34 @@
 import csv
-from django.core.management.base import BaseCommand
+from decimal import Decimal, InvalidOperation
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
+from civil_salary.matriz import regenerar_tras_commit
 from civil_salary.models import Categoria, Nivel, Elemento
+from civil_salary.tarifario import TARIFARIO_VERSION_KEY
+from utils.versiones import bump_on_commit
+
+BATCH_SIZE = 2000
+
+
+def leer_csv(ruta):
+    """
+    {(trabajo, nivel): {detalle: (valor, unidad)}} en el orden del archivo.
+    Si un elemento se repite gana la última fila, como con update_or_create.
+    """
+    filas = {}
+    total = 0
+    with open(ruta, newline="", encoding="utf-8") as csvfile:
+        for linea, row in enumerate(csv.DictReader(csvfile), start=2):
+            try:
+                valor = Decimal(row["valor"].strip())
+            except (InvalidOperation, AttributeError):
+                raise CommandError(
+                    f"Línea {linea}: valor inválido {row['valor']!r}")
+            nivel = filas.setdefault(
+                (row["trabajo"].strip(), row["nivel"].strip()), {})
+            nivel[row["detalle"].strip()] = (valor, row["unidad"].strip())
+            total += 1
+    return filas, total
 
 
 class Command(BaseCommand):
@@ -9,56 +36,88 @@ class Command(BaseCommand):
 
     def add_arguments(self, parser):
         parser.add_argument("--file", type=str, required=True)
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Solo muestra qué se crearía o actualizaría")
 
     def handle(self, *args, **options):
-        ruta = options["file"]
-
-        # Diccionarios para evitar consultas repetidas
-        categorias_cache = {}
-        niveles_cache = {}
-        creados = 0
-
         try:
-            with open(ruta, newline="", encoding="utf-8") as csvfile:
-                reader = csv.DictReader(csvfile)
+            filas, total = leer_csv(options["file"])
+        except (OSError, KeyError) as e:
+            raise CommandError(f"No se pudo leer el CSV: {e}")
+
+        with transaction.atomic():
+            conteos = self.sincronizar(filas, options["dry_run"])
+            if not options["dry_run"]:
+                # Las escrituras por lote no disparan señales
+                bump_on_commit(TARIFARIO_VERSION_KEY)
+                regenerar_tras_commit()
 
-                # Todo se ejecuta en una sola transacción
-                with transaction.atomic():
-                    for row in reader:
-                        trabajo = row["trabajo"].strip()
-                        nivel_nombre = row['nivel'].strip()
-                        detalle = row["detalle"].strip()
-                        valor = row["valor"].strip()
-                        unidad = row["unidad"].strip()
+        prefijo = "[dry-run] " if options["dry_run"] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefijo}{total} filas leídas: {conteos['creados']} elementos creados, "
+            f"{conteos['actualizados']} actualizados, {conteos['sin_cambios']} sin cambios "
+            f"({conteos['categorias']} categorías y {conteos['niveles']} niveles nuevos)."))
 
-                        # 1. Obtener o crear Categoría (Caché local)
-                        if trabajo not in categorias_cache:
-                            obj, _ = Categoria.objects.get_or_create(
-                                nombre=trabajo)
-                            categorias_cache[trabajo] = obj
-                        cat_obj = categorias_cache[trabajo]
+    def sincronizar(self, filas, dry_run):
+        """
+        Compara el CSV con lo que ya existe (una consulta por tabla) y
+        escribe por lotes. Clave natural de un elemento: (nivel, detalle).
+        """
+        conteos = {'categorias': 0, 'niveles': 0,
+                   'creados': 0, 'actualizados': 0, 'sin_cambios': 0}
 
-                        # 2. Obtener o crear Nivel (Caché local combinado)
-                        nivel_key = f"{trabajo}-{nivel_nombre}"
-                        if nivel_key not in niveles_cache:
-                            obj, _ = Nivel.objects.get_or_create(
-                                categoria=cat_obj, nombre=nivel_nombre)
-                            niveles_cache[nivel_key] = obj
-                        niv_obj = niveles_cache[nivel_key]
+        # 1. Categorías por nombre
+        categorias = {}
+        for cat_id, nombre in Categoria.objects.order_by('id').values_list('id', 'nombre'):
+            categorias.setdefault(nombre, cat_id)
+        nuevas = [Categoria(nombre=trabajo)
+                  for trabajo in dict.fromkeys(t for t, _ in filas)
+                  if trabajo not in categorias]
+        conteos['categorias'] = len(nuevas)
+        if not dry_run:
+            for categoria in Categoria.objects.bulk_create(nuevas, batch_size=BATCH_SIZE):
+                categorias[categoria.nombre] = categoria.id
 
-                        # 3. Crear el Elemento
-                        # Usamos update_or_create por si el dato cambió en el CSV
-                        item, created = Elemento.objects.update_or_create(
-                            nivel=niv_obj,
-                            detalle=detalle,
-                            defaults={'valor': valor, 'unidad': unidad}
-                        )
+        # 2. Niveles por (categoría, nombre)
+        niveles = {}
+        for nivel_id, cat_id, nombre in Nivel.objects.filter(
+                categoria_id__in=categorias.values()).order_by('id').values_list(
+                'id', 'categoria_id', 'nombre'):
+            niveles.setdefault((cat_id, nombre), nivel_id)
+        nuevos = [Nivel(categoria_id=categorias.get(trabajo), nombre=nombre)
+                  for trabajo, nombre in filas
+                  if (categorias.get(trabajo), nombre) not in niveles]
+        conteos['niveles'] = len(nuevos)
+        if not dry_run:
+            for nivel in Nivel.objects.bulk_create(nuevos, batch_size=BATCH_SIZE):
+                niveles[(nivel.categoria_id, nivel.nombre)] = nivel.id
 
-                        if created:
-                            creados += 1
+        # 3. Elementos por (nivel, detalle)
+        existentes = {}
+        for elemento in Elemento.objects.filter(nivel_id__in=niveles.values()).order_by('id').only(
+                'id', 'nivel_id', 'detalle', 'valor', 'unidad'):
+            existentes.setdefault((elemento.nivel_id, elemento.detalle), elemento)
 
-            self.stdout.write(self.style.SUCCESS(
-                f"Proceso terminado. Se crearon {creados} elementos nuevos."))
+        crear = []
+        actualizar = []
+        for (trabajo, nombre), elementos in filas.items():
+            nivel_id = niveles.get((categorias.get(trabajo), nombre))
+            for detalle, (valor, unidad) in elementos.items():
+                elemento = existentes.get((nivel_id, detalle)) if nivel_id else None
+                if elemento is None:
+                    crear.append(Elemento(nivel_id=nivel_id, detalle=detalle,
+                                          valor=valor, unidad=unidad))
+                elif elemento.valor != valor or elemento.unidad != unidad:
+                    elemento.valor = valor
+                    elemento.unidad = unidad
+                    actualizar.append(elemento)
+                else:
+                    conteos['sin_cambios'] += 1
 
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f"Error crítico: {e}"))
+        conteos['creados'] = len(crear)
+        conteos['actualizados'] = len(actualizar)
+        if not dry_run:
+            Elemento.objects.bulk_create(crear, batch_size=BATCH_SIZE)
+            Elemento.objects.bulk_update(
+                actualizar, ['valor', 'unidad'], batch_size=BATCH_SIZE)
+        return conteos
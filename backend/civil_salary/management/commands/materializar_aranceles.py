@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+from civil_salary.matriz import regenerar_matriz
+
+
+class Command(BaseCommand):
+    help = "Precalcula la matriz completa de aranceles (mensual, diario y por hora)"
+
+    def handle(self, *args, **options):
+        matriz = regenerar_matriz()
+        if matriz is None:
+            raise CommandError(
+                "No se pudo generar la matriz: faltan incidencias (ver crear_incidencias)")
+        self.stdout.write(self.style.SUCCESS(
+            f"Matriz {matriz.etag[:12]}: {len(matriz.datos['filas'])} combinaciones "
+            f"(generada {matriz.generado:%Y-%m-%d %H:%M})"))
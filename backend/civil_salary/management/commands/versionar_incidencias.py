@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime, parse_date
+from civil_salary.incidencias import registrar_version
+
+
+class Command(BaseCommand):
+    help = "Guarda las incidencias actuales como una versión vigente desde una fecha"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--desde", type=str,
+                            help="Fecha (AAAA-MM-DD o ISO 8601) desde la que rigen; por defecto ahora")
+
+    def handle(self, *args, **options):
+        desde = None
+        if options["desde"]:
+            desde = parse_datetime(options["desde"])
+            if desde is None and parse_date(options["desde"]) is not None:
+                desde = parse_datetime(options["desde"] + "T00:00:00")
+            if desde is None:
+                raise CommandError(f"Fecha inválida: {options['desde']}")
+            if timezone.is_naive(desde):
+                desde = timezone.make_aware(desde)
+
+        version = registrar_version(desde)
+        if version is None:
+            self.stdout.write(self.style.WARNING(
+                "Las incidencias no cambiaron desde la última versión"))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Versión {version.id}: {len(version.valores)} incidencias vigentes "
+            f"desde {version.vigente_desde:%Y-%m-%d %H:%M}"))
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import threading
+import time
+from itertools import product
+from loguru import logger
+from django.db import transaction
+from .calculo import NIVELES_ANTIGUEDAD, calcular, clasificar_antiguedad
+from .incidencias import SNAPSHOT_TTL, cargar_incidencias
+from .models import MatrizAranceles
+from .serializers import EscenarioArancelSerializer
+from .tarifario import cargar_tarifario
+from utils.versiones import bump_version, ejecutar_tras_commit, get_version
+
+MATRIZ_VERSION_KEY = 'matriz_aranceles_version'
+COLUMNAS = ('departamento', 'formacion', 'nivel_antiguedad', 'ubicacion',
+            'actividad', 'mensual', 'diario', 'hora')
+RANGOS_ANTIGUEDAD = tuple(f"ant_{nivel}_{limite}" for nivel in NIVELES_ANTIGUEDAD
+                          for limite in ('min', 'max'))
+
+
+def construir_matriz(tabla):
+    """
+    Todas las combinaciones válidas de la calculadora. La antigüedad en
+    años solo sirve para elegir el nivel, así que la matriz va por nivel y
+    guarda los rangos para clasificar después.
+    """
+    combinaciones = list(product(
+        [d for d, _ in EscenarioArancelSerializer.DEPARTAMENTOS],
+        tabla.formaciones,
+        range(len(NIVELES_ANTIGUEDAD)),
+        [u for u, _ in EscenarioArancelSerializer.UBICACION],
+        tabla.actividades,
+    ))
+    escenarios = [
+        {'departamento': d, 'formacion': f, 'ubicacion': u, 'actividad': a}
+        for d, f, _, u, a in combinaciones]
+    calculado = calcular(tabla, escenarios, niveles=[c[2] for c in combinaciones])
+
+    filas = [
+        [d, f, NIVELES_ANTIGUEDAD[n], u, a, mensual, diario, hora]
+        for (d, f, n, u, a), mensual, diario, hora in zip(
+            combinaciones, calculado['mensual'].tolist(),
+            calculado['diario'].tolist(), calculado['hora'].tolist())
+    ]
+    return {
+        'columnas': list(COLUMNAS),
+        'rangos': {nombre: tabla[nombre] for nombre in RANGOS_ANTIGUEDAD},
+        'filas': filas,
+    }
+
+
+def regenerar_matriz():
+    """
+    Recalcula la matriz desde la base (sin pasar por los caches del
+    proceso) y la guarda solo si cambió. El ETag también cubre el árbol de
+    trabajos, que se escala con la tarifa horaria de cada respuesta.
+    """
+    try:
+        datos = construir_matriz(cargar_incidencias())
+    except KeyError as e:
+        # Tabla de incidencias incompleta (p. ej. a mitad de crear_incidencias)
+        logger.warning(f"Matriz de aranceles sin regenerar, falta la incidencia {e}")
+        return None
+
+    contenido = json.dumps(datos, sort_keys=True, ensure_ascii=False)
+    etag = hashlib.sha256(
+        (contenido + cargar_tarifario().huella).encode()).hexdigest()
+
+    with transaction.atomic():
+        actual = MatrizAranceles.objects.select_for_update().order_by('-id').first()
+        if actual is not None and actual.etag == etag:
+            return actual
+        matriz = MatrizAranceles.objects.create(etag=etag, datos=datos)
+        MatrizAranceles.objects.exclude(id=matriz.id).delete()
+    bump_version(MATRIZ_VERSION_KEY)
+    logger.info(f"Matriz de aranceles regenerada: {len(datos['filas'])} filas")
+    return matriz
+
+
+def regenerar_tras_commit():
+    # Una regeneración por transacción, después de confirmar los cambios
+    ejecutar_tras_commit('matriz_aranceles', regenerar_matriz)
+
+
+class Matriz:
+    """Matriz guardada más un índice por combinación para responder sin consultas."""
+
+    def __init__(self, version, registro):
+        self.version = version
+        self.cargada = time.monotonic()
+        self.etag = registro.etag
+        self.generado = registro.generado
+        self.datos = registro.datos
+        self.indice = {tuple(fila[:5]): fila for fila in registro.datos['filas']}
+
+    def buscar(self, departamento, formacion, antiguedad, ubicacion, actividad):
+        nivel = clasificar_antiguedad(self.datos['rangos'], [antiguedad])[0]
+        if nivel < 0:
+            return None
+        fila = self.indice.get((departamento, formacion, NIVELES_ANTIGUEDAD[nivel],
+                                ubicacion, actividad))
+        return None if fila is None else dict(zip(COLUMNAS, fila))
+
+
+_matriz = None
+_lock = threading.Lock()
+
+
+def get_matriz():
+    """
+    Matriz del proceso; se vuelve a leer cuando cambia la versión o vence
+    SNAPSHOT_TTL. Si todavía no existe ninguna, la genera.
+    """
+    global _matriz
+    version = get_version(MATRIZ_VERSION_KEY)
+    matriz = _matriz
+    if matriz is not None and matriz.version == version and \
+            time.monotonic() - matriz.cargada < SNAPSHOT_TTL:
+        return matriz
+
+    with _lock:
+        if _matriz is matriz:
+            registro = MatrizAranceles.objects.order_by('-id').first() or regenerar_matriz()
+            if registro is None:
+                return None
+            _matriz = Matriz(get_version(MATRIZ_VERSION_KEY), registro)
+        return _matriz
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('civil_salary', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MatrizAranceles',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('etag', models.CharField(max_length=64)),
+                ('datos', models.JSONField()),
+                ('generado', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:43
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def version_inicial(apps, schema_editor):
+    # Las incidencias actuales pasan a ser la primera versión del historial
+    IncidenciasLaborales = apps.get_model('civil_salary', 'IncidenciasLaborales')
+    VersionIncidencias = apps.get_model('civil_salary', 'VersionIncidencias')
+    valores = {nombre: float(valor) for nombre, valor in
+               IncidenciasLaborales.objects.order_by('id').values_list('nombre', 'valor')}
+    if valores:
+        VersionIncidencias.objects.create(
+            vigente_desde=timezone.now(), valores=valores)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('civil_salary', '0002_matrizaranceles'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionIncidencias',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vigente_desde', models.DateTimeField(db_index=True)),
+                ('valores', models.JSONField()),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['vigente_desde', 'id'],
+            },
+        ),
+        migrations.RunPython(version_inicial, migrations.RunPython.noop),
+    ]
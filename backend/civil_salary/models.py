@@ -6,6 +6,20 @@ class IncidenciasLaborales(models.Model):
     valor = models.DecimalField(max_digits=10, decimal_places=5)
 
 
+class VersionIncidencias(models.Model):
+    # Copia de todas las incidencias (nombre -> valor) vigente desde una fecha
+    # hasta la siguiente versión (ver incidencias.py)
+    vigente_desde = models.DateTimeField(db_index=True)
+    valores = models.JSONField()
+    creado = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['vigente_desde', 'id']
+
+    def __str__(self):
+        return f"Incidencias desde {self.vigente_desde:%Y-%m-%d %H:%M}"
+
+
 class Categoria(models.Model):
     nombre = models.CharField(max_length=100)  # Ej: Estructuras, Geotecnia
 
@@ -32,3 +46,13 @@ class Elemento(models.Model):
 
     def __str__(self):
         return f"{self.detalle} ({self.unidad})"
+
+
+class MatrizAranceles(models.Model):
+    # Resultado precalculado de todas las combinaciones (ver matriz.py)
+    etag = models.CharField(max_length=64)
+    datos = models.JSONField()
+    generado = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.etag[:12]} ({self.generado:%Y-%m-%d %H:%M})"
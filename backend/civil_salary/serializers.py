@@ -1,6 +1,12 @@
+from decimal import Decimal
+from itertools import product
+import numpy as np
 from rest_framework import serializers
-from .models import Elemento, IncidenciasLaborales, Categoria, Nivel
-from django.core.cache import cache
+from .models import Elemento, IncidenciasLaborales, Categoria, Nivel, VersionIncidencias
+from .calculo import CAMPOS_ESCENARIO, calcular, clasificar_antiguedad
+from .incidencias import get_incidencias, incidencias_en
+from .tarifario import get_tarifario
+from django.conf import settings
 from django.db import transaction
 
 
@@ -20,7 +26,21 @@ class CategoriaSerializer(serializers.Serializer):
     niveles = NivelSerializer(many=True)  # N niveles
 
 
-class CalculateArancelesSerializer(serializers.Serializer):
+def tabla_para(fecha):
+    """
+    Tabla de incidencias vigente en `fecha` (texto o datetime), o la
+    actual si no se indica fecha.
+    """
+    if fecha in (None, ''):
+        return get_incidencias()
+    tabla = incidencias_en(serializers.DateTimeField().run_validation(fecha))
+    if tabla is None:
+        raise serializers.ValidationError(
+            "No hay incidencias registradas para esa fecha.")
+    return tabla
+
+
+class EscenarioArancelSerializer(serializers.Serializer):
     DEPARTAMENTOS = [
         ('La Paz', 'La Paz'),
         ('Cochabamba', 'Cochabamba'),
@@ -34,15 +54,7 @@ class CalculateArancelesSerializer(serializers.Serializer):
     ]
 
     def get_formacion_choices(self):
-        # Usamos .distinct() por si acaso hay duplicados
-        choices = cache.get('formacion_choices')
-        if not choices:
-            nombres = IncidenciasLaborales.objects.all()
-            choices = [(n.nombre.replace('form_', ''), n.nombre.replace(
-                'form_', '').capitalize()) for n in nombres if n.nombre.startswith('form_')]
-            cache.set('formacion_choices', choices,
-                      timeout=60*60)  # Cache por 1 hora
-        return choices
+        return [(f, f.capitalize()) for f in self.incidencias.formaciones]
 
     UBICACION = [
         ('ciudad', 'Ciudad'),
@@ -55,17 +67,48 @@ class CalculateArancelesSerializer(serializers.Serializer):
         choices=[], write_only=True)
     ubicacion = serializers.ChoiceField(choices=UBICACION, write_only=True)
     actividad = serializers.CharField(write_only=True)
-    mensual = serializers.FloatField(read_only=True)
-    diario = serializers.FloatField(read_only=True)
-    hora = serializers.FloatField(read_only=True)
-
-    trabajos = CategoriaSerializer(many=True, read_only=True)
+    # Coeficientes vigentes en esa fecha en lugar de los actuales
+    fecha = serializers.DateTimeField(required=False, write_only=True)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # Una sola tabla por petición: las opciones y el cálculo usan la misma versión
+        self.incidencias = self.context.get('incidencias') or get_incidencias()
         # Actualizamos las opciones de formación dinámicamente
         self.fields['formacion'].choices = self.get_formacion_choices()
 
+    def run_validation(self, data=serializers.empty):
+        # Con `fecha` se valida y calcula con la versión de ese momento. Los
+        # lotes resuelven la tabla antes y la pasan por el contexto.
+        if 'incidencias' not in self.context and isinstance(data, dict) and data.get('fecha'):
+            try:
+                self.incidencias = tabla_para(data['fecha'])
+            except serializers.ValidationError as e:
+                raise serializers.ValidationError({'fecha': e.detail})
+            self.fields['formacion'].choices = self.get_formacion_choices()
+        return super().run_validation(data)
+
+    def validate_actividad(self, value):
+        if value not in self.incidencias.actividades:
+            raise serializers.ValidationError(
+                f'"{value}" no es una actividad válida.')
+        return value
+
+    def validate_antiguedad(self, value):
+        if clasificar_antiguedad(self.incidencias, [value])[0] < 0:
+            raise serializers.ValidationError(
+                "Antigüedad fuera de los rangos configurados.")
+        return value
+
+
+class CalculateArancelesSerializer(EscenarioArancelSerializer):
+    mensual = serializers.FloatField(read_only=True)
+    diario = serializers.FloatField(read_only=True)
+    hora = serializers.FloatField(read_only=True)
+
+    # Ya serializado por tarifario.py con el formato de CategoriaSerializer
+    trabajos = serializers.JSONField(read_only=True)
+
     def validate(self, data):
         mensual, hora, dia = self.calculate_arancel_mes_dia_hora(data)
 
@@ -73,64 +116,129 @@ class CalculateArancelesSerializer(serializers.Serializer):
         data['hora'] = hora
         data['diario'] = dia
 
-        query_trabajos = Categoria.objects.all()
-        trabajos_data = CategoriaSerializer(query_trabajos, many=True).data
-        for trabajo in trabajos_data:
-            for nivel in trabajo['niveles']:
-                for elemento in nivel['elementos']:
-                    valor_base = float(elemento['valor'])
-                    elemento['valor'] = round(valor_base * hora, 0)
-        data['trabajos'] = trabajos_data
+        data['trabajos'] = get_tarifario().trabajos(hora)
         return super().validate(data)
 
     def calculate_arancel_mes_dia_hora(self, data):
-        # Obtener todos los datos en una sola petición a la base de datos
-        nombres_requeridos = [
-            'salario_mensual_base', 'ipc_nacional',
-            f"fce_{data['departamento']}", f"ipc_{data['departamento']}",
-            f"form_{data['formacion']}", f"actividad_{data['actividad']}",
-            "ant_junior_min", "ant_junior_max",
-            "ant_pleno_min", "ant_pleno_max",
-            "ant_senior_min", "ant_senior_max"
-        ]
-
-        datos = IncidenciasLaborales.objects.filter(
-            nombre__in=nombres_requeridos
-        ).values('nombre', 'valor')
-
-        datos_dict = {item['nombre']: float(item['valor']) for item in datos}
-
-        salario_base = datos_dict['salario_mensual_base']
-        ipc_nacional = datos_dict['ipc_nacional']
-        fce_departamento = datos_dict[f"fce_{data['departamento']}"]
-        ipc_departamento = datos_dict[f"ipc_{data['departamento']}"]
-        factor_formacion = datos_dict[f"form_{data['formacion']}"]
-        factor_tipo_actividad = datos_dict[f"actividad_{data['actividad']}"]
-
-        min_junior = datos_dict["ant_junior_min"]
-        max_junior = datos_dict["ant_junior_max"]
-        min_pleno = datos_dict["ant_pleno_min"]
-        max_pleno = datos_dict["ant_pleno_max"]
-        min_senior = datos_dict["ant_senior_min"]
-        max_senior = datos_dict["ant_senior_max"]
-        if (data['antiguedad'] <= min_junior):
-            antiguedad = 'junior'
-        elif (min_junior < data['antiguedad'] <= max_junior):
-            antiguedad = 'junior'
-        elif (min_pleno <= data['antiguedad'] <= max_pleno):
-            antiguedad = 'pleno'
-        elif (min_senior <= data['antiguedad'] <= max_senior):
-            antiguedad = 'senior'
-        factor_antiguedad = IncidenciasLaborales.objects.get(
-            nombre=f"ant_{antiguedad}_{data['ubicacion'].lower()}").valor
-        factor_departamental = round(float(
-            fce_departamento) * (float(ipc_departamento) / float(ipc_nacional)), 2)
-        arancel_calculado = float(salario_base) * float(factor_antiguedad) * float(factor_formacion) * \
-            float(factor_departamental) * float(factor_tipo_actividad)
-        arancel_calculado = round(arancel_calculado, 0)
-        arancel_hora = round(arancel_calculado / 240, 0)
-        arancel_dia = round(arancel_hora * 8, 0)
-        return arancel_calculado, arancel_hora, arancel_dia
+        # Tabla en memoria (ver incidencias.py): ninguna consulta por cálculo
+        resultado = calcular(self.incidencias, [data])
+        return (float(resultado['mensual'][0]), float(resultado['hora'][0]),
+                float(resultado['diario'][0]))
+
+
+class CalculateArancelesBatchSerializer(serializers.Serializer):
+    """
+    Varios escenarios en una sola llamada: una lista explícita o una grilla
+    cuyo producto cartesiano se calcula. En la grilla, los campos omitidos
+    (salvo antiguedad) toman todos sus valores posibles. `hora` es el
+    multiplicador que se aplica a cada valor base de `trabajos`. Con
+    `fecha` (general o por escenario) se usan los coeficientes vigentes en
+    esa fecha, p. ej. para recalcular cotizaciones antiguas.
+    """
+    escenarios = serializers.ListField(
+        child=serializers.DictField(), required=False, allow_empty=False, write_only=True)
+    grilla = serializers.DictField(
+        child=serializers.ListField(allow_empty=False), required=False, write_only=True)
+    incluir_trabajos = serializers.BooleanField(default=True, write_only=True)
+    fecha = serializers.DateTimeField(required=False, write_only=True)
+    count = serializers.IntegerField(read_only=True)
+    resultados = serializers.JSONField(read_only=True)
+
+    def expandir_grilla(self, grilla, incidencias):
+        desconocidos = set(grilla) - set(CAMPOS_ESCENARIO)
+        if desconocidos:
+            raise serializers.ValidationError(
+                {'grilla': f"Campos desconocidos: {sorted(desconocidos)}"})
+        if 'antiguedad' not in grilla:
+            raise serializers.ValidationError(
+                {'grilla': "Falta la lista de antiguedad"})
+
+        opciones = {
+            'departamento': [d for d, _ in EscenarioArancelSerializer.DEPARTAMENTOS],
+            'formacion': list(incidencias.formaciones),
+            'ubicacion': [u for u, _ in EscenarioArancelSerializer.UBICACION],
+            'actividad': list(incidencias.actividades),
+            **grilla,
+        }
+        # Tamaño antes de expandir, para no armar grillas gigantes
+        total = 1
+        for campo in CAMPOS_ESCENARIO:
+            total *= len(opciones[campo])
+        if total > settings.ARANCELES_BATCH_MAX:
+            raise serializers.ValidationError(
+                {'grilla': f"La grilla genera {total} escenarios; el máximo es {settings.ARANCELES_BATCH_MAX}"})
+        return [dict(zip(CAMPOS_ESCENARIO, combinacion))
+                for combinacion in product(*(opciones[c] for c in CAMPOS_ESCENARIO))]
+
+    def validate(self, data):
+        if ('escenarios' in data) == ('grilla' in data):
+            raise serializers.ValidationError(
+                "Envía 'escenarios' o 'grilla' (solo uno)")
+
+        if 'grilla' in data:
+            try:
+                incidencias = tabla_para(data.get('fecha'))
+            except serializers.ValidationError as e:
+                raise serializers.ValidationError({'fecha': e.detail})
+            escenarios = self.expandir_grilla(data['grilla'], incidencias)
+        else:
+            escenarios = data['escenarios']
+            if len(escenarios) > settings.ARANCELES_BATCH_MAX:
+                raise serializers.ValidationError(
+                    {'escenarios': f"Se permiten como máximo {settings.ARANCELES_BATCH_MAX} escenarios"})
+        if 'fecha' in data:
+            escenarios = [{'fecha': data['fecha'], **escenario} for escenario in escenarios]
+
+        resultados = self.calcular_por_version(escenarios)
+
+        if data['incluir_trabajos']:
+            # Un árbol por tarifa horaria distinta, compartido entre escenarios
+            tarifario = get_tarifario()
+            horas, indices = np.unique(
+                [resultado['hora'] for resultado in resultados], return_inverse=True)
+            arboles = [tarifario.arbol(fila) for fila in tarifario.escalar(horas)]
+            for resultado, i in zip(resultados, indices):
+                resultado['trabajos'] = arboles[i]
+
+        data['count'] = len(resultados)
+        data['resultados'] = resultados
+        return data
+
+    def calcular_por_version(self, escenarios):
+        """
+        Agrupa los escenarios por la versión de incidencias que les toca y
+        calcula cada grupo en una sola pasada. Devuelve los resultados en
+        el orden recibido.
+        """
+        errores = [{} for _ in escenarios]
+        grupos = {}
+        for i, escenario in enumerate(escenarios):
+            try:
+                tabla = tabla_para(escenario.get('fecha'))
+            except serializers.ValidationError as e:
+                errores[i] = {'fecha': e.detail}
+                continue
+            grupos.setdefault(id(tabla), (tabla, []))[1].append(i)
+
+        resultados = [None] * len(escenarios)
+        for tabla, indices in grupos.values():
+            items = EscenarioArancelSerializer(
+                data=[escenarios[i] for i in indices], many=True, context={'incidencias': tabla})
+            if not items.is_valid():
+                for i, error in zip(indices, items.errors):
+                    errores[i] = error
+                continue
+            calculado = calcular(tabla, items.validated_data)
+            for i, escenario, nivel, mensual, diario, hora in zip(
+                    indices, items.validated_data, calculado['nivel_antiguedad'],
+                    calculado['mensual'].tolist(), calculado['diario'].tolist(),
+                    calculado['hora'].tolist()):
+                resultados[i] = {**escenario, 'nivel_antiguedad': nivel,
+                                 'mensual': mensual, 'diario': diario, 'hora': hora}
+
+        if any(errores):
+            raise serializers.ValidationError({'escenarios': errores})
+        return resultados
 
 
 class IncidenciasAdminSerializer(serializers.ModelSerializer):
@@ -139,6 +247,12 @@ class IncidenciasAdminSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class VersionIncidenciasSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = VersionIncidencias
+        fields = ['id', 'vigente_desde', 'valores', 'creado']
+
+
 class CategoriaAdminSerializer(serializers.ModelSerializer):
     nombre = serializers.CharField()
     niveles = NivelSerializer(many=True)
@@ -160,40 +274,86 @@ class CategoriaAdminSerializer(serializers.ModelSerializer):
         return categoria_instance
 
     def update(self, instance, validated_data):
+        """
+        Sincroniza el árbol completo con lo recibido: niveles por nombre y
+        elementos por detalle dentro de cada nivel (lo que no llega se
+        borra). Compara contra una sola lectura del árbol actual y escribe
+        por conjunto, así que el número de consultas no depende de cuántos
+        elementos tenga la categoría.
+        """
         niveles_data = validated_data.pop('niveles', [])
         instance.nombre = validated_data.get('nombre', instance.nombre)
-        instance.save()
+
+        # Si un nombre/detalle se repite, gana el último (como antes)
+        recibidos = {}
+        for nivel_data in niveles_data:
+            recibidos[nivel_data.get('nombre')] = {
+                e.get('detalle'): e for e in nivel_data.get('elementos', [])}
 
         with transaction.atomic():
-            # --- Lógica para NIVELES ---
-            # Identificamos qué niveles vienen en la petición (por nombre o ID)
-            nombres_niveles_recibidos = [n.get('nombre') for n in niveles_data]
-
-            # Opcional: Borrar niveles que ya no están en la lista
-            instance.niveles.exclude(
-                nombre__in=nombres_niveles_recibidos).delete()
-            for nivel_data in niveles_data:
-                elementos_data = nivel_data.pop('elementos', [])
-
-                # OJO: Si buscas solo por nombre, podrías duplicar si el usuario
-                # cambia el nombre en el frontend. Lo ideal es usar IDs.
-                nivel_obj, _ = Nivel.objects.update_or_create(
-                    categoria=instance,
-                    nombre=nivel_data.get('nombre'),
-                    defaults=nivel_data
-                )
-
-                detalles_elementos_recibidos = [
-                    e.get('detalle') for e in elementos_data]
-                # Opcional: Borrar elementos que ya no están en la lista
-                nivel_obj.elementos.exclude(
-                    detalle__in=detalles_elementos_recibidos).delete()
-
-                for elemento_data in elementos_data:
-                    Elemento.objects.update_or_create(
-                        nivel=nivel_obj,
-                        detalle=elemento_data.get('detalle'),
-                        defaults=elemento_data
-                    )
+            # Dentro de la transacción: su señal invalida el tarifario al
+            # confirmar, y cubre también las escrituras por lote de abajo
+            instance.save()
+
+            niveles = {}
+            borrar_niveles = []
+            for nivel in Nivel.objects.filter(categoria=instance).prefetch_related('elementos'):
+                if nivel.nombre not in recibidos or nivel.nombre in niveles:
+                    borrar_niveles.append(nivel.id)
+                else:
+                    niveles[nivel.nombre] = nivel
+            if borrar_niveles:
+                Nivel.objects.filter(id__in=borrar_niveles).delete()
+
+            crear, actualizar, borrar = diff_elementos(
+                niveles, {nombre: recibidos[nombre] for nombre in niveles})
+
+            # Los niveles nuevos no tienen elementos que comparar
+            nuevos = [Nivel(categoria=instance, nombre=nombre)
+                      for nombre in recibidos if nombre not in niveles]
+            for nivel in Nivel.objects.bulk_create(nuevos):
+                crear += [Elemento(nivel=nivel, **datos)
+                          for datos in recibidos[nivel.nombre].values()]
+
+            if borrar:
+                Elemento.objects.filter(id__in=borrar).delete()
+            Elemento.objects.bulk_create(crear)
+            Elemento.objects.bulk_update(
+                actualizar, ['unidad', 'valor'], batch_size=500)
 
         return instance
+
+
+def diff_elementos(niveles, recibidos):
+    """
+    niveles: {nombre: Nivel con sus elementos prefetcheados},
+    recibidos: {nombre: {detalle: datos}}. Devuelve (crear, actualizar,
+    ids_borrar); solo se actualizan los elementos que cambian.
+    """
+    crear = []
+    actualizar = []
+    borrar = []
+    for nombre, elementos_data in recibidos.items():
+        nivel = niveles[nombre]
+        existentes = {}
+        for elemento in nivel.elementos.all():
+            if elemento.detalle in elementos_data and elemento.detalle not in existentes:
+                existentes[elemento.detalle] = elemento
+            else:
+                borrar.append(elemento.id)
+
+        for detalle, datos in elementos_data.items():
+            elemento = existentes.get(detalle)
+            if elemento is None:
+                crear.append(Elemento(nivel=nivel, **datos))
+                continue
+            cambio = False
+            if 'unidad' in datos and elemento.unidad != datos['unidad']:
+                elemento.unidad = datos['unidad']
+                cambio = True
+            if 'valor' in datos and elemento.valor != Decimal(str(datos['valor'])):
+                elemento.valor = datos['valor']
+                cambio = True
+            if cambio:
+                actualizar.append(elemento)
+    return crear, actualizar, borrar
@@ -0,0 +1,28 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Categoria, Elemento, IncidenciasLaborales, Nivel
+from .incidencias import INCIDENCIAS_VERSION_KEY, registrar_version_tras_commit
+from .matriz import regenerar_tras_commit
+from .tarifario import TARIFARIO_VERSION_KEY
+from utils.versiones import bump_on_commit
+
+
+@receiver(post_save, sender=IncidenciasLaborales)
+@receiver(post_delete, sender=IncidenciasLaborales)
+def invalidate_incidencias(sender, instance, **kwargs):
+    # Tras el commit, para que nadie cargue valores sin confirmar
+    bump_on_commit(INCIDENCIAS_VERSION_KEY)
+    regenerar_tras_commit()
+    registrar_version_tras_commit()
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+@receiver(post_save, sender=Nivel)
+@receiver(post_delete, sender=Nivel)
+@receiver(post_save, sender=Elemento)
+@receiver(post_delete, sender=Elemento)
+def invalidate_tarifario(sender, instance, **kwargs):
+    bump_on_commit(TARIFARIO_VERSION_KEY)
+    # El ETag de la matriz también cubre el árbol de trabajos
+    regenerar_tras_commit()
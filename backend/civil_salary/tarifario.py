@@ -0,0 +1,108 @@
+import hashlib
+import threading
+import time
+import numpy as np
+from .incidencias import SNAPSHOT_TTL
+from .models import Categoria, Elemento, Nivel
+from utils.versiones import bump_version, get_version
+
+TARIFARIO_VERSION_KEY = 'tarifario_version'
+
+
+def bump_tarifario_version():
+    return bump_version(TARIFARIO_VERSION_KEY)
+
+
+class Tarifario:
+    """
+    Árbol Categoria -> Nivel -> Elemento aplanado: los valores base en un
+    vector y, aparte, la estructura con el tramo del vector que corresponde
+    a cada nivel. Escalar por la tarifa horaria es una sola multiplicación.
+    """
+
+    def __init__(self, version, categorias, niveles, elementos):
+        self.version = version
+        self.cargado = time.monotonic()
+
+        por_nivel = {}
+        for nivel_id, detalle, unidad, valor in elementos:
+            por_nivel.setdefault(nivel_id, []).append((detalle, unidad, valor))
+        por_categoria = {}
+        for nivel_id, categoria_id, nombre in niveles:
+            por_categoria.setdefault(categoria_id, []).append((nivel_id, nombre))
+
+        valores = []
+        self.estructura = []
+        for categoria_id, nombre in categorias:
+            niveles_cat = []
+            for nivel_id, nombre_nivel in por_categoria.get(categoria_id, []):
+                filas = por_nivel.get(nivel_id, [])
+                inicio = len(valores)
+                valores.extend(valor for _, _, valor in filas)
+                niveles_cat.append((nombre_nivel, tuple(
+                    (detalle, unidad) for detalle, unidad, _ in filas), inicio))
+            self.estructura.append((nombre, tuple(niveles_cat)))
+
+        self.valores = np.array(valores, dtype=np.float64)
+        self.valores.flags.writeable = False
+        # Identifica el contenido, no la versión (sirve para ETags)
+        self.huella = hashlib.sha256(
+            repr(self.estructura).encode() + self.valores.tobytes()).hexdigest()
+
+    def escalar(self, factor):
+        """
+        Valores redondeados a entero tras multiplicar por `factor`. Con un
+        vector de factores devuelve una fila por factor (producto externo).
+        """
+        if np.ndim(factor):
+            return np.round(np.outer(factor, self.valores), 0).tolist()
+        return np.round(self.valores * factor, 0).tolist()
+
+    def arbol(self, valores):
+        # Mismo formato que CategoriaSerializer
+        return [
+            {'nombre': nombre, 'niveles': [
+                {'nombre': nombre_nivel, 'elementos': [
+                    {'detalle': detalle, 'valor': valor, 'unidad': unidad}
+                    for (detalle, unidad), valor in zip(filas, valores[inicio:inicio + len(filas)])
+                ]}
+                for nombre_nivel, filas, inicio in niveles
+            ]}
+            for nombre, niveles in self.estructura
+        ]
+
+    def trabajos(self, hora):
+        return self.arbol(self.escalar(hora))
+
+
+_tarifario = None
+_lock = threading.Lock()
+
+
+def get_tarifario():
+    """
+    Tarifario del proceso; se reconstruye (tres consultas) solo cuando
+    cambia la versión (ver signals.py) o vence SNAPSHOT_TTL.
+    """
+    global _tarifario
+    version = get_version(TARIFARIO_VERSION_KEY)
+    tarifario = _tarifario
+    if tarifario is not None and tarifario.version == version and \
+            time.monotonic() - tarifario.cargado < SNAPSHOT_TTL:
+        return tarifario
+
+    with _lock:
+        if _tarifario is tarifario:
+            _tarifario = cargar_tarifario(version)
+        return _tarifario
+
+
+def cargar_tarifario(version=None):
+    return Tarifario(
+        version,
+        Categoria.objects.order_by('id').values_list('id', 'nombre'),
+        Nivel.objects.order_by('id').values_list(
+            'id', 'categoria_id', 'nombre'),
+        Elemento.objects.order_by('id').values_list(
+            'nivel_id', 'detalle', 'unidad', 'valor'),
+    )
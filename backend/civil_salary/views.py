@@ -2,27 +2,46 @@ from rest_framework import viewsets, status, mixins
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.conf import settings
 from django.db import transaction
-from .serializers import CalculateArancelesSerializer, CategoriaAdminSerializer, IncidenciasAdminSerializer, CategoriaSerializer
-from .models import Categoria, IncidenciasLaborales
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from .serializers import CalculateArancelesBatchSerializer, CalculateArancelesSerializer, CategoriaAdminSerializer, EscenarioArancelSerializer, IncidenciasAdminSerializer, CategoriaSerializer, VersionIncidenciasSerializer
+from .models import Categoria, IncidenciasLaborales, VersionIncidencias
+from .incidencias import INCIDENCIAS_VERSION_KEY, get_incidencias, registrar_version_tras_commit
+from .matriz import get_matriz, regenerar_tras_commit
+from .tarifario import get_tarifario
+from utils.versiones import bump_on_commit
 from users.permissions import IsAdminPrin
 
 
+def respuesta_condicional(request, matriz, construir):
+    """
+    Responde 304 si el cliente ya tiene esta versión de la matriz (ETag o
+    Last-Modified); si no, arma la respuesta con construir(). Ambas llevan
+    los mismos encabezados para navegadores y CDN.
+    """
+    etag = quote_etag(matriz.etag)
+    last_modified = int(matriz.generado.timestamp())
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = Response(construir())
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, public=True,
+                        max_age=settings.ARANCELES_CACHE_MAX_AGE)
+    return response
+
+
 class CalculateArancelViewSet(viewsets.ViewSet):
     permission_classes = [AllowAny]
 
     def list(self, request):
-        formaciones_raw = IncidenciasLaborales.objects.filter(
-            nombre__startswith='form_'
-        ).values_list('nombre', flat=True).distinct()
-        formaciones = [f.replace('form_', '') for f in formaciones_raw]
-        actvidades_raw = IncidenciasLaborales.objects.filter(
-            nombre__startswith='actividad_'
-        ).values_list('nombre', flat=True).distinct()
-        actividades = [a.replace('actividad_', '') for a in actvidades_raw]
+        incidencias = get_incidencias()
         return Response({
-            "formaciones": formaciones,
-            "actividades": actividades,
+            "formaciones": list(incidencias.formaciones),
+            "actividades": list(incidencias.actividades),
         })
 
     def create(self, request):
@@ -30,6 +49,49 @@ class CalculateArancelViewSet(viewsets.ViewSet):
         serializer.is_valid(raise_exception=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'], url_path='matriz')
+    def matriz(self, request):
+        matriz = get_matriz()
+        if matriz is None:
+            return Response({"error": "La matriz de aranceles no está disponible"},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return respuesta_condicional(request, matriz, lambda: matriz.datos)
+
+    @action(detail=False, methods=['get'], url_path='calcular')
+    def calcular(self, request):
+        # Igual que create, pero desde la matriz precalculada y cacheable
+        if request.query_params.get('fecha'):
+            # La matriz solo tiene los coeficientes actuales
+            serializer = CalculateArancelesSerializer(data=request.query_params.dict())
+            serializer.is_valid(raise_exception=True)
+            return Response(serializer.data)
+
+        serializer = EscenarioArancelSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        matriz = get_matriz()
+        if matriz is None:
+            return Response({"error": "La matriz de aranceles no está disponible"},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        fila = matriz.buscar(**serializer.validated_data)
+        if fila is None:
+            return Response({"error": "Combinación fuera de la matriz de aranceles"},
+                            status=status.HTTP_404_NOT_FOUND)
+
+        def construir():
+            return {
+                "mensual": fila['mensual'],
+                "diario": fila['diario'],
+                "hora": fila['hora'],
+                "trabajos": get_tarifario().trabajos(fila['hora']),
+            }
+        return respuesta_condicional(request, matriz, construir)
+
+    @action(detail=False, methods=['post'], url_path='batch')
+    def batch(self, request):
+        serializer = CalculateArancelesBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.data)
+
 
 class IncidenciasAdminViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAdminPrin]
@@ -41,6 +103,13 @@ class IncidenciasAdminViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'], url_path='versiones')
+    def versiones(self, request):
+        # Historial de coeficientes, de la más reciente a la más antigua
+        queryset = VersionIncidencias.objects.order_by('-vigente_desde', '-id')
+        serializer = VersionIncidenciasSerializer(queryset, many=True)
+        return Response(serializer.data)
+
     @action(detail=False, methods=['patch'], url_path='bulk-update')
     def bulk_update(self, request):
         data = request.data
@@ -75,6 +144,10 @@ class IncidenciasAdminViewSet(viewsets.ModelViewSet):
                     updated_objects,
                     fields=list(fields_to_update)
                 )
+                # bulk_update no dispara señales
+                bump_on_commit(INCIDENCIAS_VERSION_KEY)
+                regenerar_tras_commit()
+                registrar_version_tras_commit()
 
         serializer = self.get_serializer(updated_objects, many=True)
         return Response(serializer.data)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PerformanceTableConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'performance_table'
+
+    def ready(self):
+        import performance_table.signals
@@ -0,0 +1,170 @@
+from django.db import transaction
+from utils.versiones import bump_on_commit
+from .catalog import CATALOG_VERSION_KEY
+from .models import PerformanceTable, QuantifiedResource, ResourceChart
+from .summaries import schedule_summary_refresh
+
+CAMPOS_ACTIVIDAD = ['codigo', 'actividad', 'unidad', 'categoria']
+
+
+def diff_recursos(performance_table_id, existentes, entrantes):
+    """
+    existentes: {recurso_id: QuantifiedResource}, entrantes: {recurso_id: cantidad}.
+    Devuelve (crear, actualizar, ids_borrar) conservando los ids de las filas
+    que siguen presentes.
+    """
+    crear = []
+    actualizar = []
+    for recurso_id, cantidad in entrantes.items():
+        qr = existentes.get(recurso_id)
+        if qr is None:
+            crear.append(QuantifiedResource(
+                performance_table_id=performance_table_id,
+                recurso_id=recurso_id,
+                cantidad=cantidad))
+        elif qr.cantidad != cantidad:
+            qr.cantidad = cantidad
+            actualizar.append(qr)
+
+    ids_borrar = [qr.id for recurso_id, qr in existentes.items()
+                  if recurso_id not in entrantes]
+    return crear, actualizar, ids_borrar
+
+
+def bulk_upsert(items):
+    """
+    Crea o actualiza muchas actividades con sus recursos. Cada item se
+    identifica por `id` o, si no trae, por `codigo`; si no se envía
+    `recursos_info` sus recursos no se tocan. Las escrituras son por
+    conjunto: un INSERT, un UPDATE y un DELETE como máximo por tabla.
+    Devuelve un resultado por item, en el mismo orden.
+    """
+    resultados = [{'index': i} for i in range(len(items))]
+
+    ids = {item['id'] for item in items if item.get('id')}
+    codigos = {item['codigo'] for item in items if not item.get('id')}
+    recurso_ids = {r['recurso'] for item in items
+                   for r in item.get('recursos_info') or []}
+
+    existentes_por_id = PerformanceTable.objects.filter(
+        id__in=ids).in_bulk() if ids else {}
+    existentes_por_codigo = {}
+    if codigos:
+        for pt in PerformanceTable.objects.filter(codigo__in=codigos):
+            existentes_por_codigo.setdefault(pt.codigo, []).append(pt)
+    recursos_validos = set(ResourceChart.objects.filter(
+        id__in=recurso_ids).values_list('id', flat=True))
+
+    repetida = {'non_field_errors': ['Actividad repetida en la solicitud']}
+
+    # 1. Resolver cada item contra lo que ya existe
+    vistos = set()  # claves tal como llegan (id o código)
+    instancias_vistas = set()  # pk de las actividades existentes ya tomadas
+    pendientes = []  # (resultado, item, instancia o None)
+    for resultado, item in zip(resultados, items):
+        clave = ('id', item['id']) if item.get('id') else ('codigo', item['codigo'])
+        if clave in vistos:
+            resultado.update(status='error', errors=repetida)
+            continue
+        vistos.add(clave)
+
+        faltantes = sorted({r['recurso'] for r in item.get('recursos_info') or []}
+                           - recursos_validos)
+        if faltantes:
+            resultado.update(status='error', errors={
+                'recursos_info': [f'Recursos inexistentes: {faltantes}']})
+            continue
+
+        if item.get('id'):
+            instancia = existentes_por_id.get(item['id'])
+            if instancia is None:
+                resultado.update(status='error', errors={
+                    'id': ['No existe una actividad con este id']})
+                continue
+        else:
+            coincidencias = existentes_por_codigo.get(item['codigo'], [])
+            if len(coincidencias) > 1:
+                resultado.update(status='error', errors={
+                    'codigo': ['Hay varias actividades con este código, envía el id']})
+                continue
+            instancia = coincidencias[0] if coincidencias else None
+            incompletos = [campo for campo in CAMPOS_ACTIVIDAD if campo not in item]
+            if instancia is None and incompletos:
+                resultado.update(status='error', errors={
+                    campo: ['Este campo es requerido para crear la actividad']
+                    for campo in incompletos})
+                continue
+
+        # Un item por id y otro por código pueden apuntar a la misma fila
+        if instancia is not None:
+            if instancia.pk in instancias_vistas:
+                resultado.update(status='error', errors=repetida)
+                continue
+            instancias_vistas.add(instancia.pk)
+
+        pendientes.append((resultado, item, instancia))
+
+    with transaction.atomic():
+        # 2. Actividades
+        nuevas = []
+        cambiadas = []
+        for resultado, item, instancia in pendientes:
+            if instancia is None:
+                instancia = PerformanceTable(
+                    **{campo: item[campo] for campo in CAMPOS_ACTIVIDAD})
+                nuevas.append((resultado, instancia))
+                resultado['status'] = 'created'
+            else:
+                cambios = [campo for campo in CAMPOS_ACTIVIDAD
+                           if campo in item and getattr(instancia, campo) != item[campo]]
+                for campo in cambios:
+                    setattr(instancia, campo, item[campo])
+                if cambios:
+                    cambiadas.append(instancia)
+                resultado['status'] = 'updated' if cambios else 'unchanged'
+            resultado['_instancia'] = instancia
+
+        if nuevas:
+            PerformanceTable.objects.bulk_create([pt for _, pt in nuevas])
+        if cambiadas:
+            PerformanceTable.objects.bulk_update(cambiadas, CAMPOS_ACTIVIDAD)
+
+        # 3. Recursos de cada actividad, contra una sola lectura
+        tocadas = [resultado['_instancia'].id for resultado, item, _ in pendientes
+                   if item.get('recursos_info') is not None]
+        existentes = {}
+        for qr in QuantifiedResource.objects.filter(performance_table_id__in=tocadas):
+            existentes.setdefault(qr.performance_table_id, {})[qr.recurso_id] = qr
+
+        crear, actualizar, borrar = [], [], []
+        for resultado, item, _ in pendientes:
+            if item.get('recursos_info') is None:
+                continue
+            pt_id = resultado['_instancia'].id
+            entrantes = {r['recurso']: r['cantidad'] for r in item['recursos_info']}
+            c, a, b = diff_recursos(pt_id, existentes.get(pt_id, {}), entrantes)
+            crear += c
+            actualizar += a
+            borrar += b
+            if (c or a or b) and resultado['status'] == 'unchanged':
+                resultado['status'] = 'updated'
+
+        if borrar:
+            QuantifiedResource.objects.filter(id__in=borrar).delete()
+        if actualizar:
+            QuantifiedResource.objects.bulk_update(actualizar, ['cantidad'])
+        if crear:
+            QuantifiedResource.objects.bulk_create(crear)
+
+        # bulk_create/bulk_update no disparan señales
+        cambiadas_ids = [r['_instancia'].id for r, _, _ in pendientes
+                         if r['status'] != 'unchanged']
+        if cambiadas_ids:
+            schedule_summary_refresh(cambiadas_ids)
+            bump_on_commit(CATALOG_VERSION_KEY)
+
+    for resultado, _, _ in pendientes:
+        instancia = resultado.pop('_instancia')
+        resultado['id'] = instancia.id
+        resultado['codigo'] = instancia.codigo
+    return resultados
@@ -0,0 +1,33 @@
+from django.core.cache import cache
+from utils.versiones import bump_version, get_version
+from .models import PerformanceTable, ResourceChart
+
+CATALOG_VERSION_KEY = 'performance_catalog_version'
+FACETS_TIMEOUT = 60 * 60  # 1 hora, por si otro worker no recibió la señal
+
+
+def get_catalog_version():
+    return get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    return bump_version(CATALOG_VERSION_KEY)
+
+
+def get_catalog_facets():
+    """
+    Totales del catálogo que acompañan cada página del listado.
+    Se calculan una sola vez por versión del catálogo.
+    """
+    key = f'performance_facets:{get_catalog_version()}'
+    facets = cache.get(key)
+    if facets is None:
+        categories_names = list(PerformanceTable.objects.order_by(
+            'categoria').values_list('categoria', flat=True).distinct())
+        facets = {
+            'total_resources': ResourceChart.objects.count(),
+            'total_categories': len(categories_names),
+            'categories_names': categories_names,
+        }
+        cache.set(key, facets, timeout=FACETS_TIMEOUT)
+    return facets
@@ -0,0 +1,21 @@
+import django_filters
+from .models import PerformanceTable
+
+
+class PerformanceTableFilter(django_filters.FilterSet):
+    # ?con_mano_obra=true -> solo actividades con mano de obra
+    con_materiales = django_filters.BooleanFilter(
+        field_name='n_materiales', method='filtrar_presencia')
+    con_mano_obra = django_filters.BooleanFilter(
+        field_name='n_mano_obra', method='filtrar_presencia')
+    con_herramientas = django_filters.BooleanFilter(
+        field_name='n_herramientas', method='filtrar_presencia')
+
+    class Meta:
+        model = PerformanceTable
+        fields = ['categoria']
+
+    def filtrar_presencia(self, queryset, name, value):
+        if value:
+            return queryset.filter(**{f'{name}__gt': 0})
+        return queryset.filter(**{name: 0})
@@ -0,0 +1,601 @@
+import csv
+import hashlib
+import json
+import os
+import pandas as pd
+from django.db import transaction
+from django.utils import timezone
+from openpyxl import load_workbook
+from .models import ImportacionVisto, PerformanceTable, QuantifiedResource, ResourceChart
+from .summaries import refresh_activity_summaries
+
+# Tamaño de los lotes de consultas IN y de escrituras masivas
+BATCH_SIZE = 2000
+
+FILAS_IGNORADAS = {"recursos", "cadeco 2024"}
+
+COLUMNAS = ["tarea_nombre", "tarea_unidad", "recurso_nombre",
+            "recurso_rendimiento", "recurso_unidad", "recurso_categoria"]
+
+
+def codigo_tarea(nombre):
+    code_hash = hashlib.md5(nombre.encode()).hexdigest()[:6].upper()
+    return f"TAR-{code_hash}"
+
+
+def parsear_jerarquico(df):
+    """
+    Convierte la hoja jerárquica (fila de tarea seguida de sus recursos) en
+    una fila por recurso con las COLUMNAS. Todo con operaciones por columna:
+    la tarea vigente se propaga con ffill en lugar de recorrer fila a fila.
+    """
+    return parsear_jerarquico_lote(df)[0]
+
+
+def parsear_jerarquico_lote(df, tarea=None):
+    """
+    Igual que parsear_jerarquico para un tramo de la hoja. `tarea` es la
+    (nombre, unidad) vigente al final del tramo anterior; se devuelve la
+    vigente al final de este para encadenar lotes.
+    """
+    df = df.reindex(columns=range(5), fill_value="")
+    nombre, rendimiento, unidad, categoria = (
+        df[c].fillna("").astype(str).str.strip() for c in (1, 2, 3, 4))
+
+    # Filas vacías, títulos y encabezados de tabla
+    valida = (nombre != "") & ~nombre.str.lower().isin(FILAS_IGNORADAS)
+    valida &= ~((rendimiento.str.lower() == "rendimiento") |
+                (unidad.str.lower() == "unidad") |
+                (categoria.str.lower() == "categoria"))
+
+    es_tarea = valida & (rendimiento == "") & (unidad != "")
+    tarea_nombre = nombre.where(es_tarea).ffill()
+    tarea_unidad = unidad.where(es_tarea).ffill()
+    if tarea:
+        tarea_nombre = tarea_nombre.fillna(tarea[0])
+        tarea_unidad = tarea_unidad.fillna(tarea[1])
+    if len(tarea_nombre) and pd.notna(tarea_nombre.iloc[-1]):
+        tarea = [tarea_nombre.iloc[-1], tarea_unidad.iloc[-1]]
+
+    valor = pd.to_numeric(rendimiento, errors="coerce")
+    es_recurso = valida & (rendimiento != "") & \
+        tarea_nombre.notna() & valor.notna()
+
+    filas = pd.DataFrame({
+        "tarea_nombre": tarea_nombre[es_recurso],
+        "tarea_unidad": tarea_unidad[es_recurso],
+        "recurso_nombre": nombre[es_recurso],
+        "recurso_rendimiento": valor[es_recurso].astype(float),
+        "recurso_unidad": unidad[es_recurso],
+        "recurso_categoria": categoria[es_recurso],
+    }, columns=COLUMNAS).reset_index(drop=True)
+    return filas, tarea
+
+
+def parsear_plano(df, columnas):
+    """
+    Formato plano de import_projects: una fila por recurso con las columnas
+    TAREA, UNIDAD, RECURSO, CANT y UNID. `columnas` mapea cada encabezado a
+    su posición en df. CANT vacía cuenta como 0.
+    """
+    def columna(nombre):
+        if nombre not in columnas:
+            return pd.Series("", index=df.index)
+        return df[columnas[nombre]].fillna("").astype(str).str.strip()
+
+    tarea, recurso, cant = columna("TAREA"), columna("RECURSO"), columna("CANT")
+    valor = pd.to_numeric(cant.replace("", "0"), errors="coerce")
+    valida = (tarea != "") & (recurso != "") & valor.notna()
+
+    return pd.DataFrame({
+        "tarea_nombre": tarea[valida],
+        "tarea_unidad": columna("UNIDAD")[valida],
+        "recurso_nombre": recurso[valida],
+        "recurso_rendimiento": valor[valida].astype(float),
+        "recurso_unidad": columna("UNID")[valida],
+        "recurso_categoria": "",
+    }, columns=COLUMNAS).reset_index(drop=True)
+
+
+def _en_lotes(valores):
+    valores = list(valores)
+    for i in range(0, len(valores), BATCH_SIZE):
+        yield valores[i:i + BATCH_SIZE]
+
+
+def _mapa_ids(queryset, campo, nombres):
+    mapa = {}
+    for lote in _en_lotes(nombres):
+        mapa.update(queryset.filter(
+            **{f"{campo}__in": lote}).values_list(campo, "id"))
+    return mapa
+
+
+class PlanDesactualizado(Exception):
+    """La base cambió entre el plan y su aplicación."""
+
+    def __init__(self, conflictos):
+        self.conflictos = conflictos
+        super().__init__(
+            f"El plan está desactualizado: {len(conflictos)} conflictos")
+
+
+TIPOS_PLAN = ["tareas_nuevas", "recursos_nuevos", "recursos_cambiados",
+              "asignaciones_nuevas", "asignaciones_cambiadas",
+              "asignaciones_huerfanas"]
+
+
+def _cantidad(valor):
+    return str(float(valor))
+
+
+def _vistos(importacion, tipo, ids):
+    """Ids de `ids` que un lote anterior de la importación ya definió."""
+    if importacion is None:
+        return set()
+    vistos = set()
+    for lote in _en_lotes(ids):
+        vistos.update(ImportacionVisto.objects.filter(
+            importacion=importacion, tipo=tipo, ref_id__in=lote
+        ).values_list("ref_id", flat=True))
+    return vistos
+
+
+def _marcar_vistos(importacion, filas):
+    """Registra los recursos y asignaciones del lote ya sincronizado."""
+    res_ids = _mapa_ids(ResourceChart.objects, "nombre",
+                        filas["recurso_nombre"].unique())
+    task_ids = _mapa_ids(PerformanceTable.objects, "actividad",
+                         filas["tarea_nombre"].unique())
+    pares = set(zip(filas["tarea_nombre"].map(task_ids),
+                    filas["recurso_nombre"].map(res_ids)))
+    asignaciones = []
+    for lote in _en_lotes(set(task_ids.values())):
+        asignaciones.extend(
+            qr_id for qr_id, pt_id, rec_id in QuantifiedResource.objects.filter(
+                performance_table_id__in=lote).values_list(
+                "id", "performance_table_id", "recurso_id")
+            if (pt_id, rec_id) in pares)
+    ImportacionVisto.objects.bulk_create(
+        [ImportacionVisto(importacion=importacion, tipo=ImportacionVisto.Tipo.RECURSO, ref_id=id)
+         for id in res_ids.values()] +
+        [ImportacionVisto(importacion=importacion, tipo=ImportacionVisto.Tipo.ASIGNACION, ref_id=id)
+         for id in asignaciones],
+        batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def planear(filas, importacion=None, eliminar_huerfanas=False):
+    """
+    Calcula, sin escribir nada, el diff entre las filas de un parser y la
+    base: tareas y recursos nuevos, unidades/categorías cambiadas,
+    asignaciones nuevas o con otra cantidad y asignaciones huérfanas (de una
+    tarea del archivo cuyo recurso ya no aparece). Todo sale de índices en
+    memoria y cruces por conjuntos; el resultado es serializable a JSON.
+
+    Al importar por lotes, `importacion` identifica la importación en
+    ImportacionVisto: un lote posterior no cambia los recursos ni las
+    asignaciones que ya definió uno anterior.
+    """
+    plan = {tipo: [] for tipo in TIPOS_PLAN}
+    plan["eliminar_huerfanas"] = eliminar_huerfanas
+
+    # 1. Tareas: la primera aparición define la unidad
+    tareas = filas.groupby("tarea_nombre", sort=False)["tarea_unidad"].first()
+    task_ids = _mapa_ids(PerformanceTable.objects, "actividad", tareas.index)
+    plan["tareas_nuevas"] = [
+        {"actividad": name, "unidad": unit, "codigo": codigo_tarea(name)}
+        for name, unit in tareas.items() if name not in task_ids
+    ]
+
+    # 2. Recursos
+    recursos = filas.groupby("recurso_nombre", sort=False)[
+        ["recurso_unidad", "recurso_categoria"]].first()
+    existentes = {}
+    for lote in _en_lotes(recursos.index):
+        existentes.update(
+            (nombre, (rec_id, unidad, categoria)) for rec_id, nombre, unidad, categoria in
+            ResourceChart.objects.filter(nombre__in=lote).values_list(
+                "id", "nombre", "unidad", "categoria"))
+
+    recursos_vistos = _vistos(importacion, ImportacionVisto.Tipo.RECURSO,
+                              [datos[0] for datos in existentes.values()])
+    for name, unit, cat in recursos.itertuples():
+        if name not in existentes:
+            plan["recursos_nuevos"].append(
+                {"nombre": name, "unidad": unit, "categoria": cat})
+            continue
+        rec_id, unidad, categoria = existentes[name]
+        if rec_id in recursos_vistos:
+            continue
+        nuevo_unidad = unit or unidad
+        nuevo_categoria = cat or categoria
+        if (nuevo_unidad, nuevo_categoria) != (unidad, categoria):
+            plan["recursos_cambiados"].append({
+                "id": rec_id, "nombre": name,
+                "unidad": [unidad, nuevo_unidad],
+                "categoria": [categoria, nuevo_categoria],
+            })
+
+    # 3. Asignaciones: cruce por (tarea, recurso) contra lo existente
+    res_ids = {nombre: datos[0] for nombre, datos in existentes.items()}
+    pares = filas.drop_duplicates(["tarea_nombre", "recurso_nombre"])
+    pares = pd.DataFrame({
+        "tarea": pares["tarea_nombre"],
+        "recurso": pares["recurso_nombre"],
+        "pt_id": pares["tarea_nombre"].map(task_ids).astype("Int64"),
+        "rec_id": pares["recurso_nombre"].map(res_ids).astype("Int64"),
+        "rendimiento": pares["recurso_rendimiento"],
+    })
+
+    actuales = []
+    for lote in _en_lotes(set(task_ids.values())):
+        actuales.extend(QuantifiedResource.objects.filter(
+            performance_table_id__in=lote).values_list(
+            "id", "performance_table_id", "recurso_id", "recurso__nombre", "cantidad"))
+    actuales = pd.DataFrame(
+        actuales, columns=["qr_id", "pt_id", "rec_id", "recurso_actual", "cantidad"]
+    ).astype({"pt_id": "Int64", "rec_id": "Int64"})
+
+    cruce = pares.merge(actuales, on=["pt_id", "rec_id"], how="left")
+    es_nueva = cruce["qr_id"].isna()
+    diferencia = (pd.to_numeric(cruce["cantidad"], errors="coerce") -
+                  cruce["rendimiento"]).abs()
+    # Cantidades no numéricas también se reemplazan
+    cambiada = ~es_nueva & ~(diferencia <= 0.0001)
+    asignaciones_vistas = _vistos(importacion, ImportacionVisto.Tipo.ASIGNACION,
+                                  cruce.loc[cambiada, "qr_id"].astype(int))
+    if asignaciones_vistas:
+        cambiada &= ~cruce["qr_id"].isin(asignaciones_vistas)
+
+    plan["asignaciones_nuevas"] = [
+        {"tarea": tarea, "recurso": recurso,
+         "tarea_id": None if pd.isna(pt_id) else int(pt_id),
+         "recurso_id": None if pd.isna(rec_id) else int(rec_id),
+         "cantidad": _cantidad(rendimiento)}
+        for tarea, recurso, pt_id, rec_id, rendimiento in cruce.loc[
+            es_nueva, ["tarea", "recurso", "pt_id", "rec_id", "rendimiento"]].itertuples(index=False)
+    ]
+    plan["asignaciones_cambiadas"] = [
+        {"id": int(qr_id), "tarea": tarea, "recurso": recurso, "tarea_id": int(pt_id),
+         "cantidad": [cantidad, _cantidad(rendimiento)]}
+        for qr_id, tarea, recurso, pt_id, cantidad, rendimiento in cruce.loc[
+            cambiada, ["qr_id", "tarea", "recurso", "pt_id", "cantidad", "rendimiento"]].itertuples(index=False)
+    ]
+
+    # Existentes que el archivo ya no menciona para su tarea
+    en_archivo = actuales.merge(
+        pares[["pt_id", "rec_id"]], on=["pt_id", "rec_id"], how="left", indicator=True)
+    nombres_tarea = {id: nombre for nombre, id in task_ids.items()}
+    plan["asignaciones_huerfanas"] = [
+        {"id": int(qr_id), "tarea": nombres_tarea[int(pt_id)],
+         "recurso": recurso, "tarea_id": int(pt_id), "cantidad": cantidad}
+        for qr_id, pt_id, recurso, cantidad in en_archivo.loc[
+            en_archivo["_merge"] == "left_only",
+            ["qr_id", "pt_id", "recurso_actual", "cantidad"]].itertuples(index=False)
+    ]
+    return plan
+
+
+def resumen_plan(plan):
+    return {tipo: len(plan[tipo]) for tipo in TIPOS_PLAN}
+
+
+def _conflictos(plan):
+    """Comprueba que lo que el plan da por hecho siga igual en la base."""
+    conflictos = []
+
+    tareas = [t["actividad"] for t in plan["tareas_nuevas"]]
+    for lote in _en_lotes(tareas):
+        conflictos += [f"La tarea '{nombre}' ya existe" for nombre in
+                       PerformanceTable.objects.filter(actividad__in=lote).values_list("actividad", flat=True)]
+
+    recursos = [r["nombre"] for r in plan["recursos_nuevos"]]
+    for lote in _en_lotes(recursos):
+        conflictos += [f"El recurso '{nombre}' ya existe" for nombre in
+                       ResourceChart.objects.filter(nombre__in=lote).values_list("nombre", flat=True)]
+
+    esperados = {r["id"]: (r["unidad"][0], r["categoria"][0])
+                 for r in plan["recursos_cambiados"]}
+    for lote in _en_lotes(esperados):
+        for rec_id, unidad, categoria in ResourceChart.objects.filter(
+                id__in=lote).values_list("id", "unidad", "categoria"):
+            if esperados.pop(rec_id) != (unidad, categoria):
+                conflictos.append(f"El recurso {rec_id} cambió desde el plan")
+    conflictos += [f"El recurso {rec_id} ya no existe" for rec_id in esperados]
+
+    esperadas = {a["id"]: a["cantidad"][0] for a in plan["asignaciones_cambiadas"]}
+    if plan["eliminar_huerfanas"]:
+        esperadas.update((a["id"], a["cantidad"])
+                         for a in plan["asignaciones_huerfanas"])
+    for lote in _en_lotes(esperadas):
+        for qr_id, cantidad in QuantifiedResource.objects.filter(
+                id__in=lote).values_list("id", "cantidad"):
+            if esperadas.pop(qr_id) != cantidad:
+                conflictos.append(f"La asignación {qr_id} cambió desde el plan")
+    conflictos += [f"La asignación {qr_id} ya no existe" for qr_id in esperadas]
+
+    # Tareas y recursos existentes a los que el plan asigna algo nuevo
+    for modelo, campo, texto in ((PerformanceTable, "tarea_id", "La tarea"),
+                                 (ResourceChart, "recurso_id", "El recurso")):
+        ids = {a[campo] for a in plan["asignaciones_nuevas"] if a[campo]}
+        for lote in _en_lotes(ids):
+            ids.difference_update(modelo.objects.filter(
+                id__in=lote).values_list("id", flat=True))
+        conflictos += [f"{texto} {id} ya no existe" for id in sorted(ids)]
+
+    pares = {(a["tarea_id"], a["recurso_id"]) for a in plan["asignaciones_nuevas"]
+             if a["tarea_id"] and a["recurso_id"]}
+    for lote in _en_lotes({pt_id for pt_id, _ in pares}):
+        for par in QuantifiedResource.objects.filter(
+                performance_table_id__in=lote).values_list("performance_table_id", "recurso_id"):
+            if par in pares:
+                conflictos.append(
+                    f"La asignación (tarea {par[0]}, recurso {par[1]}) ya existe")
+    return conflictos
+
+
+def aplicar_plan(plan, log=None):
+    """
+    Escribe exactamente lo que dice el plan, por lotes. Si la base cambió
+    desde que se calculó se lanza PlanDesactualizado sin escribir nada.
+    Devuelve los conteos y los ids de las tareas tocadas; debe llamarse
+    dentro de una transacción.
+    """
+    log = log or (lambda mensaje: None)
+    conflictos = _conflictos(plan)
+    if conflictos:
+        raise PlanDesactualizado(conflictos)
+
+    conteos = dict.fromkeys([
+        "tareas_creadas", "recursos_creados", "recursos_actualizados",
+        "asignaciones_creadas", "asignaciones_actualizadas",
+        "asignaciones_eliminadas"], 0)
+    tocadas = set()
+
+    # 1. Tareas
+    log(" > Procesando Tareas (PerformanceTable)...")
+    nuevas = [
+        PerformanceTable(actividad=t["actividad"], unidad=t["unidad"],
+                         codigo=t["codigo"], categoria='Importado')
+        for t in plan["tareas_nuevas"]
+    ]
+    if nuevas:
+        PerformanceTable.objects.bulk_create(nuevas, batch_size=BATCH_SIZE)
+        conteos["tareas_creadas"] = len(nuevas)
+        log(f"   + Se crearon {len(nuevas)} nuevas tareas.")
+    task_ids = {t.actividad: t.id for t in nuevas}
+
+    # 2. Recursos
+    log(" > Procesando Recursos (ResourceChart)...")
+    res_to_create = []
+    for r in plan["recursos_nuevos"]:
+        res = ResourceChart(nombre=r["nombre"], unidad=r["unidad"])
+        if r["categoria"]:
+            res.categoria = r["categoria"]
+        res_to_create.append(res)
+    res_to_update = [
+        ResourceChart(id=r["id"], unidad=r["unidad"][1], categoria=r["categoria"][1])
+        for r in plan["recursos_cambiados"]
+    ]
+
+    if res_to_create:
+        ResourceChart.objects.bulk_create(res_to_create, batch_size=BATCH_SIZE)
+        conteos["recursos_creados"] = len(res_to_create)
+        log(f"   + Se crearon {len(res_to_create)} nuevos recursos.")
+    if res_to_update:
+        ResourceChart.objects.bulk_update(
+            res_to_update, ['unidad', 'categoria'], batch_size=BATCH_SIZE)
+        conteos["recursos_actualizados"] = len(res_to_update)
+        log(f"   ~ Se actualizaron {len(res_to_update)} recursos.")
+    res_ids = {res.nombre: res.id for res in res_to_create}
+
+    # 3. Asignaciones
+    log(" > Procesando Asignaciones (QuantifiedResource)...")
+    qr_to_create = []
+    for a in plan["asignaciones_nuevas"]:
+        pt_id = a["tarea_id"] or task_ids[a["tarea"]]
+        qr_to_create.append(QuantifiedResource(
+            performance_table_id=pt_id,
+            recurso_id=a["recurso_id"] or res_ids[a["recurso"]],
+            cantidad=a["cantidad"]))
+        tocadas.add(pt_id)
+    qr_to_update = [
+        QuantifiedResource(id=a["id"], cantidad=a["cantidad"][1])
+        for a in plan["asignaciones_cambiadas"]
+    ]
+    qr_to_delete = [a["id"] for a in plan["asignaciones_huerfanas"]
+                    ] if plan["eliminar_huerfanas"] else []
+
+    if qr_to_create:
+        QuantifiedResource.objects.bulk_create(
+            qr_to_create, batch_size=BATCH_SIZE)
+        conteos["asignaciones_creadas"] = len(qr_to_create)
+        log(f"   + Se asignaron {len(qr_to_create)} nuevos recursos a tareas.")
+    if qr_to_update:
+        QuantifiedResource.objects.bulk_update(
+            qr_to_update, ['cantidad'], batch_size=BATCH_SIZE)
+        conteos["asignaciones_actualizadas"] = len(qr_to_update)
+        log(f"   ~ Se actualizaron rendimientos en {len(qr_to_update)} asignaciones.")
+    if qr_to_delete:
+        for lote in _en_lotes(qr_to_delete):
+            QuantifiedResource.objects.filter(id__in=lote).delete()
+        conteos["asignaciones_eliminadas"] = len(qr_to_delete)
+        log(f"   - Se eliminaron {len(qr_to_delete)} asignaciones huérfanas.")
+
+    # Tareas cuyo documento o contadores pueden haber cambiado
+    tocadas.update(a["tarea_id"] for a in plan["asignaciones_cambiadas"])
+    if plan["eliminar_huerfanas"]:
+        tocadas.update(a["tarea_id"] for a in plan["asignaciones_huerfanas"])
+    recursos_cambiados = [r["id"] for r in plan["recursos_cambiados"]]
+    for lote in _en_lotes(recursos_cambiados):
+        tocadas.update(QuantifiedResource.objects.filter(
+            recurso_id__in=lote).values_list("performance_table_id", flat=True))
+    tocadas.update(task_ids.values())
+    return conteos, list(tocadas)
+
+
+def sincronizar(filas, log=None, importacion=None):
+    """
+    Crea o actualiza tareas, recursos y asignaciones a partir de las filas
+    de un parser: planear y aplicar_plan en un solo paso. La primera
+    aparición de cada tarea, recurso o par (tarea, recurso) define sus
+    datos, también entre lotes de una misma `importacion`. Debe llamarse
+    dentro de una transacción.
+    """
+    resultado = aplicar_plan(planear(filas, importacion), log=log)
+    if importacion is not None:
+        _marcar_vistos(importacion, filas)
+    return resultado
+
+
+def planificar(filas, origen, salida_json=None, salida_csv=None, eliminar_huerfanas=False):
+    """Modo dry-run de los importadores: calcula el plan y lo guarda."""
+    plan = planear(filas, eliminar_huerfanas=eliminar_huerfanas)
+    plan["origen"] = origen
+    plan["creado"] = timezone.now().isoformat()
+    for salida in (salida_json, salida_csv):
+        if salida:
+            escribir_plan(plan, salida)
+    return plan
+
+
+def escribir_plan(plan, ruta):
+    """JSON completo (se puede aplicar) o CSV plano para revisar."""
+    if not ruta.lower().endswith(".csv"):
+        with open(ruta, "w", encoding="utf-8") as f:
+            json.dump(plan, f, ensure_ascii=False, indent=1)
+        return
+
+    with open(ruta, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(["tipo", "id", "tarea", "recurso",
+                        "campo", "antes", "despues"])
+        for t in plan["tareas_nuevas"]:
+            writer.writerow(["tarea_nueva", "", t["actividad"], "",
+                             "unidad", "", t["unidad"]])
+        for r in plan["recursos_nuevos"]:
+            writer.writerow(["recurso_nuevo", "", "", r["nombre"],
+                             "unidad/categoria", "", f'{r["unidad"]}/{r["categoria"]}'])
+        for r in plan["recursos_cambiados"]:
+            for campo in ("unidad", "categoria"):
+                antes, despues = r[campo]
+                if antes != despues:
+                    writer.writerow(["recurso_cambiado", r["id"], "", r["nombre"],
+                                     campo, antes, despues])
+        for a in plan["asignaciones_nuevas"]:
+            writer.writerow(["asignacion_nueva", "", a["tarea"], a["recurso"],
+                             "cantidad", "", a["cantidad"]])
+        for a in plan["asignaciones_cambiadas"]:
+            writer.writerow(["asignacion_cambiada", a["id"], a["tarea"], a["recurso"],
+                             "cantidad", *a["cantidad"]])
+        for a in plan["asignaciones_huerfanas"]:
+            writer.writerow(["asignacion_huerfana", a["id"], a["tarea"], a["recurso"],
+                             "cantidad", a["cantidad"],
+                             "" if plan["eliminar_huerfanas"] else a["cantidad"]])
+
+
+def leer_filas(ruta, desde=1, encoding="utf-8-sig"):
+    """
+    Genera (número de fila, valores) leyendo el archivo de a una fila:
+    openpyxl en modo read_only para Excel, csv.reader para CSV. Las filas
+    se numeran desde 1 como en la hoja.
+    """
+    if ruta.lower().endswith(".csv"):
+        with open(ruta, newline="", encoding=encoding) as f:
+            for n, valores in enumerate(csv.reader(f), start=1):
+                if n >= desde:
+                    yield n, valores
+        return
+
+    wb = load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        hoja = wb.worksheets[0]
+        for n, valores in enumerate(hoja.iter_rows(min_row=desde, values_only=True), start=desde):
+            yield n, valores
+    finally:
+        wb.close()
+
+
+def ruta_checkpoint(ruta):
+    return f"{ruta}.checkpoint.json"
+
+
+def _huella(ruta):
+    # Si el archivo cambia, el checkpoint deja de servir
+    st = os.stat(ruta)
+    return [st.st_size, int(st.st_mtime)]
+
+
+def leer_checkpoint(ruta):
+    try:
+        with open(ruta_checkpoint(ruta)) as f:
+            checkpoint = json.load(f)
+    except FileNotFoundError:
+        return None
+    if checkpoint.get("huella") != _huella(ruta):
+        raise ValueError(
+            "El archivo cambió desde el último checkpoint; borra "
+            f"{ruta_checkpoint(ruta)} para empezar de nuevo")
+    return checkpoint
+
+
+def guardar_checkpoint(ruta, fila, estado):
+    temporal = f"{ruta_checkpoint(ruta)}.tmp"
+    with open(temporal, "w") as f:
+        json.dump({"fila": fila, "estado": estado,
+                   "huella": _huella(ruta)}, f)
+    os.replace(temporal, ruta_checkpoint(ruta))
+
+
+def importar_por_lotes(ruta, parser, primera_fila=1, batch_size=5000,
+                       reanudar=False, encoding="utf-8-sig", log=None):
+    """
+    Importa el archivo en lotes de `batch_size` filas sin cargarlo entero: cada
+    lote se parsea con parser(df, estado) -> (filas, estado), se sincroniza
+    en su propia transacción y deja un checkpoint con la última fila
+    confirmada. Con reanudar=True se continúa desde ese checkpoint.
+    Lo que ya definieron los lotes anteriores queda en ImportacionVisto.
+    Devuelve los conteos acumulados.
+    """
+    log = log or (lambda mensaje: None)
+    estado = None
+    importacion = hashlib.sha1(os.path.abspath(ruta).encode()).hexdigest()
+    vistos = ImportacionVisto.objects.filter(importacion=importacion)
+    desde = primera_fila
+    checkpoint = leer_checkpoint(ruta) if reanudar else None
+    if checkpoint:
+        desde = checkpoint["fila"] + 1
+        estado = checkpoint["estado"]
+        log(f" > Reanudando desde la fila {desde}")
+    else:
+        vistos.delete()
+
+    totales = {}
+    lote = []
+    ultima = desde - 1
+
+    def procesar():
+        nonlocal estado
+        filas, estado = parser(pd.DataFrame(lote), estado)
+        if not filas.empty:
+            with transaction.atomic():
+                conteos, task_ids = sincronizar(filas, importacion=importacion)
+            # bulk_create/bulk_update no disparan señales
+            refresh_activity_summaries(task_ids)
+            for clave, valor in conteos.items():
+                totales[clave] = totales.get(clave, 0) + valor
+        guardar_checkpoint(ruta, ultima, estado)
+        log(f"   . filas hasta la {ultima} confirmadas")
+        lote.clear()
+
+    for ultima, valores in leer_filas(ruta, desde, encoding):
+        lote.append(valores)
+        if len(lote) >= batch_size:
+            procesar()
+    if lote:
+        procesar()
+
+    if os.path.exists(ruta_checkpoint(ruta)):
+        os.remove(ruta_checkpoint(ruta))
+    vistos.delete()
+    return totales
@@ -0,0 +1,235 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+from loguru import logger
+from .models import PerformanceTable, QuantifiedResource, ReportJob
+from .reports import ReportError, generar_reporte
+from . import report_cache
+
+# Clave del advisory lock que serializa el reclamo de trabajos
+RECLAMO_LOCK_ID = 0x7265706f  # "repo"
+# Cada cuánto purga un proceso los trabajos viejos (segundos)
+PURGA_INTERVALO = 60 * 60
+
+
+def encolar(ids):
+    job = ReportJob.objects.create(ids=sorted(set(ids)))
+    transaction.on_commit(get_backend().notificar)
+    return job
+
+
+def _reclamables(limite):
+    # Pendientes o abandonados por un worker caído (más de TIMEOUT procesando)
+    return ReportJob.objects.filter(
+        Q(estado=ReportJob.Estado.PENDIENTE) |
+        Q(estado=ReportJob.Estado.PROCESANDO, started_at__lt=limite))
+
+
+def _limite_abandono():
+    return timezone.now() - timedelta(
+        seconds=settings.PERFORMANCE_REPORT_JOB_TIMEOUT)
+
+
+def hay_pendientes():
+    return _reclamables(_limite_abandono()).exists()
+
+
+def reclamar_siguiente():
+    """
+    Toma el pendiente más antiguo (o uno abandonado por un worker caído)
+    respetando el máximo global en proceso.
+    """
+    limite = _limite_abandono()
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            # Contar y reclamar bajo el mismo lock: dos workers no pueden
+            # ver a la vez un lugar libre y pasar ambos del máximo
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_advisory_xact_lock(%s)', [RECLAMO_LOCK_ID])
+        en_proceso = ReportJob.objects.filter(
+            estado=ReportJob.Estado.PROCESANDO, started_at__gte=limite).count()
+        if en_proceso >= settings.PERFORMANCE_REPORT_JOB_MAX_RUNNING:
+            return None
+
+        job = _reclamables(limite).select_for_update(
+            skip_locked=True).order_by('created_at').first()
+        if job is None:
+            return None
+
+        job.estado = ReportJob.Estado.PROCESANDO
+        job.progreso = 0
+        job.started_at = timezone.now()
+        job.save(update_fields=['estado', 'progreso', 'started_at'])
+    return job
+
+
+def procesar(job):
+    actividades = list(PerformanceTable.objects.filter(id__in=job.ids).prefetch_related(
+        Prefetch('quantifiedresource_set',
+                 queryset=QuantifiedResource.objects.select_related('recurso'))).order_by('id'))
+    if not actividades:
+        return terminar(job, ReportJob.Estado.ERROR,
+                        error="No se encontraron actividades con los IDs proporcionados")
+
+    clave = report_cache.clave_reporte(actividades)
+    archivo = report_cache.buscar(clave, job=True)
+    if archivo is not None:
+        archivo.close()
+        return terminar(job, ReportJob.Estado.COMPLETADO, clave=clave)
+
+    def progreso(hechos, total):
+        # Se reserva el último tramo para la subida del archivo
+        ReportJob.objects.filter(pk=job.pk).update(
+            progreso=int(hechos * 95 / total))
+
+    try:
+        archivo = generar_reporte(actividades, progreso=progreso)
+    except ReportError as e:
+        return terminar(job, ReportJob.Estado.ERROR, error=str(e))
+
+    try:
+        if not report_cache.guardar(clave, archivo, job=True):
+            return terminar(job, ReportJob.Estado.ERROR,
+                            error="No se pudo almacenar el PDF")
+    finally:
+        archivo.close()
+    return terminar(job, ReportJob.Estado.COMPLETADO, clave=clave)
+
+
+def terminar(job, estado, clave='', error=''):
+    job.estado = estado
+    job.clave = clave
+    job.error = error
+    job.progreso = 100 if estado == ReportJob.Estado.COMPLETADO else job.progreso
+    job.finished_at = timezone.now()
+    job.save(update_fields=['estado', 'clave',
+             'error', 'progreso', 'finished_at'])
+    return job
+
+
+def procesar_pendientes():
+    procesados = 0
+    while True:
+        job = reclamar_siguiente()
+        if job is None:
+            return procesados
+        try:
+            procesar(job)
+        except Exception as e:
+            logger.exception(f"Error procesando el reporte {job.id}")
+            terminar(job, ReportJob.Estado.ERROR, error=str(e))
+        procesados += 1
+
+
+def purgar_terminados():
+    """Borra los trabajos terminados hace más de PERFORMANCE_REPORT_JOB_RETENTION."""
+    limite = timezone.now() - timedelta(
+        seconds=settings.PERFORMANCE_REPORT_JOB_RETENTION)
+    borrados, _ = ReportJob.objects.filter(
+        estado__in=[ReportJob.Estado.COMPLETADO, ReportJob.Estado.ERROR],
+        finished_at__lt=limite).delete()
+    return borrados
+
+
+_ultima_purga = None
+
+
+def mantenimiento():
+    # Purga como mucho una vez cada PURGA_INTERVALO por proceso
+    global _ultima_purga
+    ahora = time.monotonic()
+    if _ultima_purga is not None and ahora - _ultima_purga < PURGA_INTERVALO:
+        return 0
+    _ultima_purga = ahora
+    return purgar_terminados()
+
+
+class ThreadJobBackend:
+    """
+    Procesa la cola dentro del propio worker web, con pocos hilos. El PDF
+    en sí se genera en el pool de procesos de reports.py. Un hilo vigilante
+    revisa la cola cada PERFORMANCE_REPORT_JOB_POLL_INTERVAL: retoma los
+    trabajos que quedaron esperando por el máximo global o que abandonó un
+    worker caído aunque no llegue ningún trabajo nuevo, y purga los viejos.
+    """
+
+    def __init__(self, max_workers, intervalo):
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='reportes')
+        self.intervalo = intervalo
+        self.lock = threading.Lock()
+        self.en_cola = False
+        self.vigilante = None
+
+    def notificar(self):
+        self._iniciar_vigilante()
+        # Un solo vaciado en espera a la vez; el que corre sigue hasta que
+        # la cola quede vacía
+        with self.lock:
+            if self.en_cola:
+                return
+            self.en_cola = True
+        self.executor.submit(self._vaciar)
+
+    def _iniciar_vigilante(self):
+        with self.lock:
+            if self.vigilante is not None:
+                return
+            self.vigilante = threading.Thread(
+                target=self._vigilar, name='reportes-vigilante', daemon=True)
+        self.vigilante.start()
+
+    def _vigilar(self):
+        while True:
+            time.sleep(self.intervalo)
+            try:
+                close_old_connections()
+                mantenimiento()
+                pendientes = hay_pendientes()
+            except Exception:
+                logger.exception("Error revisando la cola de reportes")
+                pendientes = False
+            finally:
+                connection.close()
+            if pendientes:
+                self.notificar()
+
+    def _vaciar(self):
+        with self.lock:
+            self.en_cola = False
+        try:
+            close_old_connections()
+            procesar_pendientes()
+        except Exception:
+            logger.exception("Error vaciando la cola de reportes")
+        finally:
+            connection.close()
+
+
+class DatabaseJobBackend:
+    """Solo encola: los procesa `manage.py procesar_reportes`."""
+
+    def notificar(self):
+        pass
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if settings.PERFORMANCE_REPORT_JOB_BACKEND == 'database':
+                _backend = DatabaseJobBackend()
+            else:
+                _backend = ThreadJobBackend(
+                    settings.PERFORMANCE_REPORT_JOB_THREADS,
+                    settings.PERFORMANCE_REPORT_JOB_POLL_INTERVAL)
+        return _backend
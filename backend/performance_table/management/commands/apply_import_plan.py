@@ -0,0 +1,40 @@
+import json
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from performance_table.catalog import bump_catalog_version
+from performance_table.importer import PlanDesactualizado, aplicar_plan
+from performance_table.summaries import refresh_activity_summaries
+
+
+class Command(BaseCommand):
+    help = "Aplica un plan generado con import_projects(_updated) --plan"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--plan", type=str, required=True,
+                            help="Ruta del plan en JSON")
+
+    def handle(self, *args, **options):
+        try:
+            with open(options["plan"], encoding="utf-8") as f:
+                plan = json.load(f)
+        except (OSError, ValueError) as e:
+            self.stdout.write(self.style.ERROR(f"Error leyendo el plan: {e}"))
+            return
+
+        self.stdout.write(
+            f"Aplicando plan de {plan.get('origen', '?')} ({plan.get('creado', '?')})")
+        try:
+            with transaction.atomic():
+                conteos, task_ids = aplicar_plan(plan, log=self.stdout.write)
+        except PlanDesactualizado as e:
+            self.stdout.write(self.style.ERROR(str(e)))
+            for conflicto in e.conflictos[:20]:
+                self.stdout.write(f"   ! {conflicto}")
+            self.stdout.write("No se aplicó ningún cambio; vuelve a generar el plan.")
+            return
+
+        # bulk_create/bulk_update no disparan señales
+        refresh_activity_summaries(task_ids)
+        bump_catalog_version()
+
+        self.stdout.write(self.style.SUCCESS("Plan aplicado con éxito."))
@@ -0,0 +1,127 @@
+import os
+import random
+import tempfile
+import time
+import pandas as pd
+from openpyxl import Workbook
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from performance_table.importer import parsear_jerarquico, sincronizar
+
+
+def parse_legado(df):
+    # Recorrido anterior: iterrows más una búsqueda lineal por cada nombre
+    rows = []
+    current_task_name = ""
+    current_task_unit = ""
+    for _, row in df.fillna("").iterrows():
+        col1 = str(row[1]).strip()
+        col2 = str(row[2]).strip()
+        col3 = str(row[3]).strip()
+        col4 = str(row[4]).strip()
+        if not col1 or col1.lower() in ["recursos", "cadeco 2024"]:
+            continue
+        if col2.lower() == "rendimiento" or col3.lower() == "unidad" or col4.lower() == "categoria":
+            continue
+        if col2 == "" and col3 != "":
+            current_task_name = col1
+            current_task_unit = col3
+        elif col2 != "" and current_task_name:
+            try:
+                valor = float(col2)
+            except ValueError:
+                continue
+            rows.append({"tarea_nombre": current_task_name, "tarea_unidad": current_task_unit,
+                         "recurso_nombre": col1, "recurso_rendimiento": valor,
+                         "recurso_unidad": col3, "recurso_categoria": col4})
+
+    for name in set(r["tarea_nombre"] for r in rows):
+        next((r["tarea_unidad"] for r in rows if r["tarea_nombre"] == name), "")
+    for name in set(r["recurso_nombre"] for r in rows):
+        next((r for r in rows if r["recurso_nombre"] == name), None)
+    return rows
+
+
+class Command(BaseCommand):
+    help = "Mide el importador jerárquico sobre un libro sintético (por defecto 200k filas)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=200_000,
+                            help="Filas aproximadas del libro sintético")
+        parser.add_argument("--resources", type=int, default=5000,
+                            help="Recursos distintos")
+        parser.add_argument("--legacy-rows", type=int, default=20_000,
+                            help="Filas sobre las que se mide el parser anterior (0 = omitir)")
+        parser.add_argument("--sync", action="store_true",
+                            help="Mide también la escritura en BD (se revierte al final)")
+        parser.add_argument("--keep", type=str,
+                            help="Guarda el libro generado en esta ruta")
+
+    def handle(self, *args, **options):
+        ruta = options["keep"] or os.path.join(
+            tempfile.gettempdir(), "benchmark_import.xlsx")
+
+        inicio = time.perf_counter()
+        filas = self.generar_libro(ruta, options["rows"], options["resources"])
+        self.stdout.write(
+            f"Libro sintético: {filas} filas ({time.perf_counter() - inicio:.1f} s)")
+
+        try:
+            inicio = time.perf_counter()
+            df = pd.read_excel(ruta, header=None, dtype=object)
+            self.reportar("lectura (pd.read_excel)", inicio)
+
+            inicio = time.perf_counter()
+            parseadas = parsear_jerarquico(df)
+            self.reportar(f"parser vectorizado ({len(parseadas)} recursos)", inicio)
+
+            if options["legacy_rows"]:
+                parcial = df.head(options["legacy_rows"])
+                inicio = time.perf_counter()
+                legado = parse_legado(parcial)
+                self.reportar(
+                    f"parser anterior, primeras {len(parcial)} filas", inicio)
+                if legado != parsear_jerarquico(parcial).to_dict("records"):
+                    self.stdout.write(self.style.ERROR(
+                        "   ! los parsers no coinciden"))
+
+            if options["sync"]:
+                inicio = time.perf_counter()
+                with transaction.atomic():
+                    conteos, _ = sincronizar(parseadas)
+                    transaction.set_rollback(True)
+                self.reportar("sincronización con la BD (revertida)", inicio)
+                for nombre, valor in conteos.items():
+                    self.stdout.write(f"   {nombre}: {valor}")
+        finally:
+            if not options["keep"]:
+                os.remove(ruta)
+
+    def generar_libro(self, ruta, total, n_recursos):
+        rnd = random.Random(0)
+        unidades = ["m2", "m3", "ml", "pza", "kg", "glb"]
+        categorias = ["Materiales", "Mano de Obra", "Herramientas y Equipo"]
+        recursos = [(f"Recurso {i}", rnd.choice(unidades), rnd.choice(categorias))
+                    for i in range(n_recursos)]
+
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append([None, "CADECO 2024"])
+        filas = 1
+        tarea = 0
+        while filas < total:
+            tarea += 1
+            ws.append([None, f"Tarea {tarea}", None, rnd.choice(unidades)])
+            ws.append([None, "Recursos", "Rendimiento", "Unidad", "Categoria"])
+            filas += 2
+            for nombre, unidad, categoria in rnd.sample(recursos, rnd.randint(3, 12)):
+                ws.append([None, nombre, round(rnd.uniform(0.01, 10), 4), unidad, categoria])
+                filas += 1
+            ws.append([])
+            filas += 1
+        wb.save(ruta)
+        return filas
+
+    def reportar(self, titulo, inicio):
+        self.stdout.write(self.style.SUCCESS(
+            f"{titulo}: {time.perf_counter() - inicio:.2f} s"))
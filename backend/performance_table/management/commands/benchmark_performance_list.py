@@ -0,0 +1,85 @@
+import statistics
+import time
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIRequestFactory
+from performance_table.catalog import bump_catalog_version
+from performance_table.models import PerformanceTable
+from performance_table.views import PerformanceTableViewSet
+
+
+class Command(BaseCommand):
+    help = "Mide consultas por petición y latencia p95 al paginar /api/performance/performance/"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--file", type=str,
+                            help="Importa primero el Excel indicado (ej. rendimientos.xlsx)")
+        parser.add_argument("--rounds", type=int, default=5,
+                            help="Veces que se recorre el catálogo completo")
+        parser.add_argument("--search", nargs="*", default=["h", "ho", "hor"],
+                            help="Búsquedas adicionales a paginar (tipo search-as-you-type)")
+
+    def handle(self, *args, **options):
+        if options["file"]:
+            call_command("import_projects_updated", file=options["file"])
+
+        total = PerformanceTable.objects.count()
+        if not total:
+            self.stdout.write(self.style.WARNING(
+                "No hay actividades. Usa --file rendimientos.xlsx"))
+            return
+
+        self.stdout.write(f"Catálogo: {total} actividades")
+        view = PerformanceTableViewSet.as_view({'get': 'list'})
+        factory = APIRequestFactory()
+
+        with override_settings(ALLOWED_HOSTS=['*']):
+            # "antes": las facetas se recalculan en cada petición
+            antes = self.recorrer(view, factory, options, sin_cache=True)
+            despues = self.recorrer(view, factory, options, sin_cache=False)
+
+        self.reportar("antes (sin cache de facetas)", antes)
+        self.reportar("después (facetas versionadas)", despues)
+
+    def recorrer(self, view, factory, options, sin_cache):
+        queries = []
+        tiempos = []
+        busquedas = [None] + list(options["search"])
+
+        for _ in range(options["rounds"]):
+            for termino in busquedas:
+                page = 1
+                while page:
+                    params = {'page': page}
+                    if termino:
+                        params['search'] = termino
+                    if sin_cache:
+                        bump_catalog_version()
+
+                    request = factory.get('/api/performance/performance/', params)
+                    with CaptureQueriesContext(connection) as ctx:
+                        inicio = time.perf_counter()
+                        response = view(request)
+                        response.render()
+                        tiempos.append(time.perf_counter() - inicio)
+                    queries.append(len(ctx.captured_queries))
+
+                    page = page + 1 if response.data.get('next') else None
+
+        return queries, tiempos
+
+    def reportar(self, titulo, resultado):
+        queries, tiempos = resultado
+        tiempos_ms = sorted(t * 1000 for t in tiempos)
+        p95 = statistics.quantiles(tiempos_ms, n=20)[18] if len(
+            tiempos_ms) > 1 else tiempos_ms[0]
+
+        self.stdout.write(self.style.SUCCESS(titulo))
+        self.stdout.write(f"   peticiones:          {len(queries)}")
+        self.stdout.write(
+            f"   consultas/petición:  {statistics.mean(queries):.2f} (máx {max(queries)})")
+        self.stdout.write(
+            f"   latencia p50:        {statistics.median(tiempos_ms):.2f} ms")
+        self.stdout.write(f"   latencia p95:        {p95:.2f} ms")
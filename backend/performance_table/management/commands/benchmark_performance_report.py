@@ -0,0 +1,81 @@
+import copy
+import io
+import multiprocessing
+import resource
+import time
+from itertools import cycle, islice
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Prefetch
+from performance_table.models import PerformanceTable, QuantifiedResource
+from performance_table.pdf_worker import html_a_pdf
+from performance_table.reports import (generar_reporte, marcar_saltos_pagina,
+                                       obtener_ruta_logo, renderizar_html, reset_pool)
+
+
+def cargar_actividades(cantidad):
+    base = list(PerformanceTable.objects.prefetch_related(
+        Prefetch('quantifiedresource_set',
+                 queryset=QuantifiedResource.objects.select_related('recurso'))).order_by('id'))
+    # Si el catálogo es más chico que la muestra, se repiten actividades
+    return [copy.copy(item) for item in islice(cycle(base), cantidad)]
+
+
+def generar_monolitico(actividades):
+    # Implementación anterior: todo el HTML y todo el PDF en el proceso web
+    actividades = marcar_saltos_pagina(actividades)
+    html = renderizar_html(actividades, obtener_ruta_logo())
+    return io.BytesIO(html_a_pdf(html))
+
+
+def medir(modo, cantidad, conn):
+    actividades = cargar_actividades(cantidad)
+    inicio = time.perf_counter()
+    if modo == 'monolitico':
+        archivo = generar_monolitico(actividades)
+    else:
+        archivo = generar_reporte(actividades)
+    duracion = time.perf_counter() - inicio
+    tamano = len(archivo.read())
+    archivo.close()
+    reset_pool(wait=True)
+
+    propio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    hijos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    conn.send((duracion, propio, hijos, tamano))
+    conn.close()
+
+
+class Command(BaseCommand):
+    help = "Mide tiempo y RSS máximo al generar reportes PDF de rendimientos"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="*",
+                            default=[10, 100, 1000])
+        parser.add_argument("--modes", nargs="*", default=["monolitico", "motor"],
+                            choices=["monolitico", "motor"])
+
+    def handle(self, *args, **options):
+        if not PerformanceTable.objects.exists():
+            self.stdout.write(self.style.WARNING(
+                "No hay actividades. Importa primero rendimientos.xlsx"))
+            return
+
+        ctx = multiprocessing.get_context('fork')
+        self.stdout.write(
+            f"{'modo':<12}{'actividades':>12}{'segundos':>10}{'RSS web MB':>12}{'RSS pool MB':>13}{'PDF KB':>9}")
+
+        for cantidad in options["sizes"]:
+            for modo in options["modes"]:
+                # Cada medición en un proceso nuevo para que ru_maxrss sea propio
+                connections.close_all()
+                recibir, enviar = ctx.Pipe(duplex=False)
+                proceso = ctx.Process(
+                    target=medir, args=(modo, cantidad, enviar))
+                proceso.start()
+                duracion, propio, hijos, tamano = recibir.recv()
+                proceso.join()
+
+                self.stdout.write(
+                    f"{modo:<12}{cantidad:>12}{duracion:>10.2f}"
+                    f"{propio / 1024:>12.1f}{hijos / 1024:>13.1f}{tamano / 1024:>9.0f}")
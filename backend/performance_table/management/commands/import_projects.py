@@ -2,9 +2,12 @@ import csv
 import hashlib
 import os
 import pandas as pd
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 from performance_table.models import PerformanceTable, QuantifiedResource, ResourceChart
+from performance_table.catalog import bump_catalog_version
+from performance_table.importer import importar_por_lotes, leer_filas, parsear_plano, planificar, resumen_plan
+from performance_table.summaries import refresh_activity_summaries
 
 class Command(BaseCommand):
     help = "Importa proyectos masivamente optimizando consultas a la BD"
@@ -12,14 +15,38 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument("--file", type=str, required=True, help="Ruta del archivo")
         parser.add_argument("--encoding", type=str, default="utf-8-sig", help="Encoding")
+        parser.add_argument("--stream", action="store_true",
+                            help="Lee el archivo fila a fila, sin CSV temporal, y confirma por lotes")
+        parser.add_argument("--batch-size", type=int, default=5000,
+                            help="Filas por lote en modo --stream")
+        parser.add_argument("--resume", action="store_true",
+                            help="Con --stream, continúa desde el último checkpoint")
+        parser.add_argument("--plan", type=str,
+                            help="No escribe en la BD: guarda el plan de cambios en este JSON (ver apply_import_plan)")
+        parser.add_argument("--report", type=str,
+                            help="No escribe en la BD: guarda el plan de cambios en este CSV para revisarlo")
+        parser.add_argument("--prune", action="store_true",
+                            help="Con --plan, el plan también elimina las asignaciones huérfanas")
 
     def handle(self, *args, **options):
         ruta = options["file"]
         encoding = options["encoding"]
         temp_csv_created = False
-        
+        if options["stream"] and (options["plan"] or options["report"]):
+            # El modo streaming escribe lote a lote; un plan no escribe nada
+            raise CommandError(
+                "--stream no se puede combinar con --plan ni --report.")
+        if options["prune"] and not options["plan"]:
+            raise CommandError("--prune solo se puede usar con --plan.")
+
         self.stdout.write(f"Iniciando importación masiva desde: {ruta}")
 
+        if options["plan"] or options["report"]:
+            return self.planificar_archivo(ruta, options)
+
+        if options["stream"]:
+            return self.importar_streaming(ruta, options)
+
         if ruta.lower().endswith(('.xlsx', '.xls')):
             self.stdout.write("   > Detectado archivo Excel. Convirtiendo a CSV...")
             try:
@@ -163,6 +190,10 @@ class Command(BaseCommand):
                     QuantifiedResource.objects.bulk_update(qr_to_update, ['cantidad'])
                     self.stdout.write(f"   ~ Se actualizaron cantidades en {len(qr_to_update)} asignaciones.")
 
+            # bulk_create/bulk_update no disparan señales
+            refresh_activity_summaries(t.id for t in task_map.values())
+            bump_catalog_version()
+
         except FileNotFoundError:
             self.stdout.write(self.style.ERROR(f"No se encontró el archivo: {ruta}"))
         except Exception as e:
@@ -172,3 +203,52 @@ class Command(BaseCommand):
             if temp_csv_created and os.path.exists(ruta):
                 os.remove(ruta)
                 self.stdout.write("Limpieza de temporales completada.")
+
+    def importar_streaming(self, ruta, options):
+        try:
+            # Los encabezados siempre se leen de la primera fila, también al reanudar
+            _, encabezados = next(leer_filas(ruta, encoding=options["encoding"]))
+            columnas = {str(nombre).strip(): i for i, nombre in enumerate(encabezados) if nombre is not None}
+
+            conteos = importar_por_lotes(
+                ruta, lambda df, estado: (parsear_plano(df, columnas), estado),
+                primera_fila=2,
+                batch_size=options["batch_size"],
+                reanudar=options["resume"],
+                encoding=options["encoding"],
+                log=self.stdout.write)
+        except StopIteration:
+            self.stdout.write("El archivo está vacío o no tiene datos válidos.")
+            return
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"Error crítico: {str(e)}"))
+            self.stdout.write("Los lotes confirmados se conservan; vuelve a ejecutar con --resume.")
+            return
+        finally:
+            bump_catalog_version()
+
+        for nombre, valor in conteos.items():
+            self.stdout.write(f"   {nombre}: {valor}")
+
+    def planificar_archivo(self, ruta, options):
+        try:
+            filas = [valores for _, valores in leer_filas(ruta, encoding=options["encoding"])]
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f"Error leyendo el archivo: {e}"))
+            return
+        if len(filas) < 2:
+            self.stdout.write("El archivo está vacío o no tiene datos válidos.")
+            return
+
+        columnas = {str(nombre).strip(): i for i, nombre in enumerate(filas[0]) if nombre is not None}
+        self.planificar(parsear_plano(pd.DataFrame(filas[1:]), columnas), ruta, options)
+
+    def planificar(self, filas, ruta, options):
+        plan = planificar(filas, ruta, options["plan"], options["report"],
+                          eliminar_huerfanas=options["prune"])
+        self.stdout.write(" > Plan de cambios (no se escribió nada):")
+        for tipo, cantidad in resumen_plan(plan).items():
+            self.stdout.write(f"   {tipo}: {cantidad}")
+        for salida in (options["plan"], options["report"]):
+            if salida:
+                self.stdout.write(self.style.SUCCESS(f"Plan guardado en {salida}"))
@@ -1,8 +1,9 @@
-import hashlib
 import pandas as pd
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
-from performance_table.models import PerformanceTable, QuantifiedResource, ResourceChart
+from performance_table.catalog import bump_catalog_version
+from performance_table.importer import importar_por_lotes, parsear_jerarquico, parsear_jerarquico_lote, planificar, resumen_plan, sincronizar
+from performance_table.summaries import refresh_activity_summaries
 
 
 class Command(BaseCommand):
@@ -11,192 +12,85 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument("--file", type=str, required=True,
                             help="Ruta del archivo Excel")
+        parser.add_argument("--stream", action="store_true",
+                            help="Lee el Excel fila a fila y confirma por lotes (memoria constante)")
+        parser.add_argument("--batch-size", type=int, default=5000,
+                            help="Filas por lote en modo --stream")
+        parser.add_argument("--resume", action="store_true",
+                            help="Con --stream, continúa desde el último checkpoint")
+        parser.add_argument("--plan", type=str,
+                            help="No escribe en la BD: guarda el plan de cambios en este JSON (ver apply_import_plan)")
+        parser.add_argument("--report", type=str,
+                            help="No escribe en la BD: guarda el plan de cambios en este CSV para revisarlo")
+        parser.add_argument("--prune", action="store_true",
+                            help="Con --plan, el plan también elimina las asignaciones huérfanas")
 
     def handle(self, *args, **options):
         ruta = options["file"]
+        if options["stream"] and (options["plan"] or options["report"]):
+            # El modo streaming escribe lote a lote; un plan no escribe nada
+            raise CommandError(
+                "--stream no se puede combinar con --plan ni --report.")
+        if options["prune"] and not options["plan"]:
+            raise CommandError("--prune solo se puede usar con --plan.")
         self.stdout.write(f"Iniciando importación masiva desde: {ruta}")
 
+        if options["stream"]:
+            return self.importar_streaming(ruta, options)
+
         try:
-            df = pd.read_excel(ruta, header=None).fillna("")
+            df = pd.read_excel(ruta, header=None, dtype=object)
         except Exception as e:
             self.stdout.write(self.style.ERROR(
                 f"Error leyendo el archivo Excel: {e}"))
             return
 
-        rows = []
-        current_task_name = ""
-        current_task_unit = ""
-
-        for index, row in df.iterrows():
-            col1_name = str(row[1]).strip() if len(row) > 1 else ""
-            col2_rendimiento = str(row[2]).strip() if len(row) > 2 else ""
-            col3_unidad = str(row[3]).strip() if len(row) > 3 else ""
-            col4_categoria = str(row[4]).strip() if len(row) > 4 else ""
-
-            if not col1_name or col1_name.lower() in ["recursos", "cadeco 2024"]:
-                continue
-
-            if col2_rendimiento.lower() == "rendimiento" or col3_unidad.lower() == "unidad" or col4_categoria.lower() == "categoria":
-                continue
-
-            if col2_rendimiento == "" and col3_unidad != "":
-                current_task_name = col1_name
-                current_task_unit = col3_unidad
-
-            elif col2_rendimiento != "":
-                if not current_task_name:
-                    continue
-
-                try:
-                    rendimiento_val = float(col2_rendimiento)
-                except ValueError:
-                    continue
-
-                rows.append({
-                    "tarea_nombre": current_task_name,
-                    "tarea_unidad": current_task_unit,
-                    "recurso_nombre": col1_name,
-                    "recurso_rendimiento": rendimiento_val,
-                    "recurso_unidad": col3_unidad,
-                    "recurso_categoria": col4_categoria
-                })
-
-        if not rows:
+        filas = parsear_jerarquico(df)
+        if filas.empty:
             self.stdout.write(self.style.WARNING(
                 "El archivo está vacío o no tiene datos válidos."))
             return
 
-        unique_task_names = set(r["tarea_nombre"] for r in rows)
-        unique_res_names = set(r["recurso_nombre"] for r in rows)
+        if options["plan"] or options["report"]:
+            return self.planificar(filas, ruta, options)
 
         with transaction.atomic():
-            self.stdout.write(" > Procesando Tareas (PerformanceTable)...")
-
-            existing_tasks = PerformanceTable.objects.filter(
-                actividad__in=unique_task_names)
-            task_map = {t.actividad: t for t in existing_tasks}
-
-            tasks_to_create = []
-            for name in unique_task_names:
-                if name not in task_map:
-                    code_hash = hashlib.md5(name.encode()).hexdigest()[
-                        :6].upper()
-                    generated_code = f"TAR-{code_hash}"
-                    unit = next((r["tarea_unidad"]
-                                for r in rows if r["tarea_nombre"] == name), "")
-
-                    tasks_to_create.append(
-                        PerformanceTable(
-                            actividad=name,
-                            unidad=unit,
-                            codigo=generated_code,
-                            categoria='Importado'
-                        )
-                    )
-
-            if tasks_to_create:
-                PerformanceTable.objects.bulk_create(tasks_to_create)
-                self.stdout.write(
-                    f"   + Se crearon {len(tasks_to_create)} nuevas tareas.")
-                all_tasks = PerformanceTable.objects.filter(
-                    actividad__in=unique_task_names)
-                task_map = {t.actividad: t for t in all_tasks}
-
-            self.stdout.write(" > Procesando Recursos (ResourceChart)...")
-
-            existing_resources = ResourceChart.objects.filter(
-                nombre__in=unique_res_names)
-            res_map = {r.nombre: r for r in existing_resources}
-
-            res_to_create = []
-            res_to_update = []
-
-            for name in unique_res_names:
-                match = next(
-                    (r for r in rows if r["recurso_nombre"] == name), None)
-                unit = match["recurso_unidad"] if match else ""
-                cat = match["recurso_categoria"] if match else ""
-
-                if name not in res_map:
-                    res_to_create.append(ResourceChart(
-                        nombre=name, unidad=unit, categoria=cat))
-                else:
-                    res = res_map[name]
-                    changed = False
-                    if unit and res.unit != unit:
-                        res.unit = unit
-                        changed = True
-                    if cat and res.categoria != cat:
-                        res.categoria = cat
-                        changed = True
-                    if changed:
-                        res_to_update.append(res)
+            _, task_ids = sincronizar(filas, log=self.stdout.write)
 
-            if res_to_create:
-                ResourceChart.objects.bulk_create(res_to_create)
-                self.stdout.write(
-                    f"   + Se crearon {len(res_to_create)} nuevos recursos.")
+        # bulk_create/bulk_update no disparan señales
+        refresh_activity_summaries(task_ids)
+        bump_catalog_version()
 
-            if res_to_update:
-                ResourceChart.objects.bulk_update(
-                    res_to_update, ['unidad', 'categoria'])
-                self.stdout.write(
-                    f"   ~ Se actualizaron {len(res_to_update)} recursos.")
-
-            all_resources = ResourceChart.objects.filter(
-                nombre__in=unique_res_names)
-            res_map = {r.nombre: r for r in all_resources}
+        self.stdout.write(self.style.SUCCESS(
+            "Importación finalizada con éxito."))
 
+    def importar_streaming(self, ruta, options):
+        try:
+            conteos = importar_por_lotes(
+                ruta, parsear_jerarquico_lote,
+                batch_size=options["batch_size"],
+                reanudar=options["resume"],
+                log=self.stdout.write)
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(
+                f"Error importando el archivo: {e}"))
             self.stdout.write(
-                " > Procesando Asignaciones (QuantifiedResource)...")
-
-            existing_qrs = QuantifiedResource.objects.filter(
-                performance_table__in=task_map.values(),
-                recurso__in=res_map.values()
-            )
-
-            qr_map = {(q.performance_table_id, q.recurso_id)                      : q for q in existing_qrs}
-
-            qr_to_create = []
-            qr_to_update = []
-            processed_pairs = set()
-
-            for row in rows:
-                t_obj = task_map.get(row["tarea_nombre"])
-                r_obj = res_map.get(row["recurso_nombre"])
-                rendimiento = row["recurso_rendimiento"]
-
-                if not t_obj or not r_obj:
-                    continue
-
-                pair_key = (t_obj.id, r_obj.id)
-
-                if pair_key in processed_pairs:
-                    continue
-                processed_pairs.add(pair_key)
-
-                if pair_key in qr_map:
-                    qr = qr_map[pair_key]
-                    if abs(getattr(qr, 'rendimiento', 0.0) - rendimiento) > 0.0001:
-                        qr.cantidad = str(rendimiento)
-                        qr_to_update.append(qr)
-                else:
-                    qr_to_create.append(QuantifiedResource(
-                        performance_table=t_obj,
-                        recurso=r_obj,
-                        cantidad=str(rendimiento)
-                    ))
-
-            if qr_to_create:
-                QuantifiedResource.objects.bulk_create(qr_to_create)
-                self.stdout.write(
-                    f"   + Se asignaron {len(qr_to_create)} nuevos recursos a tareas.")
-
-            if qr_to_update:
-                QuantifiedResource.objects.bulk_update(
-                    qr_to_update, ['cantidad'])
-                self.stdout.write(
-                    f"   ~ Se actualizaron rendimientos en {len(qr_to_update)} asignaciones.")
+                "Los lotes confirmados se conservan; vuelve a ejecutar con --resume.")
+            return
+        finally:
+            bump_catalog_version()
 
+        for nombre, valor in conteos.items():
+            self.stdout.write(f"   {nombre}: {valor}")
         self.stdout.write(self.style.SUCCESS(
             "Importación finalizada con éxito."))
+
+    def planificar(self, filas, ruta, options):
+        plan = planificar(filas, ruta, options["plan"], options["report"],
+                          eliminar_huerfanas=options["prune"])
+        self.stdout.write(" > Plan de cambios (no se escribió nada):")
+        for tipo, cantidad in resumen_plan(plan).items():
+            self.stdout.write(f"   {tipo}: {cantidad}")
+        for salida in (options["plan"], options["report"]):
+            if salida:
+                self.stdout.write(self.style.SUCCESS(f"Plan guardado en {salida}"))
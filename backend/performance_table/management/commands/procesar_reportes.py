@@ -0,0 +1,29 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from performance_table.jobs import mantenimiento, procesar_pendientes
+
+
+class Command(BaseCommand):
+    help = "Procesa la cola de reportes PDF (PERFORMANCE_REPORT_JOB_BACKEND=database)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true",
+                            help="Vacía la cola una vez y termina")
+        parser.add_argument("--interval", type=float, default=2.0,
+                            help="Segundos entre consultas a la cola")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Esperando reportes...")
+        while True:
+            close_old_connections()
+            purgados = mantenimiento()
+            if purgados:
+                self.stdout.write(f"   - {purgados} trabajos viejos purgados")
+            procesados = procesar_pendientes()
+            if procesados:
+                self.stdout.write(self.style.SUCCESS(
+                    f"   + {procesados} reportes procesados"))
+            if options["once"]:
+                return
+            time.sleep(options["interval"])
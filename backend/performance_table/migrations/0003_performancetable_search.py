@@ -0,0 +1,66 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:07
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+import unicodedata
+from collections import defaultdict
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def normalizar_texto(texto):
+    # Copia de search.normalizar_texto al crear esta migración
+    texto = unicodedata.normalize('NFKD', str(texto or '').lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+def poblar_documentos(apps, schema_editor):
+    PerformanceTable = apps.get_model('performance_table', 'PerformanceTable')
+    QuantifiedResource = apps.get_model(
+        'performance_table', 'QuantifiedResource')
+
+    recursos = defaultdict(list)
+    for pt_id, nombre in QuantifiedResource.objects.order_by('id').values_list(
+            'performance_table_id', 'recurso__nombre'):
+        recursos[pt_id].append(nombre)
+
+    actividades = list(PerformanceTable.objects.only(
+        'id', 'codigo', 'actividad'))
+    for item in actividades:
+        item.search_document = normalizar_texto(
+            ' '.join([item.codigo, item.actividad, *recursos[item.id]]))
+    PerformanceTable.objects.bulk_update(
+        actividades, ['search_document'], batch_size=500)
+    PerformanceTable.objects.update(
+        search_vector=django.contrib.postgres.search.SearchVector(
+            'search_document', config='spanish'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('performance_table', '0002_resourcechart_categoria'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='performancetable',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='performancetable',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='performancetable',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='performance_search_vector'),
+        ),
+        migrations.AddIndex(
+            model_name='performancetable',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_document'], name='performance_search_trgm', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.RunPython(poblar_documentos, migrations.RunPython.noop),
+    ]
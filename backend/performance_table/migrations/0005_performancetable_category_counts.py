@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:20
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def contar_recursos(apps, schema_editor):
+    PerformanceTable = apps.get_model('performance_table', 'PerformanceTable')
+    QuantifiedResource = apps.get_model(
+        'performance_table', 'QuantifiedResource')
+
+    for campo, categoria in [('n_materiales', 'Materiales'),
+                             ('n_mano_obra', 'Mano de Obra'),
+                             ('n_herramientas', 'Herramientas y Equipo')]:
+        conteo = QuantifiedResource.objects.filter(
+            performance_table=OuterRef('pk'), recurso__categoria=categoria
+        ).order_by().values('performance_table').annotate(
+            c=Count('id')).values('c')
+        PerformanceTable.objects.update(
+            **{campo: Coalesce(Subquery(conteo), 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('performance_table', '0004_reportjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='performancetable',
+            name='n_herramientas',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='performancetable',
+            name='n_mano_obra',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='performancetable',
+            name='n_materiales',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(contar_recursos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-18 17:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('performance_table', '0005_performancetable_category_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportacionVisto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('importacion', models.CharField(max_length=64)),
+                ('tipo', models.CharField(choices=[('recurso', 'Recurso'), ('asignacion', 'Asignación')], max_length=16)),
+                ('ref_id', models.BigIntegerField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('importacion', 'tipo', 'ref_id'), name='performance_importacionvisto_unique')],
+            },
+        ),
+    ]
@@ -1,3 +1,6 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+import uuid
 from django.db import models
 
 
@@ -29,21 +32,42 @@ class PerformanceTable(models.Model):
         related_name='performance_tables'
     )
 
+    # Documento desnormalizado para búsqueda (ver search.py)
+    search_document = models.TextField(blank=True, default='', editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    # Recursos por categoría, mantenidos junto al documento (ver summaries.py)
+    n_materiales = models.PositiveIntegerField(default=0, editable=False)
+    n_mano_obra = models.PositiveIntegerField(default=0, editable=False)
+    n_herramientas = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['search_vector'],
+                     name='performance_search_vector'),
+            GinIndex(fields=['search_document'], name='performance_search_trgm',
+                     opclasses=['gin_trgm_ops']),
+        ]
+
     def __str__(self):
         return self.codigo
 
     @property
     def tiene_materiales(self):
-        # Usamos any() sobre los recursos ya prefetcheados en memoria
-        return any(item.recurso.categoria == 'Materiales' for item in self.quantifiedresource_set.all())
+        return self.n_materiales > 0
 
     @property
     def tiene_obra(self):
-        return any(item.recurso.categoria == 'Mano de Obra' for item in self.quantifiedresource_set.all())
+        return self.n_mano_obra > 0
 
     @property
     def tiene_herramientas(self):
-        return any(item.recurso.categoria == 'Herramientas y Equipo' for item in self.quantifiedresource_set.all())
+        return self.n_herramientas > 0
+
+    @property
+    def filas_max(self):
+        # Filas de la columna más larga en el PDF
+        return max(self.n_materiales, self.n_mano_obra, self.n_herramientas, 1)
 
 
 class QuantifiedResource(models.Model):
@@ -55,3 +79,57 @@ class QuantifiedResource(models.Model):
 
     class Meta:
         unique_together = ('performance_table', 'recurso')
+
+
+class ReportJob(models.Model):
+    # La tabla es la cola: cualquier worker toma el siguiente pendiente
+
+    class Estado(models.TextChoices):
+        PENDIENTE = 'pendiente', 'Pendiente'
+        PROCESANDO = 'procesando', 'Procesando'
+        COMPLETADO = 'completado', 'Completado'
+        ERROR = 'error', 'Error'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    ids = models.JSONField(default=list)
+    estado = models.CharField(
+        max_length=16, choices=Estado.choices, default=Estado.PENDIENTE)
+    progreso = models.PositiveSmallIntegerField(default=0)
+    clave = models.CharField(max_length=64, blank=True)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['estado', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.id} ({self.estado})"
+
+
+class ImportacionVisto(models.Model):
+    """
+    Recursos y asignaciones que ya definió un lote anterior de una
+    importación por lotes (ver importer.importar_por_lotes). Viven en la
+    base y no en memoria ni en el checkpoint, así que no crecen con el
+    archivo; se borran al terminar la importación.
+    """
+
+    class Tipo(models.TextChoices):
+        RECURSO = 'recurso', 'Recurso'
+        ASIGNACION = 'asignacion', 'Asignación'
+
+    importacion = models.CharField(max_length=64)
+    tipo = models.CharField(max_length=16, choices=Tipo.choices)
+    ref_id = models.BigIntegerField()  # ResourceChart o QuantifiedResource
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['importacion', 'tipo', 'ref_id'],
+                name='performance_importacionvisto_unique'),
+        ]
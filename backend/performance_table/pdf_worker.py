@@ -0,0 +1,13 @@
+import io
+from xhtml2pdf import pisa
+
+# Este módulo no importa Django: los procesos del pool (spawn) solo
+# necesitan convertir HTML ya renderizado a PDF.
+
+
+def html_a_pdf(html):
+    buffer = io.BytesIO()
+    pisa_status = pisa.CreatePDF(html, dest=buffer)
+    if pisa_status.err:
+        raise RuntimeError('Error al generar el PDF')
+    return buffer.getvalue()
@@ -0,0 +1,209 @@
+import hashlib
+import os
+import tempfile
+from botocore.exceptions import BotoCoreError, ClientError
+from django.conf import settings
+from django.template.loader import get_template
+from loguru import logger
+from .reports import STREAM_BLOCK_SIZE, TEMPLATE_NAME
+
+# Subir si cambia la forma de generar el PDF sin cambiar la plantilla
+REPORT_CACHE_VERSION = '1'
+
+_template_hash = None
+
+
+def _hash_plantilla():
+    global _template_hash
+    if _template_hash is None:
+        source = get_template(TEMPLATE_NAME).template.source
+        _template_hash = hashlib.sha256(source.encode()).hexdigest()
+    return _template_hash
+
+
+def clave_reporte(actividades):
+    """
+    Clave por contenido: ids ordenados más los datos que se imprimen de cada
+    actividad y sus recursos. Cualquier edición produce otra clave, así que
+    no hace falta invalidar nada a mano.
+    """
+    h = hashlib.sha256()
+    h.update(f'{REPORT_CACHE_VERSION}:{_hash_plantilla()}'.encode())
+    for item in sorted(actividades, key=lambda a: a.id):
+        recursos = sorted(
+            (qr.recurso_id, qr.recurso.nombre, qr.recurso.unidad,
+             qr.recurso.categoria, qr.cantidad)
+            for qr in item.quantifiedresource_set.all())
+        h.update(repr((item.id, item.codigo, item.actividad,
+                 item.unidad, recursos)).encode())
+    return h.hexdigest()
+
+
+class DiskReportCache:
+    """Carpeta local con expulsión LRU por tamaño total (mtime = último uso)."""
+
+    def __init__(self, root, max_bytes):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def _ruta(self, clave):
+        return os.path.join(self.root, f'{clave}.pdf')
+
+    def abrir(self, clave):
+        ruta = self._ruta(clave)
+        try:
+            archivo = open(ruta, 'rb')
+        except FileNotFoundError:
+            return None
+        os.utime(ruta)
+        return archivo
+
+    def guardar(self, clave, archivo):
+        fd, temporal = tempfile.mkstemp(dir=self.root, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as destino:
+            while bloque := archivo.read(STREAM_BLOCK_SIZE):
+                destino.write(bloque)
+        os.replace(temporal, self._ruta(clave))
+        self.expulsar()
+
+    def url(self, clave):
+        return None
+
+    def expulsar(self):
+        entradas = []
+        for entrada in os.scandir(self.root):
+            if entrada.name.endswith('.pdf'):
+                stat = entrada.stat()
+                entradas.append((stat.st_mtime, stat.st_size, entrada.path))
+
+        total = sum(size for _, size, _ in entradas)
+        for _, size, ruta in sorted(entradas):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(ruta)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+class S3ReportCache:
+    """
+    Bucket del proyecto. La expulsión de objetos viejos se deja a una regla
+    de ciclo de vida sobre el prefijo.
+    """
+
+    def __init__(self, prefix):
+        from utils.s3 import s3_client
+        self.client = s3_client
+        self.bucket = settings.AWS_STORAGE_BUCKET_NAME
+        self.prefix = prefix
+
+    def _key(self, clave):
+        return f'{self.prefix}{clave}.pdf'
+
+    def abrir(self, clave):
+        try:
+            obj = self.client.get_object(Bucket=self.bucket, Key=self._key(clave))
+        except self.client.exceptions.NoSuchKey:
+            return None
+        return obj['Body']
+
+    def guardar(self, clave, archivo):
+        self.client.upload_fileobj(
+            archivo, self.bucket, self._key(clave),
+            ExtraArgs={'ContentType': 'application/pdf'})
+
+    def url(self, clave):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(clave))
+        except ClientError:
+            return None
+        return self.client.generate_presigned_url(
+            'get_object',
+            Params={
+                'Bucket': self.bucket,
+                'Key': self._key(clave),
+                'ResponseContentType': 'application/pdf',
+                'ResponseContentDisposition': 'attachment; filename="reporte_rendimientos_cicb.pdf"',
+            },
+            ExpiresIn=300,
+        )
+
+
+_cache = None
+_job_storage = None
+
+
+def get_report_cache():
+    global _cache
+    if _cache is None:
+        backend = settings.PERFORMANCE_REPORT_CACHE_BACKEND
+        if backend == 's3':
+            _cache = S3ReportCache('reports/performance/')
+        elif backend == 'disk':
+            _cache = DiskReportCache(
+                settings.PERFORMANCE_REPORT_CACHE_DIR,
+                settings.PERFORMANCE_REPORT_CACHE_MAX_BYTES)
+    return _cache
+
+
+def get_job_storage():
+    """
+    Dónde dejan el PDF los reportes asíncronos: el mismo cache o, con el
+    backend 'none', una carpeta local solo para ellos (el trabajo tiene que
+    poder descargarse aunque no se quiera cachear nada más).
+    """
+    global _job_storage
+    cache = get_report_cache()
+    if cache is not None:
+        return cache
+    if _job_storage is None:
+        _job_storage = DiskReportCache(
+            os.path.join(settings.PERFORMANCE_REPORT_CACHE_DIR, 'jobs'),
+            settings.PERFORMANCE_REPORT_CACHE_MAX_BYTES)
+    return _job_storage
+
+
+def _almacen(job):
+    return get_job_storage() if job else get_report_cache()
+
+
+CACHE_ERRORS = (OSError, BotoCoreError, ClientError)
+
+
+def buscar(clave, job=False):
+    cache = _almacen(job)
+    if cache is None:
+        return None
+    try:
+        return cache.abrir(clave)
+    except CACHE_ERRORS as e:
+        logger.warning(f"Cache de reportes no disponible: {e}")
+        return None
+
+
+def buscar_url(clave, job=False):
+    cache = _almacen(job)
+    if cache is None:
+        return None
+    try:
+        return cache.url(clave)
+    except CACHE_ERRORS as e:
+        logger.warning(f"Cache de reportes no disponible: {e}")
+        return None
+
+
+def guardar(clave, archivo, job=False):
+    cache = _almacen(job)
+    if cache is None:
+        return False
+    try:
+        cache.guardar(clave, archivo)
+        return True
+    except CACHE_ERRORS as e:
+        logger.warning(f"No se pudo guardar el reporte en cache: {e}")
+        return False
+    finally:
+        archivo.seek(0)
@@ -0,0 +1,215 @@
+import hashlib
+import multiprocessing
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from os import path
+from pypdf import PdfReader, PdfWriter
+from pypdf.generic import IndirectObject, NameObject
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.template.loader import get_template
+from .pdf_worker import html_a_pdf
+
+TEMPLATE_NAME = 'pdf/report_performance.html'
+STREAM_BLOCK_SIZE = 64 * 1024
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class ReportError(Exception):
+    pass
+
+
+def obtener_ruta_logo():
+    # Buscamos el archivo en el sistema de archivos de Django
+    relative_path = 'img/logo_cicb.png'
+    absolute_path = finders.find(relative_path)
+
+    if absolute_path:
+        return absolute_path
+
+    # Fallback por si acaso: buscar en STATIC_ROOT si finder falla (en prod)
+    return path.join(settings.STATIC_ROOT, relative_path)
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: los hijos no heredan conexiones ni hilos del worker web
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.PERFORMANCE_REPORT_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def reset_pool(wait=False):
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=wait, cancel_futures=True)
+        _pool = None
+
+
+def marcar_saltos_pagina(actividades):
+    """
+    Estima la altura de cada actividad y marca cuáles deben
+    comenzar en nueva página para evitar que se partan.
+    """
+    ALTURA_PAGINA_PX = 580   # altura útil aprox. en puntos (carta - márgenes)
+    ALTURA_CABECERA = 28    # fila del título de la actividad
+    ALTURA_FILA = 20    # cada fila de recurso
+    ALTURA_MARGEN = 40    # padding + separación entre bloques
+
+    altura_acumulada = 0
+
+    for item in actividades:
+        # Filas por categoría ya contadas en la tabla (ver summaries.py)
+        altura_item = ALTURA_CABECERA + \
+            (item.filas_max * ALTURA_FILA) + ALTURA_MARGEN
+
+        # ¿No cabe en lo que queda de página?
+        if altura_acumulada + altura_item > ALTURA_PAGINA_PX:
+            item.forzar_salto = True
+            altura_acumulada = altura_item   # reinicia con este bloque
+        else:
+            item.forzar_salto = False
+            altura_acumulada += altura_item
+
+    return actividades
+
+
+def agrupar_paginas(actividades, paginas_por_grupo):
+    """
+    Corta la lista en grupos de páginas completas, siempre en un salto ya
+    marcado, para que unir los PDF parciales dé la misma paginación.
+    """
+    grupos = []
+    actual = []
+    paginas = 1
+
+    for item in actividades:
+        if item.forzar_salto:
+            if paginas >= paginas_por_grupo:
+                grupos.append(actual)
+                actual = []
+                paginas = 1
+                # Es la primera del nuevo documento: sin página en blanco
+                item.forzar_salto = False
+            else:
+                paginas += 1
+        actual.append(item)
+
+    if actual:
+        grupos.append(actual)
+    return grupos
+
+
+def renderizar_html(actividades, logo_path):
+    template = get_template(TEMPLATE_NAME)
+    return template.render({
+        'actividades': actividades,
+        'logo_path': logo_path,
+    })
+
+
+def _spool(data):
+    archivo = tempfile.SpooledTemporaryFile(
+        max_size=settings.PERFORMANCE_REPORT_MAX_MEMORY)
+    archivo.write(data)
+    archivo.seek(0)
+    return archivo
+
+
+def _deduplicar_imagenes(writer):
+    # Cada parte trae su propia copia del logo: todas las páginas pasan a
+    # apuntar a la primera y las demás quedan huérfanas
+    por_contenido = {}
+    por_id = {}
+    for page in writer.pages:
+        recursos = page.get('/Resources')
+        xobjects = recursos.get_object().get('/XObject') if recursos else None
+        if not xobjects:
+            continue
+        xobjects = xobjects.get_object()
+        for nombre, ref in list(xobjects.items()):
+            if not isinstance(ref, IndirectObject):
+                continue
+            if ref.idnum not in por_id:
+                # Se compara el stream codificado, sin descomprimir la imagen
+                clave = hashlib.sha1(ref.get_object()._data).hexdigest()
+                por_id[ref.idnum] = por_contenido.setdefault(clave, ref)
+            xobjects[NameObject(nombre)] = por_id[ref.idnum]
+
+
+def generar_reporte(actividades, progreso=None):
+    """
+    Genera el reporte por grupos de páginas en un pool de procesos y une
+    los PDF parciales. Como máximo hay PERFORMANCE_REPORT_WORKERS grupos en
+    vuelo y tanto las partes como el resultado pasan a disco al superar
+    PERFORMANCE_REPORT_MAX_MEMORY. Devuelve un archivo posicionado al inicio.
+
+    progreso(hechos, total) se llama cada vez que se une un grupo.
+    """
+    actividades = marcar_saltos_pagina(list(actividades))
+    grupos = agrupar_paginas(
+        actividades, settings.PERFORMANCE_REPORT_CHUNK_PAGES)
+    logo_path = obtener_ruta_logo()
+    writer = PdfWriter()
+    partes = []
+
+    def agregar(pdf_bytes):
+        parte = _spool(pdf_bytes)
+        partes.append(parte)
+        writer.append(PdfReader(parte))
+        if progreso:
+            progreso(len(partes), len(grupos))
+
+    try:
+        if len(grupos) == 1:
+            # Reporte chico: no vale la pena pasar por el pool
+            agregar(html_a_pdf(renderizar_html(grupos[0], logo_path)))
+        else:
+            pool = get_pool()
+            ventana = settings.PERFORMANCE_REPORT_WORKERS
+            pendientes = deque()
+            for grupo in grupos:
+                if len(pendientes) >= ventana:
+                    agregar(pendientes.popleft().result())
+                pendientes.append(pool.submit(
+                    html_a_pdf, renderizar_html(grupo, logo_path)))
+            while pendientes:
+                agregar(pendientes.popleft().result())
+
+        if len(partes) > 1:
+            _deduplicar_imagenes(writer)
+            writer.compress_identical_objects()
+        salida = tempfile.SpooledTemporaryFile(
+            max_size=settings.PERFORMANCE_REPORT_MAX_MEMORY)
+        writer.write(salida)
+        salida.seek(0)
+        return salida
+    except BrokenProcessPool:
+        reset_pool()
+        raise ReportError('Error al generar el PDF')
+    except RuntimeError as e:
+        raise ReportError(str(e))
+    finally:
+        writer.close()
+        for parte in partes:
+            parte.close()
+
+
+def iterar_archivo(archivo):
+    try:
+        while True:
+            bloque = archivo.read(STREAM_BLOCK_SIZE)
+            if not bloque:
+                break
+            yield bloque
+    finally:
+        archivo.close()
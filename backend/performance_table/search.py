@@ -0,0 +1,46 @@
+import unicodedata
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import connection
+from django.db.models import F, Q
+from rest_framework import filters
+
+SEARCH_CONFIG = 'spanish'
+
+
+def normalizar_texto(texto):
+    # Minúsculas y sin tildes: "Hormigón" y "hormigon" quedan iguales
+    texto = unicodedata.normalize('NFKD', str(texto or '').lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c))
+
+
+class PerformanceSearchFilter(filters.SearchFilter):
+    """
+    Búsqueda por texto completo sobre el documento desnormalizado, con
+    prefijos ("hor" -> hormigón) y similitud trigram para errores de tipeo.
+    Los resultados se ordenan por relevancia.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+
+        if connection.vendor != 'postgresql':
+            return super().filter_queryset(request, queryset, view)
+
+        terms = [normalizar_texto(t) for t in terms]
+        texto = ' '.join(terms)
+        # Solo caracteres seguros para to_tsquery en modo raw
+        prefijos = [''.join(c for c in t if c.isalnum()) for t in terms]
+        prefijos = [f'{p}:*' for p in prefijos if p]
+
+        condicion = Q(search_document__trigram_word_similar=texto)
+        rank = TrigramWordSimilarity(texto, 'search_document')
+        if prefijos:
+            query = SearchQuery(' & '.join(prefijos),
+                                config=SEARCH_CONFIG, search_type='raw')
+            condicion |= Q(search_vector=query)
+            rank = rank + SearchRank(F('search_vector'), query)
+
+        return queryset.filter(condicion).annotate(
+            search_rank=rank).order_by('-search_rank', '-id')
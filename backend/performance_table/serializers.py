@@ -1,6 +1,9 @@
 from rest_framework import serializers
-from .models import PerformanceTable, QuantifiedResource, ResourceChart
+from .models import PerformanceTable, QuantifiedResource, ReportJob, ResourceChart
+from django.conf import settings
 from django.db import transaction
+from .bulk import diff_recursos
+from .summaries import contar_por_categoria
 
 
 class ResourceSerializer(serializers.ModelSerializer):
@@ -34,6 +37,9 @@ class PerformanceTableSerializer(serializers.ModelSerializer):
             'unidad',
             'categoria',
             'recursos_info',
+            'n_materiales',
+            'n_mano_obra',
+            'n_herramientas',
         ]
 
     def create(self, validated_data):
@@ -52,6 +58,11 @@ class PerformanceTableSerializer(serializers.ModelSerializer):
             ]
             QuantifiedResource.objects.bulk_create(objs)
 
+        # En la base se recalculan al confirmar la transacción (que puede ser
+        # una exterior); la respuesta los calcula ya con los recursos recibidos
+        for campo, valor in contar_por_categoria(
+                item['recurso'] for item in recursos_data).items():
+            setattr(performance_table, campo, valor)
         return performance_table
 
     def update(self, instance, validated_data):
@@ -64,20 +75,58 @@ class PerformanceTableSerializer(serializers.ModelSerializer):
             instance.save()
 
             if recursos_data is not None:
-                instance.quantifiedresource_set.all().delete()
-                recursos_objetos = [
-                    QuantifiedResource(
-                        performance_table=instance,
-                        recurso=item['recurso'],
-                        cantidad=item['cantidad']
-                    )
-                    for item in recursos_data
-                ]
-                QuantifiedResource.objects.bulk_create(recursos_objetos)
-
+                # Solo se tocan las filas que cambiaron; el resto conserva su id
+                existentes = {
+                    qr.recurso_id: qr for qr in instance.quantifiedresource_set.all()}
+                entrantes = {
+                    item['recurso'].id: item['cantidad'] for item in recursos_data}
+                crear, actualizar, borrar = diff_recursos(
+                    instance.id, existentes, entrantes)
+
+                if borrar:
+                    QuantifiedResource.objects.filter(id__in=borrar).delete()
+                if actualizar:
+                    QuantifiedResource.objects.bulk_update(
+                        actualizar, ['cantidad'])
+                if crear:
+                    QuantifiedResource.objects.bulk_create(crear)
+
+        if recursos_data is not None:
+            # Igual que en create: sin esperar al commit
+            recursos = {item['recurso'].id: item['recurso'] for item in recursos_data}
+            for campo, valor in contar_por_categoria(recursos.values()).items():
+                setattr(instance, campo, valor)
         return instance
 
 
+class BulkResourceSerializer(serializers.Serializer):
+    # Solo el id: la existencia se comprueba en una consulta para todo el lote
+    recurso = serializers.IntegerField(min_value=1)
+    cantidad = serializers.CharField(max_length=255)
+
+
+class PerformanceBulkItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField(required=False, min_value=1)
+    codigo = serializers.CharField(max_length=255, required=False)
+    actividad = serializers.CharField(max_length=255, required=False)
+    unidad = serializers.CharField(max_length=32, required=False)
+    categoria = serializers.CharField(max_length=255, required=False)
+    recursos_info = BulkResourceSerializer(many=True, required=False)
+
+    def validate_recursos_info(self, value):
+        recursos = [item['recurso'] for item in value]
+        if len(recursos) != len(set(recursos)):
+            raise serializers.ValidationError(
+                "Un recurso no puede repetirse en la misma actividad")
+        return value
+
+    def validate(self, attrs):
+        if not attrs.get('id') and not attrs.get('codigo'):
+            raise serializers.ValidationError(
+                "Cada actividad necesita 'id' o 'codigo'")
+        return attrs
+
+
 class PerformanceTablePDFSerializer(serializers.ModelSerializer):
     recursos_detallados = PerformanceResourceSerializer(
         source='quantifiedresource_set',
@@ -95,3 +144,22 @@ class PerformanceTablePDFSerializer(serializers.ModelSerializer):
             'categoria',
             'recursos_info'
         ]
+
+
+class ReportJobCreateSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False)
+
+    def validate_ids(self, value):
+        if len(value) > settings.PERFORMANCE_REPORT_MAX_ACTIVITIES:
+            raise serializers.ValidationError(
+                f"Se permiten como máximo {settings.PERFORMANCE_REPORT_MAX_ACTIVITIES} actividades por reporte")
+        return value
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ReportJob
+        fields = ['id', 'estado', 'progreso', 'error',
+                  'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
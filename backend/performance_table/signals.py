@@ -0,0 +1,38 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import PerformanceTable, QuantifiedResource, ResourceChart
+from utils.versiones import bump_on_commit
+from .catalog import CATALOG_VERSION_KEY
+from .summaries import schedule_summary_refresh
+
+
+@receiver(post_save, sender=PerformanceTable)
+@receiver(post_delete, sender=PerformanceTable)
+@receiver(post_save, sender=ResourceChart)
+@receiver(post_delete, sender=ResourceChart)
+def invalidate_catalog(sender, instance, **kwargs):
+    # Tras el commit, para que nadie recalcule con datos sin confirmar, y
+    # una sola vez por transacción
+    bump_on_commit(CATALOG_VERSION_KEY)
+
+
+@receiver(post_save, sender=PerformanceTable)
+def update_summary(sender, instance, **kwargs):
+    schedule_summary_refresh([instance.id])
+
+
+@receiver(post_save, sender=QuantifiedResource)
+@receiver(post_delete, sender=QuantifiedResource)
+def update_summary_resources(sender, instance, **kwargs):
+    schedule_summary_refresh([instance.performance_table_id])
+
+
+@receiver(post_save, sender=ResourceChart)
+def update_summary_resource(sender, instance, created, **kwargs):
+    # Un recurso renombrado o recategorizado cambia todas sus actividades
+    if created:
+        return
+    ids = list(QuantifiedResource.objects.filter(
+        recurso=instance).values_list('performance_table_id', flat=True))
+    if ids:
+        schedule_summary_refresh(ids)
@@ -0,0 +1,74 @@
+from collections import defaultdict
+from django.contrib.postgres.search import SearchVector
+from utils.versiones import ejecutar_tras_commit
+from .models import PerformanceTable, QuantifiedResource, ResourceChart
+from .search import SEARCH_CONFIG, normalizar_texto
+
+SUMMARY_REFRESH_KEY = 'performance_summaries'
+CONTADORES_POR_CATEGORIA = {
+    ResourceChart.Category.MATERIALES: 'n_materiales',
+    ResourceChart.Category.MANO_DE_OBRA: 'n_mano_obra',
+    ResourceChart.Category.HERRAMIENTAS: 'n_herramientas',
+}
+
+
+def contar_por_categoria(recursos):
+    """Contadores de una actividad a partir de sus ResourceChart, sin consultas."""
+    contadores = dict.fromkeys(CONTADORES_POR_CATEGORIA.values(), 0)
+    for recurso in recursos:
+        campo = CONTADORES_POR_CATEGORIA.get(recurso.categoria)
+        if campo:
+            contadores[campo] += 1
+    return contadores
+
+
+def refresh_activity_summaries(ids=None):
+    """
+    Recalcula los campos desnormalizados de las actividades indicadas (o de
+    todas si ids es None): documento de búsqueda y cantidad de recursos por
+    categoría. Una consulta para leer los recursos y una escritura por lote.
+    """
+    queryset = PerformanceTable.objects.all()
+    if ids is not None:
+        queryset = queryset.filter(id__in=list(ids))
+
+    recursos = defaultdict(list)
+    contadores = defaultdict(lambda: dict.fromkeys(
+        CONTADORES_POR_CATEGORIA.values(), 0))
+    for pt_id, nombre, categoria in QuantifiedResource.objects.filter(
+            performance_table__in=queryset).order_by('id').values_list(
+            'performance_table_id', 'recurso__nombre', 'recurso__categoria'):
+        recursos[pt_id].append(nombre)
+        campo = CONTADORES_POR_CATEGORIA.get(categoria)
+        if campo:
+            contadores[pt_id][campo] += 1
+
+    actividades = list(queryset.only('id', 'codigo', 'actividad'))
+    for item in actividades:
+        item.search_document = normalizar_texto(
+            ' '.join([item.codigo, item.actividad, *recursos[item.id]]))
+        for campo, valor in contadores[item.id].items():
+            setattr(item, campo, valor)
+
+    if actividades:
+        PerformanceTable.objects.bulk_update(
+            actividades,
+            ['search_document', *CONTADORES_POR_CATEGORIA.values()],
+            batch_size=500)
+        queryset.update(search_vector=SearchVector(
+            'search_document', config=SEARCH_CONFIG))
+
+
+def schedule_summary_refresh(ids):
+    """
+    Programa el recálculo para después del commit. Dentro de una misma
+    transacción los ids se acumulan en un solo callback (p. ej. al borrar
+    todos los recursos de una actividad).
+    """
+    pending = set(ids)
+    run = ejecutar_tras_commit(
+        SUMMARY_REFRESH_KEY, lambda: refresh_activity_summaries(pending))
+    if getattr(run, 'summary_ids', None) is None:
+        run.summary_ids = pending
+    else:
+        run.summary_ids.update(ids)
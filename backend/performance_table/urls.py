@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import PerformanceTableViewSet, ResourcesViewSet, GeneretePerformanceReportPDF
+from .views import PerformanceTableViewSet, ResourcesViewSet, GeneretePerformanceReportPDF, ReportJobViewSet
 
 router = DefaultRouter()
 router.register(r'performance', PerformanceTableViewSet,
@@ -8,6 +8,7 @@ router.register(r'performance', PerformanceTableViewSet,
 router.register(r'resources', ResourcesViewSet, basename='resources')
 router.register(r'generate_report', GeneretePerformanceReportPDF,
                 basename='generate_report')
+router.register(r'report_jobs', ReportJobViewSet, basename='report_jobs')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,17 +1,22 @@
-from os import path
-from xhtml2pdf import pisa
+from os import SEEK_END
 from django.conf import settings
-from django.http import HttpResponse
-from .models import PerformanceTable, ResourceChart
-from .serializers import PerformanceTablePDFSerializer, PerformanceTableSerializer, ResourceSerializer
+from django.http import StreamingHttpResponse
+from django.db.models import Prefetch
+from .models import PerformanceTable, QuantifiedResource, ReportJob, ResourceChart
+from .catalog import get_catalog_facets
+from .search import PerformanceSearchFilter
+from .filters import PerformanceTableFilter
+from .reports import ReportError, generar_reporte, iterar_archivo
+from .bulk import bulk_upsert
+from . import jobs, report_cache
+from .serializers import PerformanceBulkItemSerializer, PerformanceTablePDFSerializer, PerformanceTableSerializer, ReportJobCreateSerializer, ReportJobSerializer, ResourceSerializer
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import viewsets, filters, status
-from django.template.loader import get_template
+from rest_framework import viewsets, filters, status, mixins
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.decorators import action
-from django.contrib.staticfiles import finders
+from users.permissions import IsAdminPrin
 
 
 class TwentyPerPagePagination(PageNumberPagination):
@@ -22,42 +27,74 @@ class TwentyPerPagePaginationPerformance(PageNumberPagination):
     page_size = 20
 
     def get_paginated_response(self, data):
-        total_resources = ResourceChart.objects.count()
-        total_categories = PerformanceTable.objects.values(
-            'categoria').distinct().count()
-        categories_names = PerformanceTable.objects.values_list(
-            'categoria', flat=True).distinct()
+        # Las facetas se cachean por versión del catálogo (ver signals.py)
+        facets = get_catalog_facets()
 
         return Response({
             'count': self.page.paginator.count,
             'next': self.get_next_link(),
             'previous': self.get_previous_link(),
             'results': data,
-            'total_resources': total_resources,
-            'total_categories': total_categories,
-            'categories_names': list(categories_names),
+            'total_resources': facets['total_resources'],
+            'total_categories': facets['total_categories'],
+            'categories_names': facets['categories_names'],
         })
 
 
 class PerformanceTableViewSet(viewsets.ModelViewSet):
     serializer_class = PerformanceTableSerializer
     pagination_class = TwentyPerPagePaginationPerformance
-    filter_backends = [filters.SearchFilter, DjangoFilterBackend]
-    filterset_fields = ['categoria']
+    filter_backends = [PerformanceSearchFilter, DjangoFilterBackend]
+    filterset_class = PerformanceTableFilter
     search_fields = ['actividad', 'codigo', 'recursos__nombre']
 
     def get_queryset(self):
+        # Recursos y su detalle en una sola consulta (JOIN) en lugar de dos
         queryset = PerformanceTable.objects.prefetch_related(
-            'quantifiedresource_set__recurso').all().order_by('-id')
+            Prefetch('quantifiedresource_set',
+                     queryset=QuantifiedResource.objects.select_related('recurso'))
+        ).all().order_by('-id')
         return queryset
 
     def get_permissions(self):
         if self.action in ['list', 'retrieve']:
             permission_classes = [AllowAny]
+        elif self.action == 'bulk_upsert':
+            # Los definidos en el @action
+            permission_classes = self.permission_classes
         else:
             permission_classes = [AllowAny]
         return [permission() for permission in permission_classes]
 
+    @action(detail=False, methods=['post'], url_path='bulk-upsert', permission_classes=[IsAdminPrin])
+    def bulk_upsert(self, request):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response({"error": "Se esperaba una lista de actividades"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if len(items) > settings.PERFORMANCE_BULK_MAX_ITEMS:
+            return Response({"error": f"Se permiten como máximo {settings.PERFORMANCE_BULK_MAX_ITEMS} actividades por solicitud"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Cada item se valida por separado para devolver sus propios errores
+        resultados = [None] * len(items)
+        validos = []
+        for i, item in enumerate(items):
+            serializer = PerformanceBulkItemSerializer(data=item)
+            if serializer.is_valid():
+                validos.append((i, serializer.validated_data))
+            else:
+                resultados[i] = {'index': i, 'status': 'error',
+                                 'errors': serializer.errors}
+
+        if validos:
+            for (i, _), resultado in zip(validos, bulk_upsert([data for _, data in validos])):
+                resultado['index'] = i
+                resultados[i] = resultado
+
+        resumen = {estado: sum(r['status'] == estado for r in resultados)
+                   for estado in ['created', 'updated', 'unchanged', 'error']}
+        return Response({'resumen': resumen, 'results': resultados})
+
 
 class ResourcesViewSet(viewsets.ModelViewSet):
     serializer_class = ResourceSerializer
@@ -84,18 +121,6 @@ class ResourcesViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
 
-def obtener_ruta_logo():
-    # Buscamos el archivo en el sistema de archivos de Django
-    relative_path = 'img/logo_cicb.png'
-    absolute_path = finders.find(relative_path)
-
-    if absolute_path:
-        return absolute_path
-
-    # Fallback por si acaso: buscar en STATIC_ROOT si finder falla (en prod)
-    return path.join(settings.STATIC_ROOT, relative_path)
-
-
 class GeneretePerformanceReportPDF(viewsets.ViewSet):
     queryset = PerformanceTable.objects.prefetch_related(
         'quantifiedresource_set__recurso').all()
@@ -109,66 +134,87 @@ class GeneretePerformanceReportPDF(viewsets.ViewSet):
         if not ids:
             return Response({"error": "No se enviaron IDs"}, status=status.HTTP_400_BAD_REQUEST)
 
+        if len(ids) > settings.PERFORMANCE_REPORT_MAX_ACTIVITIES:
+            return Response({"error": f"Se permiten como máximo {settings.PERFORMANCE_REPORT_MAX_ACTIVITIES} actividades por reporte"}, status=status.HTTP_400_BAD_REQUEST)
+
         # 1. Obtener datos optimizados
-        actividades = PerformanceTable.objects.filter(id__in=ids).prefetch_related(
-            'quantifiedresource_set__recurso')
-        if not actividades.exists():
+        actividades = list(PerformanceTable.objects.filter(id__in=ids).prefetch_related(
+            Prefetch('quantifiedresource_set',
+                     queryset=QuantifiedResource.objects.select_related('recurso'))).order_by('id'))
+        if not actividades:
             return Response({"error": "No se encontraron actividades con los IDs proporcionados"}, status=status.HTTP_404_NOT_FOUND)
-        actividades = self.marcar_saltos_pagina(actividades)
 
-        # 2. Configurar el logo y contexto
-        logo_path = obtener_ruta_logo()
-        context = {
-            'actividades': actividades,
-            'logo_path': logo_path,
-        }
-
-        # 3. Renderizar PDF
-        template = get_template('pdf/report_performance.html')
-        html = template.render(context)
-
-        response = HttpResponse(content_type='application/pdf')
+        # 2. Buscar un PDF ya generado con exactamente este contenido
+        clave = report_cache.clave_reporte(actividades)
+        if request.data.get('presigned'):
+            url = report_cache.buscar_url(clave)
+            if url:
+                return Response({"download_url": url})
+
+        archivo = report_cache.buscar(clave)
+        cache_status = 'HIT'
+        if archivo is None:
+            # 3. Renderizar PDF por grupos de páginas (ver reports.py)
+            try:
+                archivo = generar_reporte(actividades)
+            except ReportError:
+                return Response({'error': 'Error al generar el PDF'}, status=500)
+            report_cache.guardar(clave, archivo)
+            cache_status = 'MISS'
+
+            if request.data.get('presigned'):
+                url = report_cache.buscar_url(clave)
+                if url:
+                    archivo.close()
+                    return Response({"download_url": url})
+
+        # 4. Enviar el archivo por bloques
+        response = StreamingHttpResponse(
+            iterar_archivo(archivo), content_type='application/pdf')
         response['Content-Disposition'] = 'attachment; filename="reporte_rendimientos_cicb.pdf"'
+        response['X-Report-Cache'] = cache_status
+        if archivo.seekable():
+            response['Content-Length'] = str(archivo.seek(0, SEEK_END))
+            archivo.seek(0)
+        return response
 
-        pisa_status = pisa.CreatePDF(html, dest=response)
 
-        if pisa_status.err:
-            return Response({'error': 'Error al generar el PDF'}, status=500)
+class ReportJobViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    queryset = ReportJob.objects.all()
+    serializer_class = ReportJobSerializer
+    permission_classes = [AllowAny]
 
+    def create(self, request, *args, **kwargs):
+        serializer = ReportJobCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = jobs.encolar(serializer.validated_data['ids'])
+        return Response(ReportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+    def retrieve(self, request, *args, **kwargs):
+        job = self.get_object()
+        if job.estado in (ReportJob.Estado.PENDIENTE, ReportJob.Estado.PROCESANDO):
+            # Tras un reinicio nadie más despierta al backend de este proceso
+            jobs.get_backend().notificar()
+        return Response(ReportJobSerializer(job).data)
+
+    @action(detail=True, methods=['get'], url_path='download')
+    def download(self, request, pk=None):
+        job = self.get_object()
+
+        if job.estado != ReportJob.Estado.COMPLETADO:
+            return Response({"error": "El reporte todavía no está listo", "estado": job.estado},
+                            status=status.HTTP_409_CONFLICT)
+
+        url = report_cache.buscar_url(job.clave, job=True)
+        if url:
+            return Response({"download_url": url, "job_id": job.id})
+
+        archivo = report_cache.buscar(job.clave, job=True)
+        if archivo is None:
+            return Response({"error": "El reporte expiró, vuelve a solicitarlo"},
+                            status=status.HTTP_410_GONE)
+
+        response = StreamingHttpResponse(
+            iterar_archivo(archivo), content_type='application/pdf')
+        response['Content-Disposition'] = 'attachment; filename="reporte_rendimientos_cicb.pdf"'
         return response
-
-    def marcar_saltos_pagina(self, actividades):
-        """
-        Estima la altura de cada actividad y marca cuáles deben
-        comenzar en nueva página para evitar que se partan.
-        """
-        ALTURA_PAGINA_PX = 580   # altura útil aprox. en puntos (carta - márgenes)
-        ALTURA_CABECERA = 28    # fila del título de la actividad
-        ALTURA_FILA = 20    # cada fila de recurso
-        ALTURA_MARGEN = 40    # padding + separación entre bloques
-
-        altura_acumulada = 0
-
-        for item in actividades:
-            # Contar filas por categoría
-            recursos = item.quantifiedresource_set.all()
-            n_mat = sum(
-                1 for r in recursos if r.recurso.categoria == 'Materiales')
-            n_obra = sum(
-                1 for r in recursos if r.recurso.categoria == 'Mano de Obra')
-            n_herr = sum(1 for r in recursos if r.recurso.categoria ==
-                         'Herramientas y Equipo')
-
-            filas_max = max(n_mat, n_obra, n_herr, 1)
-            altura_item = ALTURA_CABECERA + \
-                (filas_max * ALTURA_FILA) + ALTURA_MARGEN
-
-            # ¿No cabe en lo que queda de página?
-            if altura_acumulada + altura_item > ALTURA_PAGINA_PX:
-                item.forzar_salto = True
-                altura_acumulada = altura_item   # reinicia con este bloque
-            else:
-                item.forzar_salto = False
-                altura_acumulada += altura_item
-
-        return actividades
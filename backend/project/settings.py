@@ -42,6 +42,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'corsheaders',
     'rest_framework',
     'rest_framework.authtoken',
@@ -105,6 +106,14 @@ DATABASES = {
     }
 }
 
+# Cache compartido entre workers (por defecto memoria local del proceso)
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('DJANGO_CACHE_LOCATION', ''),
+    }
+}
+
 AWS_STORAGE_BUCKET_NAME = os.getenv("AWS_STORAGE_BUCKET_NAME")
 AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
 AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
@@ -127,6 +136,67 @@ STORAGES = {
     },
 }
 
+# Reportes PDF de rendimientos (performance_table/reports.py)
+PERFORMANCE_REPORT_WORKERS = int(
+    os.getenv('PERFORMANCE_REPORT_WORKERS', str(min(2, os.cpu_count() or 1))))
+PERFORMANCE_REPORT_CHUNK_PAGES = int(
+    os.getenv('PERFORMANCE_REPORT_CHUNK_PAGES', '10'))
+PERFORMANCE_REPORT_MAX_ACTIVITIES = int(
+    os.getenv('PERFORMANCE_REPORT_MAX_ACTIVITIES', '2000'))
+# Bytes que un reporte puede ocupar en memoria antes de pasar a disco
+PERFORMANCE_REPORT_MAX_MEMORY = int(
+    os.getenv('PERFORMANCE_REPORT_MAX_MEMORY', str(8 * 1024 * 1024)))
+# Cache de reportes ya generados: 'disk', 's3' o 'none' (con 'none' los
+# reportes asíncronos igual se guardan, en PERFORMANCE_REPORT_CACHE_DIR/jobs)
+PERFORMANCE_REPORT_CACHE_BACKEND = os.getenv(
+    'PERFORMANCE_REPORT_CACHE_BACKEND', 'disk')
+PERFORMANCE_REPORT_CACHE_DIR = os.getenv(
+    'PERFORMANCE_REPORT_CACHE_DIR', os.path.join(BASE_DIR, 'media', 'report_cache'))
+PERFORMANCE_REPORT_CACHE_MAX_BYTES = int(
+    os.getenv('PERFORMANCE_REPORT_CACHE_MAX_BYTES', str(512 * 1024 * 1024)))
+# Cola de reportes asíncronos: 'thread' (hilos en cada worker web) o
+# 'database' (solo encola; procesa `manage.py procesar_reportes`)
+PERFORMANCE_REPORT_JOB_BACKEND = os.getenv(
+    'PERFORMANCE_REPORT_JOB_BACKEND', 'thread')
+PERFORMANCE_REPORT_JOB_THREADS = int(
+    os.getenv('PERFORMANCE_REPORT_JOB_THREADS', '1'))
+# Máximo de reportes generándose a la vez entre todos los workers
+PERFORMANCE_REPORT_JOB_MAX_RUNNING = int(
+    os.getenv('PERFORMANCE_REPORT_JOB_MAX_RUNNING', '2'))
+PERFORMANCE_REPORT_JOB_TIMEOUT = int(
+    os.getenv('PERFORMANCE_REPORT_JOB_TIMEOUT', str(15 * 60)))
+# Cada cuánto el backend 'thread' vuelve a revisar la cola por su cuenta
+PERFORMANCE_REPORT_JOB_POLL_INTERVAL = float(
+    os.getenv('PERFORMANCE_REPORT_JOB_POLL_INTERVAL', '30'))
+# Segundos que se conservan los trabajos terminados (el PDF sigue en el cache)
+PERFORMANCE_REPORT_JOB_RETENTION = int(
+    os.getenv('PERFORMANCE_REPORT_JOB_RETENTION', str(7 * 24 * 60 * 60)))
+# Actividades por solicitud en la carga masiva
+PERFORMANCE_BULK_MAX_ITEMS = int(
+    os.getenv('PERFORMANCE_BULK_MAX_ITEMS', '1000'))
+# Escenarios por llamada al cálculo de aranceles por lotes
+ARANCELES_BATCH_MAX = int(os.getenv('ARANCELES_BATCH_MAX', '1000'))
+# Cache-Control max-age de las respuestas servidas desde la matriz de aranceles
+ARANCELES_CACHE_MAX_AGE = int(os.getenv('ARANCELES_CACHE_MAX_AGE', '300'))
+# Estadísticas públicas: se sirven del cache y se refrescan en segundo plano
+# pasados STATS_CACHE_TTL segundos; más allá de STATS_CACHE_MAX_AGE se descartan
+STATS_CACHE_TTL = int(os.getenv('STATS_CACHE_TTL', '300'))
+STATS_CACHE_MAX_AGE = int(os.getenv('STATS_CACHE_MAX_AGE', str(24 * 60 * 60)))
+STATS_CACHE_LOCK_TIMEOUT = int(os.getenv('STATS_CACHE_LOCK_TIMEOUT', '60'))
+# Segundos que una petición espera el cálculo que ya hace otra
+STATS_CACHE_WAIT = float(os.getenv('STATS_CACHE_WAIT', '10'))
+# Filas por lectura del cursor (y por grupo de filas en Parquet) al exportar
+STATS_EXPORT_CHUNK_SIZE = int(os.getenv('STATS_EXPORT_CHUNK_SIZE', '2000'))
+# Usuarios autenticados por JWT que cada proceso guarda sin volver a la base
+# (0 lo desactiva); con JWT_USER_CACHE_SHARED también en el cache compartido.
+# La versión que los invalida vive en CACHES: con LocMemCache cada worker
+# tiene la suya y los demás solo ven el cambio al vencer el TTL, por eso sin
+# un cache compartido el TTL por defecto es de segundos
+JWT_USER_CACHE_TTL = int(os.getenv(
+    'JWT_USER_CACHE_TTL', '5' if 'locmem' in CACHES['default']['BACKEND'].lower() else '60'))
+JWT_USER_CACHE_SIZE = int(os.getenv('JWT_USER_CACHE_SIZE', '1024'))
+JWT_USER_CACHE_SHARED = os.getenv('JWT_USER_CACHE_SHARED', 'False') == 'True'
+
 PASSWORDS_ADMINS = os.getenv('PASSWORDS_ADMINS', 'admin').split(',')
 
 # Password validation
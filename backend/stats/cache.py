@@ -0,0 +1,130 @@
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, connection
+from loguru import logger
+
+from utils.versiones import bump_version, get_version
+
+STATS_VERSION_KEY = 'stats_data_version'
+
+
+def get_stats_version():
+    return get_version(STATS_VERSION_KEY)
+
+
+def bump_stats_version():
+    return bump_version(STATS_VERSION_KEY)
+
+
+def cache_key(name, params=None):
+    digest = hashlib.sha1(json.dumps(
+        params or {}, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    return f'stats:{name}:{digest}'
+
+
+# Cálculos en curso en este proceso: las peticiones que llegan con el
+# cache frío esperan el mismo resultado en lugar de repetirlo
+_inflight = {}
+_inflight_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='stats')
+
+
+def _store(key, compute):
+    """
+    Recalcula bajo un lock en el cache (compartido entre workers). Si otro
+    worker ya lo tiene, devuelve None sin calcular.
+    """
+    lock_key = f'{key}:lock'
+    if not cache.add(lock_key, 1, timeout=settings.STATS_CACHE_LOCK_TIMEOUT):
+        return None
+    try:
+        version = get_stats_version()
+        data = compute()
+        cache.set(key, {'version': version, 'generated': time.time(), 'data': data},
+                  timeout=settings.STATS_CACHE_MAX_AGE)
+        return data
+    finally:
+        cache.delete(lock_key)
+
+
+def _refresh(key, compute):
+    try:
+        close_old_connections()
+        _store(key, compute)
+    except Exception:
+        logger.exception(f"Error refrescando {key}")
+    finally:
+        with _inflight_lock:
+            event = _inflight.pop(key, None)
+        if event is not None:
+            event.set()
+        connection.close()
+
+
+def _compute_coalesced(key, compute):
+    while True:
+        with _inflight_lock:
+            event = _inflight.get(key)
+            owner = event is None
+            if owner:
+                event = _inflight[key] = threading.Event()
+        if owner:
+            break
+        if not event.wait(settings.STATS_CACHE_WAIT):
+            entry = cache.get(key)
+            return entry['data'] if entry else compute()
+        entry = cache.get(key)
+        if entry:
+            return entry['data']
+        # El cálculo del dueño falló: uno de los que esperaban lo retoma
+
+    try:
+        data = _store(key, compute)
+        if data is None:
+            # Otro worker está calculando: esperamos su resultado un tiempo
+            # y, si falla y suelta el lock, lo tomamos nosotros
+            deadline = time.monotonic() + settings.STATS_CACHE_WAIT
+            while data is None and time.monotonic() < deadline:
+                time.sleep(0.05)
+                entry = cache.get(key)
+                if entry:
+                    return entry['data']
+                data = _store(key, compute)
+            if data is None:
+                data = compute()
+        return data
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+        event.set()
+
+
+def cached_stats(name, compute, params=None):
+    """
+    Stale-while-revalidate: siempre responde desde el cache si hay algo
+    guardado. Si está vencido (STATS_CACHE_TTL) o cambió algún modelo
+    relevante (ver signals.py), lo recalcula un solo hilo en segundo plano
+    mientras se sigue sirviendo lo anterior. Con el cache vacío, un solo
+    cálculo atiende a todas las peticiones que llegan a la vez.
+    """
+    key = cache_key(name, params)
+    entry = cache.get(key)
+    if entry is None:
+        return _compute_coalesced(key, compute)
+
+    stale = entry['version'] != get_stats_version() or \
+        time.time() - entry['generated'] >= settings.STATS_CACHE_TTL
+    if stale:
+        with _inflight_lock:
+            scheduled = key in _inflight
+            if not scheduled:
+                _inflight[key] = threading.Event()
+        if not scheduled:
+            _executor.submit(_refresh, key, compute)
+    return entry['data']
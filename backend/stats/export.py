@@ -0,0 +1,120 @@
+import csv
+import io
+import tempfile
+
+from django.conf import settings
+
+from users.models import UsuarioComun
+from .models import MemberRollup
+from .rollup import ROLLUP_FIELDS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet es opcional
+    pa = pq = None
+
+DATASETS = ('members', 'summary')
+EXPORT_FORMATS = ('csv', 'parquet')
+# Sin nombre, RNI, RNIC, celular ni correo; la fecha solo hasta el mes
+MEMBER_COLUMNS = ('departamento', 'especialidad', 'estado', 'registro_empleado',
+                  'mes_inscripcion', 'certificaciones')
+SUMMARY_COLUMNS = ROLLUP_FIELDS + ('count',)
+# Columnas enteras; el resto son texto (para el esquema de Parquet)
+INTEGER_COLUMNS = ('certificaciones', 'anio', 'count')
+CSV_BUFFER_SIZE = 64 * 1024
+
+
+def scope_by_department(qs, user):
+    # El mismo criterio que UserViewSet.get_queryset
+    if user.is_superuser:
+        return qs
+    if getattr(user, "rol", None) == "admin_ciudad":
+        return qs.filter(departamento=user.ciudad)
+    return qs.none()
+
+
+def member_rows(user):
+    """Filas anónimas de miembros, leídas con un cursor del servidor."""
+    rows = scope_by_department(UsuarioComun.objects.all(), user).order_by('id').values_list(
+        'departamento', 'especialidad', 'estado', 'registro_empleado',
+        'fecha_inscripcion', 'certificaciones')
+    for departamento, especialidad, estado, empleo, fecha, certificaciones in rows.iterator(
+            chunk_size=settings.STATS_EXPORT_CHUNK_SIZE):
+        yield (departamento, especialidad, estado, empleo,
+               fecha.strftime('%Y-%m') if fecha else '', len(certificaciones or []))
+
+
+def summary_rows(user):
+    """Miembros por combinación, desde el rollup."""
+    rows = scope_by_department(MemberRollup.objects.filter(count__gt=0), user).order_by(
+        *ROLLUP_FIELDS).values_list(*SUMMARY_COLUMNS)
+    for row in rows.iterator(chunk_size=settings.STATS_EXPORT_CHUNK_SIZE):
+        yield row[:4] + (row[4] or None, row[5])
+
+
+def export_dataset(dataset, user):
+    if dataset == 'summary':
+        return SUMMARY_COLUMNS, summary_rows(user)
+    return MEMBER_COLUMNS, member_rows(user)
+
+
+def stream_csv(columns, rows):
+    """CSV en bloques de ~CSV_BUFFER_SIZE; nunca tiene más que eso en memoria."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CSV_BUFFER_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def parquet_available():
+    return pq is not None
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stream_parquet(columns, rows):
+    """
+    Parquet por grupos de filas de STATS_EXPORT_CHUNK_SIZE. El formato
+    escribe los metadatos al final, así que se arma en un archivo temporal
+    (en memoria hasta cierto tamaño) y después se envía por bloques.
+    """
+    schema = pa.schema([(column, pa.int64() if column in INTEGER_COLUMNS else pa.string())
+                        for column in columns])
+    archivo = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+    try:
+        with pq.ParquetWriter(archivo, schema) as writer:
+            for batch in _batches(rows, settings.STATS_EXPORT_CHUNK_SIZE):
+                writer.write_table(pa.Table.from_pylist(
+                    [dict(zip(columns, row)) for row in batch], schema=schema))
+    except Exception:
+        archivo.close()
+        raise
+    archivo.seek(0)
+    return iterate_file(archivo)
+
+
+def iterate_file(archivo):
+    try:
+        while True:
+            bloque = archivo.read(CSV_BUFFER_SIZE)
+            if not bloque:
+                break
+            yield bloque
+    finally:
+        archivo.close()
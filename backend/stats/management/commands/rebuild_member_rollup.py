@@ -0,0 +1,15 @@
+import time
+from django.core.management.base import BaseCommand
+from stats.cache import bump_stats_version
+from stats.rollup import rebuild_rollup
+
+
+class Command(BaseCommand):
+    help = "Recalcula la tabla de rollup de miembros desde UsuarioComun"
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        filas = rebuild_rollup()
+        bump_stats_version()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rollup reconstruido: {filas} combinaciones ({time.perf_counter() - inicio:.2f} s)"))
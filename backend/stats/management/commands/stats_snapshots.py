@@ -0,0 +1,40 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from stats.snapshots import prune_snapshots, take_snapshot
+
+
+class Command(BaseCommand):
+    help = "Guarda el snapshot diario de estadísticas y depura los antiguos (cron o --loop)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true",
+                            help="Sigue corriendo y repite cada --interval segundos")
+        parser.add_argument("--interval", type=int, default=60 * 60,
+                            help="Segundos entre ejecuciones con --loop (default: 3600)")
+        parser.add_argument("--keep-daily", type=int, default=90,
+                            help="Días con un snapshot por día (default: 90)")
+        parser.add_argument("--keep-weekly", type=int, default=730,
+                            help="Días con un snapshot por semana; después, uno por mes (default: 730)")
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            self.run_once(options)
+            if not options["loop"]:
+                return
+            try:
+                time.sleep(options["interval"])
+            except KeyboardInterrupt:
+                return
+
+    def run_once(self, options):
+        inicio = time.perf_counter()
+        snapshot = take_snapshot()
+        self.stdout.write(self.style.SUCCESS(
+            f"Snapshot {snapshot.snapshot_date}: {snapshot.total_users} miembros "
+            f"({time.perf_counter() - inicio:.2f} s)"))
+        borrados = prune_snapshots(
+            keep_daily=options["keep_daily"], keep_weekly=options["keep_weekly"])
+        if borrados:
+            self.stdout.write(f"Depurados {borrados} snapshots antiguos")
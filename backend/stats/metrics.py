@@ -0,0 +1,187 @@
+from datetime import timedelta
+
+from django.db.models import Count, DateField, Q
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from loguru import logger
+
+from users.models import UsuarioComun
+from .models import Stats
+
+# Mismo criterio que antes: vacío o "desempleado" no cuenta como empleado
+EMPLOYED = ~(Q(registro_empleado__isnull=True) | Q(registro_empleado__exact='') |
+             Q(registro_empleado__exact='desempleado'))
+
+
+def percentage(part, total):
+    return (part / total * 100) if total > 0 else 0
+
+
+class MemberMetrics:
+    """
+    Todos los contadores de miembros a partir de una sola consulta agrupada
+    por departamento y especialidad (con Count(filter=...)). Las métricas
+    actuales, el crecimiento y los snapshots se arman sobre el mismo
+    resultado, así que ninguna vuelve a recorrer UsuarioComun.
+    """
+
+    def __init__(self, today=None, groups=None):
+        self.today = today or timezone.now().date()
+        self.one_year_ago = self.today - timedelta(days=365)
+        if groups is None:
+            groups = UsuarioComun.objects.order_by().values('departamento', 'especialidad').annotate(
+                total=Count('id'),
+                active=Count('id', filter=Q(estado='activo')),
+                employed=Count('id', filter=EMPLOYED),
+                last_year=Count('id', filter=Q(
+                    fecha_inscripcion__lte=self.one_year_ago)),
+            )
+        self.groups = list(groups)
+        self.total_users = sum(g['total'] for g in self.groups)
+        self.employed_users = sum(g['employed'] for g in self.groups)
+        self.users_last_year = sum(g['last_year'] for g in self.groups)
+
+    def _by(self, field, *counters):
+        totals = {}
+        for group in self.groups:
+            row = totals.setdefault(group[field], dict.fromkeys(counters, 0))
+            for counter in counters:
+                row[counter] += group[counter]
+        return sorted(totals.items(), key=lambda item: (-item[1]['total'], item[0]))
+
+    def current(self):
+        employment_rate = percentage(self.employed_users, self.total_users)
+        logger.info(f"Employed users : {self.employed_users}")
+        logger.info(f"Total users : {self.total_users}")
+        return {
+            "total_users": self.total_users,
+            "employed_users": self.employed_users,
+            "employment_rate": round(employment_rate, 2),
+            "specialties_breakdown": [
+                {"especialidad": especialidad, "count": row['total']}
+                for especialidad, row in self._by('especialidad', 'total')
+            ],
+            "state_breakdown": [
+                {"departamento": departamento, "total_count": row['total'],
+                 "active_count": row['active'],
+                 "inactive_count": row['total'] - row['active']}
+                for departamento, row in self._by('departamento', 'total', 'active')
+            ],
+        }
+
+    def growth(self):
+        total_growth = 0
+        if self.users_last_year > 0:
+            total_growth = (self.total_users - self.users_last_year) / \
+                self.users_last_year * 100
+
+        current_rate = percentage(self.employed_users, self.total_users)
+        past_stat = Stats.objects.filter(
+            created_at__lte=timezone.now() - timedelta(days=360)
+        ).order_by('-created_at').first()
+        past_rate = past_stat.employment_rate if past_stat else 0
+        emp_growth = percentage(current_rate - past_rate, past_rate)
+
+        return {
+            "total_users_growth": round(total_growth, 2),
+            "employment_rate_growth": round(emp_growth, 2),
+            "state_growth_breakdown": [
+                {"departamento": departamento, "current_count": row['total'],
+                 "growth_percentage": round(
+                     percentage(row['total'] - row['last_year'], row['last_year']), 2)}
+                for departamento, row in self._by('departamento', 'total', 'last_year')
+            ],
+        }
+
+    def snapshot(self):
+        return {**self.current(), **self.growth()}
+
+
+GRANULARITIES = ('year', 'quarter', 'month')
+BREAKDOWNS = ('departamento', 'especialidad')
+MONTHS_PER_PERIOD = {'year': 12, 'quarter': 3, 'month': 1}
+MAX_HISTORY_PERIODS = 1200
+
+
+def period_start(day, granularity):
+    months = MONTHS_PER_PERIOD[granularity]
+    return day.replace(month=(day.month - 1) // months * months + 1, day=1)
+
+
+def next_period(start, granularity):
+    month = start.month - 1 + MONTHS_PER_PERIOD[granularity]
+    return start.replace(year=start.year + month // 12, month=month % 12 + 1)
+
+
+def period_label(start, granularity):
+    if granularity == 'year':
+        return str(start.year)
+    if granularity == 'quarter':
+        return f"{start.year}-Q{(start.month - 1) // 3 + 1}"
+    return f"{start.year}-{start.month:02d}"
+
+
+def member_history(start, end, granularity='year', breakdown=None):
+    """
+    Altas por periodo y total acumulado al cierre de cada periodo entre
+    `start` y `end` (fechas), con un solo GROUP BY sobre la fecha de
+    inscripción truncada y una suma acumulada en Python. Con `breakdown`
+    cada periodo trae además el detalle por departamento o especialidad.
+    """
+    fields = ['period'] + ([breakdown] if breakdown else [])
+    rows = (
+        UsuarioComun.objects.filter(
+            fecha_inscripcion__isnull=False,
+            fecha_inscripcion__lt=next_period(period_start(end, granularity), granularity))
+        .annotate(period=Trunc('fecha_inscripcion', granularity, output_field=DateField()))
+        .values(*fields).annotate(count=Count('id')).order_by()
+    )
+    return build_history(
+        ((row['period'], row[breakdown] if breakdown else None, row['count']) for row in rows),
+        start, end, granularity, breakdown)
+
+
+def build_history(rows, start, end, granularity, breakdown=None):
+    """
+    rows: (inicio del periodo, grupo o None, altas). Devuelve la serie
+    entre `start` y `end` con el acumulado al cierre de cada periodo.
+    """
+    start = period_start(start, granularity)
+    end = period_start(end, granularity)
+    new = {}
+    cumulative = {}  # acumulado antes de `start`, por grupo (None sin desglose)
+    for period, group, count in rows:
+        if period >= next_period(end, granularity):
+            continue
+        if period < start:
+            cumulative[group] = cumulative.get(group, 0) + count
+        else:
+            counts = new.setdefault(period, {})
+            counts[group] = counts.get(group, 0) + count
+
+    history = []
+    current = start
+    while current <= end:
+        counts = new.get(current, {})
+        for group, count in counts.items():
+            cumulative[group] = cumulative.get(group, 0) + count
+        item = {
+            "year": current.year,
+            "period": period_label(current, granularity),
+            "total_users_cumulative": sum(cumulative.values()),
+            "new_users_count": sum(counts.values()),
+        }
+        if breakdown:
+            item["breakdown"] = [
+                {breakdown: group, "total_users_cumulative": total,
+                 "new_users_count": counts.get(group, 0)}
+                for group, total in sorted(cumulative.items(), key=lambda g: (-g[1], g[0]))
+            ]
+        history.append(item)
+        current = next_period(current, granularity)
+    return history
+
+
+def count_periods(start, end, granularity):
+    months = (end.year - start.year) * 12 + end.month - start.month
+    return months // MONTHS_PER_PERIOD[granularity] + 1
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemberChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('departamento', models.CharField(blank=True, max_length=100)),
+                ('especialidad', models.CharField(blank=True, max_length=100)),
+                ('estado', models.CharField(blank=True, max_length=16)),
+                ('registro_empleado', models.CharField(blank=True, max_length=16)),
+                ('anio', models.IntegerField(blank=True, null=True)),
+                ('delta', models.SmallIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='stats',
+            name='counts',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='stats',
+            name='last_change_id',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='stats',
+            name='snapshot_date',
+            field=models.DateField(blank=True, null=True, unique=True),
+        ),
+    ]
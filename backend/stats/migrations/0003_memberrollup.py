@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:51
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import ExtractYear
+
+
+def llenar_rollup(apps, schema_editor):
+    # Estado inicial; desde aquí lo mantienen las señales
+    UsuarioComun = apps.get_model('users', 'UsuarioComun')
+    MemberRollup = apps.get_model('stats', 'MemberRollup')
+    filas = UsuarioComun.objects.annotate(anio=ExtractYear('fecha_inscripcion')).order_by().values(
+        'departamento', 'especialidad', 'estado', 'registro_empleado', 'anio').annotate(n=Count('id'))
+    MemberRollup.objects.bulk_create([
+        MemberRollup(departamento=f['departamento'], especialidad=f['especialidad'],
+                     estado=f['estado'], registro_empleado=f['registro_empleado'],
+                     anio=f['anio'] or 0, count=f['n'])
+        for f in filas
+    ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats', '0002_memberchange_stats_counts_stats_last_change_id_and_more'),
+        ('users', '0002_alter_usuariocomun_rnic'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemberRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('departamento', models.CharField(blank=True, max_length=100)),
+                ('especialidad', models.CharField(blank=True, max_length=100)),
+                ('estado', models.CharField(blank=True, max_length=16)),
+                ('registro_empleado', models.CharField(blank=True, max_length=16)),
+                ('anio', models.IntegerField(default=0)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('departamento', 'especialidad', 'estado', 'registro_empleado', 'anio'), name='stats_memberrollup_unique')],
+            },
+        ),
+        migrations.RunPython(llenar_rollup, migrations.RunPython.noop),
+    ]
@@ -12,7 +12,52 @@ class Stats(models.Model):
     
     state_growth_breakdown = models.JSONField(default=list) 
 
+    # Solo los snapshots diarios (ver snapshots.py); los que crea un admin
+    # desde la API quedan sin fecha
+    snapshot_date = models.DateField(null=True, blank=True, unique=True)
+    # [departamento, especialidad, estado, registro_empleado, año, cantidad]
+    counts = models.JSONField(default=list)
+    # Último MemberChange incluido en counts
+    last_change_id = models.BigIntegerField(default=0)
+
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"Stats Snapshot - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
\ No newline at end of file
+        return f"Stats Snapshot - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
+
+
+class MemberChange(models.Model):
+    """
+    +1/-1 sobre la combinación de un miembro cada vez que se crea, cambia
+    o se borra. El siguiente snapshot suma estos movimientos al anterior
+    en lugar de volver a contar UsuarioComun.
+    """
+    departamento = models.CharField(max_length=100, blank=True)
+    especialidad = models.CharField(max_length=100, blank=True)
+    estado = models.CharField(max_length=16, blank=True)
+    registro_empleado = models.CharField(max_length=16, blank=True)
+    anio = models.IntegerField(null=True, blank=True)
+    delta = models.SmallIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+
+class MemberRollup(models.Model):
+    """
+    Miembros por combinación, al día: lo mantienen las señales de
+    UsuarioComun y el importador (ver rollup.py). Unos cientos de filas
+    sin importar cuántos miembros haya.
+    """
+    departamento = models.CharField(max_length=100, blank=True)
+    especialidad = models.CharField(max_length=100, blank=True)
+    estado = models.CharField(max_length=16, blank=True)
+    registro_empleado = models.CharField(max_length=16, blank=True)
+    anio = models.IntegerField(default=0)  # 0: sin fecha de inscripción
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['departamento', 'especialidad', 'estado', 'registro_empleado', 'anio'],
+                name='stats_memberrollup_unique'),
+        ]
@@ -0,0 +1,56 @@
+from django.db import connection, transaction
+
+from .models import MemberRollup
+
+ROLLUP_FIELDS = ('departamento', 'especialidad', 'estado', 'registro_empleado', 'anio')
+
+
+def apply_to_rollup(changes):
+    """
+    Suma {clave: delta} a MemberRollup con un solo INSERT ... ON CONFLICT
+    DO UPDATE, así dos transacciones que tocan la misma combinación no se
+    pisan. Las claves son las de snapshots.member_key (año None = sin fecha).
+    """
+    changes = {key: delta for key, delta in changes.items() if delta}
+    if not changes:
+        return
+    table = connection.ops.quote_name(MemberRollup._meta.db_table)
+    columns = ', '.join(connection.ops.quote_name(f) for f in ROLLUP_FIELDS + ('count',))
+    conflict = ', '.join(connection.ops.quote_name(f) for f in ROLLUP_FIELDS)
+    count = connection.ops.quote_name('count')
+    rows = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(changes))
+    params = []
+    for (departamento, especialidad, estado, empleo, anio), delta in changes.items():
+        params += [departamento, especialidad, estado, empleo, anio or 0, delta]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} ({columns}) VALUES {rows} "
+            f"ON CONFLICT ({conflict}) DO UPDATE SET {count} = {table}.{count} + EXCLUDED.{count}",
+            params)
+
+
+def rollup_counts():
+    """{clave: cantidad} desde MemberRollup (el mismo formato que los snapshots)."""
+    return {
+        (departamento, especialidad, estado, empleo, anio or None): n
+        for departamento, especialidad, estado, empleo, anio, n in MemberRollup.objects.filter(
+            count__gt=0).values_list(*ROLLUP_FIELDS, 'count')
+    }
+
+
+def rebuild_rollup():
+    """Recalcula MemberRollup desde UsuarioComun. Devuelve las filas escritas."""
+    from .snapshots import count_members
+
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            # Las señales esperan a que termine y suman sobre el recuento nuevo
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"LOCK TABLE {connection.ops.quote_name(MemberRollup._meta.db_table)} IN EXCLUSIVE MODE")
+        MemberRollup.objects.all().delete()
+        filas = MemberRollup.objects.bulk_create([
+            MemberRollup(count=n, **dict(zip(ROLLUP_FIELDS, key[:4] + (key[4] or 0,))))
+            for key, n in count_members().items()
+        ], batch_size=2000)
+    return len(filas)
@@ -1,7 +1,38 @@
+import datetime
+from django.utils import timezone
 from rest_framework import serializers
+from .export import DATASETS, EXPORT_FORMATS
+from .metrics import BREAKDOWNS, GRANULARITIES, MAX_HISTORY_PERIODS, count_periods
 from .models import Stats
 
 class StatsSerializer(serializers.ModelSerializer):
     class Meta:
         model = Stats
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class HistoryQuerySerializer(serializers.Serializer):
+    # Acepta "1979", "1979-06" o "1979-06-15"
+    start = serializers.DateField(
+        input_formats=['%Y-%m-%d', '%Y-%m', '%Y'], required=False)
+    end = serializers.DateField(
+        input_formats=['%Y-%m-%d', '%Y-%m', '%Y'], required=False)
+    granularity = serializers.ChoiceField(choices=GRANULARITIES, default='year')
+    breakdown = serializers.ChoiceField(choices=BREAKDOWNS, required=False)
+
+    def validate(self, data):
+        # Por defecto, los últimos 5 años como antes
+        data.setdefault('end', timezone.now().date())
+        data.setdefault('start', datetime.date(data['end'].year - 4, 1, 1))
+        if data['start'] > data['end']:
+            raise serializers.ValidationError(
+                {'start': "Debe ser anterior a end."})
+        periods = count_periods(data['start'], data['end'], data['granularity'])
+        if periods > MAX_HISTORY_PERIODS:
+            raise serializers.ValidationError(
+                f"El rango pedido tiene {periods} periodos; el máximo es {MAX_HISTORY_PERIODS}.")
+        return data
+
+class ExportQuerySerializer(serializers.Serializer):
+    dataset = serializers.ChoiceField(choices=DATASETS, default='members')
+    # No "format": DRF lo reserva para elegir el renderer
+    file_format = serializers.ChoiceField(choices=EXPORT_FORMATS, default='csv')
@@ -0,0 +1,59 @@
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+from users.models import UsuarioComun
+from news.models import News
+from jobs.models import Job
+from regulation.models import Regulation
+from utils.versiones import bump_on_commit
+from .cache import STATS_VERSION_KEY
+from .models import Stats
+from .snapshots import MEMBER_FIELDS, log_member_changes, member_key
+
+
+@receiver(post_save, sender=UsuarioComun)
+@receiver(post_delete, sender=UsuarioComun)
+@receiver(post_save, sender=News)
+@receiver(post_delete, sender=News)
+@receiver(post_save, sender=Job)
+@receiver(post_delete, sender=Job)
+@receiver(post_save, sender=Regulation)
+@receiver(post_delete, sender=Regulation)
+@receiver(post_save, sender=Stats)
+@receiver(post_delete, sender=Stats)
+def invalidate_stats(sender, instance, **kwargs):
+    # Las respuestas en cache se refrescan en segundo plano (ver cache.py)
+    # Una sola vez por transacción
+    bump_on_commit(STATS_VERSION_KEY)
+
+
+@receiver(pre_save, sender=UsuarioComun)
+def remember_member_key(sender, instance, update_fields=None, **kwargs):
+    # Combinación anterior, para registrar el movimiento en post_save
+    instance._stats_key = None
+    if instance._state.adding:
+        return
+    if update_fields is not None and not set(update_fields) & set(MEMBER_FIELDS):
+        # p. ej. last_login: no cambia nada que cuente en las estadísticas
+        instance._stats_key = False
+        return
+    anterior = UsuarioComun.objects.filter(pk=instance.pk).only(*MEMBER_FIELDS).first()
+    if anterior is not None:
+        instance._stats_key = member_key(anterior)
+
+
+@receiver(post_save, sender=UsuarioComun)
+def log_member_save(sender, instance, **kwargs):
+    anterior = getattr(instance, '_stats_key', None)
+    if anterior is False:
+        return
+    actual = member_key(instance)
+    if anterior == actual:
+        return
+    if anterior is not None:
+        log_member_changes([anterior], -1)
+    log_member_changes([actual], 1)
+
+
+@receiver(post_delete, sender=UsuarioComun)
+def log_member_delete(sender, instance, **kwargs):
+    log_member_changes([member_key(instance)], -1)
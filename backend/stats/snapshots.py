@@ -0,0 +1,204 @@
+import datetime
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import ExtractYear
+from django.utils import timezone
+
+from users.models import UsuarioComun
+from .metrics import MemberMetrics, build_history, percentage
+from .models import MemberChange, Stats
+from .rollup import apply_to_rollup, rollup_counts
+
+KEY_FIELDS = ('departamento', 'especialidad', 'estado', 'registro_empleado', 'anio')
+# Campos de UsuarioComun que definen la combinación
+MEMBER_FIELDS = ('departamento', 'especialidad', 'estado', 'registro_empleado', 'fecha_inscripcion')
+GROWTH_FIELDS = ('total_users_growth', 'employment_rate_growth', 'state_growth_breakdown')
+
+
+def member_key(usuario):
+    fecha = UsuarioComun._meta.get_field(
+        'fecha_inscripcion').to_python(usuario.fecha_inscripcion)
+    return (usuario.departamento or '', usuario.especialidad or '', usuario.estado or '',
+            usuario.registro_empleado or '', fecha.year if fecha else None)
+
+
+def log_member_changes(keys, delta):
+    """
+    Registra un movimiento por cada clave (ver MemberChange) y lo suma al
+    rollup, en la transacción de quien llama: ambos quedan siempre de
+    acuerdo con UsuarioComun.
+    """
+    MemberChange.objects.bulk_create(
+        [MemberChange(delta=delta, **dict(zip(KEY_FIELDS, key))) for key in keys],
+        batch_size=2000)
+    changes = {}
+    for key in keys:
+        changes[key] = changes.get(key, 0) + delta
+    apply_to_rollup(changes)
+
+
+def count_members():
+    # Recuento completo; solo para el primer snapshot
+    rows = UsuarioComun.objects.annotate(anio=ExtractYear('fecha_inscripcion')).order_by().values(
+        'departamento', 'especialidad', 'estado', 'registro_empleado', 'anio').annotate(n=Count('id'))
+    return {tuple(row[f] for f in KEY_FIELDS): row['n'] for row in rows}
+
+
+def pending_changes(after_id):
+    """Movimientos posteriores a `after_id`, sumados por combinación."""
+    changes = MemberChange.objects.filter(id__gt=after_id)
+    last_id = changes.aggregate(last=Max('id'))['last'] or after_id
+    rows = changes.filter(id__lte=last_id).order_by().values(*KEY_FIELDS).annotate(n=Sum('delta'))
+    return {tuple(row[f] for f in KEY_FIELDS): row['n'] for row in rows}, last_id
+
+
+def apply_changes(counts, changes):
+    counts = dict(counts)
+    for key, n in changes.items():
+        counts[key] = counts.get(key, 0) + n
+    return {key: n for key, n in counts.items() if n}
+
+
+def decode_counts(rows):
+    return {tuple(row[:-1]): row[-1] for row in rows}
+
+
+def encode_counts(counts):
+    return [list(key) + [n] for key, n in sorted(
+        counts.items(), key=lambda item: tuple('' if v is None else str(v) for v in item[0]))]
+
+
+def latest_snapshot():
+    return Stats.objects.filter(snapshot_date__isnull=False).order_by('-snapshot_date').first()
+
+
+def current_counts():
+    # Combinaciones de miembros al día (ver rollup.py)
+    return rollup_counts()
+
+
+def enrolled_by(anio, n, one_year_ago):
+    """
+    Cuántos de los `n` inscritos en `anio` ya lo estaban en `one_year_ago`.
+    Las combinaciones solo guardan el año, así que en el año de corte se
+    reparte en proporción a los días transcurridos.
+    """
+    if anio is None or anio > one_year_ago.year:
+        return 0
+    if anio < one_year_ago.year:
+        return n
+    days = (datetime.date(anio + 1, 1, 1) - datetime.date(anio, 1, 1)).days
+    return n * one_year_ago.timetuple().tm_yday / days
+
+
+def metrics_from_counts(counts, today=None):
+    # Los mismos grupos que consulta MemberMetrics, sin tocar UsuarioComun
+    today = today or timezone.now().date()
+    one_year_ago = today - timedelta(days=365)
+    groups = {}
+    for (departamento, especialidad, estado, empleo, anio), n in counts.items():
+        group = groups.setdefault((departamento, especialidad), {
+            'departamento': departamento, 'especialidad': especialidad,
+            'total': 0, 'active': 0, 'employed': 0, 'last_year': 0})
+        group['total'] += n
+        if estado == 'activo':
+            group['active'] += n
+        if empleo not in ('', 'desempleado'):
+            group['employed'] += n
+        group['last_year'] += enrolled_by(anio, n, one_year_ago)
+    return MemberMetrics(today=today, groups=groups.values())
+
+
+def history_from_counts(counts, start, end, breakdown=None):
+    """Historial anual (ver build_history) a partir de las combinaciones."""
+    index = KEY_FIELDS.index(breakdown) if breakdown else None
+    rows = [(datetime.date(key[4], 1, 1), key[index] if breakdown else None, n)
+            for key, n in counts.items() if key[4] is not None]
+    return build_history(rows, start, end, 'year', breakdown)
+
+
+def snapshot_growth(snapshot, day):
+    """
+    Crecimiento contra el snapshot de hace un año. Si todavía no hay uno
+    tan antiguo, el cálculo de siempre sobre las fechas de inscripción.
+    """
+    past = Stats.objects.filter(
+        snapshot_date__lte=day - timedelta(days=365)).order_by('-snapshot_date').first()
+    if past is None:
+        return MemberMetrics(today=day).growth()
+
+    past_states = {row['departamento']: row['total_count'] for row in past.state_breakdown}
+    return {
+        "total_users_growth": round(percentage(
+            snapshot['total_users'] - past.total_users, past.total_users), 2),
+        "employment_rate_growth": round(percentage(
+            snapshot['employment_rate'] - past.employment_rate, past.employment_rate), 2),
+        "state_growth_breakdown": [
+            {"departamento": row['departamento'], "current_count": row['total_count'],
+             "growth_percentage": round(percentage(
+                 row['total_count'] - past_states.get(row['departamento'], 0),
+                 past_states.get(row['departamento'], 0)), 2)}
+            for row in snapshot['state_breakdown']
+        ],
+    }
+
+
+def take_snapshot(day=None):
+    """
+    Snapshot del día (lo reemplaza si ya existe): el anterior más los
+    movimientos registrados desde entonces.
+    """
+    day = day or timezone.now().date()
+    outermost = not transaction.get_connection().in_atomic_block
+    with transaction.atomic():
+        if outermost and connection.vendor == 'postgresql':
+            # Recuento y último movimiento vistos en el mismo instante
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+
+        previous = latest_snapshot()
+        if previous is None:
+            last_id = MemberChange.objects.aggregate(last=Max('id'))['last'] or 0
+            counts = count_members()
+        else:
+            changes, last_id = pending_changes(previous.last_change_id)
+            counts = apply_changes(decode_counts(previous.counts), changes)
+
+        data = metrics_from_counts(counts, today=day).current()
+        data.update(snapshot_growth(data, day))
+        snapshot, _ = Stats.objects.update_or_create(
+            snapshot_date=day,
+            defaults={**data, 'counts': encode_counts(counts), 'last_change_id': last_id})
+    return snapshot
+
+
+def prune_snapshots(today=None, keep_daily=90, keep_weekly=730):
+    """
+    Conserva todos los snapshots de los últimos `keep_daily` días, uno por
+    semana hasta `keep_weekly` días y uno por mes después (el más reciente
+    de cada periodo). Borra también los movimientos ya incluidos en el
+    último snapshot.
+    """
+    today = today or timezone.now().date()
+    keep = set()
+    seen = set()
+    for snapshot_id, day in Stats.objects.filter(snapshot_date__isnull=False).order_by(
+            '-snapshot_date').values_list('id', 'snapshot_date'):
+        age = (today - day).days
+        if age < keep_daily:
+            bucket = ('day', day)
+        elif age < keep_weekly:
+            bucket = ('week',) + tuple(day.isocalendar()[:2])
+        else:
+            bucket = ('month', day.year, day.month)
+        if bucket not in seen:
+            seen.add(bucket)
+            keep.add(snapshot_id)
+
+    deleted, _ = Stats.objects.filter(snapshot_date__isnull=False).exclude(id__in=keep).delete()
+    latest = latest_snapshot()
+    if latest is not None:
+        MemberChange.objects.filter(id__lte=latest.last_change_id).delete()
+    return deleted
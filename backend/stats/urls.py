@@ -5,7 +5,8 @@ from .views import (
     UserStatisticsView, 
     UserGrowthView,
     OverallStatsView,
-    UserHistoryView
+    UserHistoryView,
+    StatsExportView
 )
 
 router = DefaultRouter()
@@ -16,5 +17,6 @@ urlpatterns = [
     path('growth/', UserGrowthView.as_view(), name='user_growth'),
     path('overall/', OverallStatsView.as_view(), name='general_stats'),
     path('history/', UserHistoryView.as_view(), name='user_history'),
+    path('export/', StatsExportView.as_view(), name='stats_export'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -3,20 +3,23 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAdminUser
 
+from .cache import cached_stats
+from .export import export_dataset, parquet_available, stream_csv, stream_parquet
+from .metrics import MemberMetrics, member_history
 from .models import Stats
-from .serializers import StatsSerializer
+from .serializers import ExportQuerySerializer, HistoryQuerySerializer, StatsSerializer
+from .snapshots import GROWTH_FIELDS, current_counts, history_from_counts, latest_snapshot, metrics_from_counts
 
 from users.models import UsuarioComun
+from users.permissions import IsAdminPrin, IsAdminSec
 from news.models import News
 from jobs.models import Job
 from regulation.models import Regulation
 
-from django.db.models import Count, Q, Case, When, IntegerField, F
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from datetime import timedelta
 
 from loguru import logger
-import datetime
 import sys
 
 logger.add(sys.stderr, level="DEBUG")
@@ -25,124 +28,34 @@ class StatsViewSet(viewsets.ModelViewSet):
     queryset = Stats.objects.all()
     serializer_class = StatsSerializer
 
-def calculate_current_metrics():
-    total_users = UsuarioComun.objects.count()
-    
-    specialties_data = list(UsuarioComun.objects.values('especialidad').annotate(
-        count=Count('id')
-    ).order_by('-count'))
-
-    state_data = UsuarioComun.objects.values('departamento').annotate(
-        total_count=Count('id'),
-        active_count=Count(Case(
-            When(estado='activo', then=1), 
-            output_field=IntegerField()
-        ))
-    ).annotate(
-        inactive_count=F('total_count') - F('active_count')
-    ).order_by('-total_count')
-    
-    state_data = list(state_data)
-
-    employed_users = UsuarioComun.objects.exclude(
-        Q(registro_empleado__isnull=True) | Q(registro_empleado__exact='') | Q(registro_empleado__exact='desempleado')
-    ).count()
-
-    employment_rate = 0
-    if total_users > 0:
-        employment_rate = (employed_users / total_users) * 100
-
-    logger.info(f"Employed users : {employed_users}")
-    logger.info(f"Total users : {total_users}")
-
-    return {
-        "total_users": total_users,
-        "employed_users": employed_users,
-        "employment_rate": round(employment_rate, 2),
-        "specialties_breakdown": specialties_data,
-        "state_breakdown": state_data,
-    }
+def calculate_current_metrics(metrics=None):
+    # Por defecto desde el rollup: unos cientos de filas, no todo UsuarioComun
+    return (metrics or metrics_from_counts(current_counts())).current()
 
-def calculate_growth_metrics():
-    today = timezone.now().date()
-    one_year_ago = today - timedelta(days=365)
-    
-    current_total = UsuarioComun.objects.count()
-    
-    users_last_year = UsuarioComun.objects.filter(fecha_inscripcion__lte=one_year_ago).count()
-    total_growth = 0
-    if users_last_year > 0:
-        total_growth = ((current_total - users_last_year) / users_last_year) * 100
-
-    current_employed = UsuarioComun.objects.exclude(
-        Q(registro_empleado__isnull=True) | Q(registro_empleado__exact='') | Q(registro_empleado__exact='desempleado')
-    ).count()
-    
-    current_rate = (current_employed / current_total * 100) if current_total > 0 else 0
+def calculate_growth_metrics(metrics=None):
+    return (metrics or MemberMetrics()).growth()
 
-    past_stat = Stats.objects.filter(
-        created_at__lte=timezone.now() - timedelta(days=360)
-    ).order_by('-created_at').first()
+def calculate_snapshot_growth():
+    # Calculado por el scheduler (ver snapshots.py); en vivo si aún no corrió
+    snapshot = latest_snapshot()
+    if snapshot is None:
+        return calculate_growth_metrics()
+    return {field: getattr(snapshot, field) for field in GROWTH_FIELDS}
 
-    past_rate = past_stat.employment_rate if past_stat else 0
-    
-    emp_growth = 0
-    if past_rate > 0:
-        emp_growth = ((current_rate - past_rate) / past_rate) * 100
-
-    state_growth_qs = UsuarioComun.objects.values('departamento').annotate(
-        current_count=Count('id'),
-        last_year_count=Count(
-            Case(
-                When(fecha_inscripcion__lte=one_year_ago, then=1),
-                output_field=IntegerField()
-            )
-        )
-    )
-
-    state_growth_data = []
-    for item in state_growth_qs:
-        past = item['last_year_count']
-        current = item['current_count']
-        growth = ((current - past) / past * 100) if past > 0 else 0
-        
-        state_growth_data.append({
-            "departamento": item['departamento'],
-            "current_count": current,
-            "growth_percentage": round(growth, 2)
-        })
+def calculate_history(start, end, granularity='year', breakdown=None):
+    # Por año alcanza con el último snapshot más los movimientos pendientes
+    if granularity == 'year':
+        return history_from_counts(current_counts(), start, end, breakdown)
+    return member_history(start, end, granularity, breakdown)
 
+def calculate_overall():
     return {
-        "total_users_growth": round(total_growth, 2),
-        "employment_rate_growth": round(emp_growth, 2),
-        "state_growth_breakdown": state_growth_data
+        "total_users": UsuarioComun.objects.count(),
+        "total_news": News.objects.count(),
+        "total_jobs": Job.objects.count(),
+        "total_rulebooks": Regulation.objects.count(),
     }
 
-def calculate_historic(years: int):
-    today = timezone.now().date()
-    current_year = today.year
-    history_data = []
-
-    for i in range(years):
-        target_year = current_year - i
-        end_of_year = datetime.date(target_year, 12, 31)
-
-        total_at_year_end = UsuarioComun.objects.filter(
-            fecha_inscripcion__lte=end_of_year
-        ).count()
-
-        new_users_in_year = UsuarioComun.objects.filter(
-            fecha_inscripcion__year=target_year
-        ).count()
-
-        history_data.append({
-            "year": target_year,
-            "total_users_cumulative": total_at_year_end,
-            "new_users_count": new_users_in_year
-        })
-
-    return history_data[::-1]
-
 class UserStatisticsView(APIView):
     def get_permissions(self):
         if self.request.method == 'POST':
@@ -150,14 +63,12 @@ class UserStatisticsView(APIView):
         return [AllowAny()]
 
     def get(self, request):
-        data = calculate_current_metrics()
+        data = cached_stats('current', calculate_current_metrics)
         return Response(data)
 
     def post(self, request):
-        current_data = calculate_current_metrics()
-        growth_data = calculate_growth_metrics()
-
-        full_data = {**current_data, **growth_data}
+        # Una sola consulta agrupada para las métricas actuales y el crecimiento
+        full_data = MemberMetrics().snapshot()
 
         stat_instance = Stats.objects.create(
             total_users=full_data['total_users'],
@@ -177,24 +88,51 @@ class OverallStatsView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request):
-        data = {
-            "total_users": UsuarioComun.objects.count(),
-            "total_news": News.objects.count(),
-            "total_jobs": Job.objects.count(),
-            "total_rulebooks": Regulation.objects.count(),
-        }
+        data = cached_stats('overall', calculate_overall)
         return Response(data)
 
 class UserGrowthView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request):
-        data = calculate_growth_metrics()
+        data = cached_stats('growth', calculate_snapshot_growth)
         return Response(data)
     
 class UserHistoryView(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request):
-        data = calculate_historic(years=5)
-        return Response(data)
\ No newline at end of file
+        # ?start=1979&end=2025-06&granularity=quarter&breakdown=departamento
+        params = HistoryQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        data = cached_stats(
+            'history', lambda: calculate_history(**params.validated_data),
+            params.validated_data)
+        return Response(data)
+
+class StatsExportView(APIView):
+    # Superusuario: todo; admin_ciudad: solo su departamento
+    permission_classes = [IsAdminPrin | IsAdminSec]
+
+    def get(self, request):
+        # ?dataset=members|summary&file_format=csv|parquet
+        params = ExportQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        dataset = params.validated_data['dataset']
+        file_format = params.validated_data['file_format']
+
+        columns, rows = export_dataset(dataset, request.user)
+        if file_format == 'parquet':
+            if not parquet_available():
+                return Response(
+                    {"error": "La exportación a Parquet requiere pyarrow en el servidor."},
+                    status=501)
+            response = StreamingHttpResponse(
+                stream_parquet(columns, rows), content_type='application/vnd.apache.parquet')
+        else:
+            response = StreamingHttpResponse(
+                stream_csv(columns, rows), content_type='text/csv; charset=utf-8')
+
+        filename = f"{dataset}_{timezone.now().date().isoformat()}.{file_format}"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
@@ -1,30 +1,38 @@
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from .models import UsuarioAdmin, UsuarioComun
+from .user_cache import get_cached_user
 from rest_framework.exceptions import AuthenticationFailed
 
+# El claim `rol` ya dice en qué tabla está el usuario
+MODELOS_POR_ROL = {
+    'admin_ciudad': (UsuarioAdmin, "Usuario Admin no encontrado."),
+    'admin_general': (UsuarioAdmin, "Usuario Admin no encontrado."),
+    'Usuario': (UsuarioComun, "Usuario Comun no encontrado."),
+}
+
 
 class MultiModelJWTAuthentication(JWTAuthentication):
     def get_user(self, validadted_token):
-        # Buscar primero en UsuarioAdmin
         try:
             user_id = validadted_token['user_id']
             rol = validadted_token.get('rol', None)
-        except UsuarioAdmin.DoesNotExist:
+        except KeyError:
             raise AuthenticationFailed("Usuario no encontrado.")
 
-        if rol == 'admin_ciudad' or rol == 'admin_general':
-            try:
-                return UsuarioAdmin.objects.get(id=user_id)
-            except UsuarioAdmin.DoesNotExist:
-                raise AuthenticationFailed("Usuario Admin no encontrado.")
-        elif rol == 'Usuario':
-            try:
-                return UsuarioComun.objects.get(id=user_id)
-            except UsuarioComun.DoesNotExist:
-                raise AuthenticationFailed("Usuario Comun no encontrado.")
-        else:
+        if rol not in MODELOS_POR_ROL:
             return super().get_user(validadted_token)
 
+        modelo, mensaje = MODELOS_POR_ROL[rol]
+
+        def cargar():
+            try:
+                return modelo.objects.get(id=user_id)
+            except modelo.DoesNotExist:
+                raise AuthenticationFailed(mensaje)
+
+        # Sin consulta mientras el usuario siga en el cache (ver user_cache.py)
+        user = get_cached_user(modelo._meta.label_lower, user_id,
+                               validadted_token.get('iat'), cargar)
         if not user.is_active:
             raise AuthenticationFailed("Usuario inactivo.")
         return user
@@ -4,6 +4,8 @@ from django.db import close_old_connections, transaction, connection
 from django.core.management.base import BaseCommand
 from django.contrib.auth.hashers import make_password
 from users.models import UsuarioComun, generate_unique_rnic
+from stats.cache import bump_stats_version
+from stats.snapshots import log_member_changes, member_key
 from datetime import datetime, time
 
 
@@ -97,6 +99,8 @@ class Command(BaseCommand):
                     f"Éxito: Se crearon {total_creados} registros en total."))
 
         if total_creados > 0:
+            # bulk_create no dispara señales
+            bump_stats_version()
             self.stdout.write(self.style.SUCCESS(
                 f"Importación finalizada: Se crearon {total_creados} nuevos usuarios."))
         else:
@@ -112,6 +116,9 @@ class Command(BaseCommand):
                 close_old_connections()
                 with transaction.atomic():
                     UsuarioComun.objects.bulk_create(lista_usuarios)
+                    # Movimientos y rollup de estadísticas (bulk_create no dispara señales)
+                    log_member_changes(
+                        [member_key(u) for u in lista_usuarios], 1)
                 connection.queries_log.clear()  # Limpiar el log de consultas para liberar memoria
                 return  # Salir si la inserción fue exitosa
             except Exception as e:
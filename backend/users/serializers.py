@@ -7,27 +7,28 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth.hashers import make_password
 
 
-class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
-    def validate(self, attrs):
-        username = attrs.get("username")
-        password = attrs.get("password")
-        user = None
+def resolver_login(username, password):
+    """
+    Usuario con esas credenciales o None. Un RNIC (solo dígitos) se busca
+    en UsuarioComun y cualquier otro nombre en UsuarioAdmin: una consulta y
+    un solo hash. Si no existe se calcula igual un hash para que la
+    respuesta tarde lo mismo y no delate qué usuarios existen.
+    """
+    username = str(username or "").strip()
+    if username.isascii() and username.isdigit():
+        user = UsuarioComun.objects.filter(rnic=int(username)).first()
+    else:
+        user = UsuarioAdmin.objects.filter(username=username).first()
+
+    if user is None:
+        make_password(password)
+        return None
+    return user if user.check_password(password) else None
 
-        try:
-            admin = UsuarioAdmin.objects.get(username=username)
-            if admin.check_password(password):
-                user = admin
-        except UsuarioAdmin.DoesNotExist:
-            pass
-
-        if user is None:
-            try:
-                comun = UsuarioComun.objects.get(rnic=username)
-                if comun.check_password(password):
-                    user = comun
-            except UsuarioComun.DoesNotExist:
-                pass
 
+class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
+    def validate(self, attrs):
+        user = resolver_login(attrs.get("username"), attrs.get("password"))
         if user is None:
             raise serializers.ValidationError(
                 {"detail": "Usuario o contraseña incorrectos"})
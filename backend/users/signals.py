@@ -1,9 +1,19 @@
-from django.db.models.signals import post_migrate
+from django.db.models.signals import post_delete, post_migrate, post_save
 from django.contrib.auth.models import Group
 from django.dispatch import receiver
+from .models import UsuarioAdmin, UsuarioComun
+from .user_cache import invalidate_user
 
 @receiver(post_migrate)
 def create_default_groups(sender, **kwargs):
     groups = ["Administrador principal", "Administrador secundario", "Usuario", "Publico"]
     for group_name in groups:
-        Group.objects.get_or_create(name=group_name)
\ No newline at end of file
+        Group.objects.get_or_create(name=group_name)
+
+@receiver(post_save, sender=UsuarioAdmin)
+@receiver(post_save, sender=UsuarioComun)
+@receiver(post_delete, sender=UsuarioAdmin)
+@receiver(post_delete, sender=UsuarioComun)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # Datos, rol o is_active pueden haber cambiado: el próximo request lo vuelve a leer
+    invalidate_user(sender._meta.label_lower, instance.pk)
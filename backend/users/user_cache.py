@@ -0,0 +1,85 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from utils.versiones import bump_version, ejecutar_tras_commit, get_version
+
+
+def user_version_key(modelo, user_id):
+    return f'jwt_user_version:{modelo}:{user_id}'
+
+
+class UsuariosRecientes:
+    """LRU por proceso de usuarios ya cargados, con vencimiento por entrada."""
+
+    def __init__(self):
+        self.entradas = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, clave):
+        with self.lock:
+            entrada = self.entradas.get(clave)
+            if entrada is None:
+                return None
+            if time.monotonic() >= entrada[0]:
+                del self.entradas[clave]
+                return None
+            self.entradas.move_to_end(clave)
+            return entrada[1]
+
+    def set(self, clave, usuario):
+        with self.lock:
+            self.entradas[clave] = (
+                time.monotonic() + settings.JWT_USER_CACHE_TTL, usuario)
+            self.entradas.move_to_end(clave)
+            while len(self.entradas) > settings.JWT_USER_CACHE_SIZE:
+                self.entradas.popitem(last=False)
+
+    def descartar(self, modelo, user_id):
+        with self.lock:
+            for clave in [c for c in self.entradas if c[:2] == (modelo, user_id)]:
+                del self.entradas[clave]
+
+
+_recientes = UsuariosRecientes()
+
+
+def get_cached_user(modelo, user_id, iat, cargar):
+    """
+    Usuario del token sin consultar la base mientras siga en el cache. La
+    clave incluye el `iat` del token y la versión del usuario, que sube
+    cada vez que se guarda o se borra su fila (ver signals.py). `cargar()`
+    lo busca en la base si no está. La versión se lee de CACHES, así que
+    solo invalida a todos los workers si ese cache es compartido (Redis,
+    Memcached); con LocMemCache los demás esperan a JWT_USER_CACHE_TTL.
+    """
+    if settings.JWT_USER_CACHE_TTL <= 0:
+        return cargar()
+
+    clave = (modelo, user_id, iat, get_version(user_version_key(modelo, user_id)))
+    usuario = _recientes.get(clave)
+    if usuario is None and settings.JWT_USER_CACHE_SHARED:
+        usuario = cache.get('jwt_user:{}:{}:{}:{}'.format(*clave))
+        if usuario is not None:
+            _recientes.set(clave, usuario)
+    if usuario is None:
+        usuario = cargar()
+        _recientes.set(clave, usuario)
+        if settings.JWT_USER_CACHE_SHARED:
+            cache.set('jwt_user:{}:{}:{}:{}'.format(*clave), usuario,
+                      timeout=settings.JWT_USER_CACHE_TTL)
+    # Cada petición recibe su copia: si una vista modifica request.user no
+    # afecta a las demás
+    return copy.copy(usuario)
+
+
+def invalidate_user(modelo, user_id):
+    """Descarta al usuario de los caches cuando se confirma la transacción."""
+    def run():
+        bump_version(user_version_key(modelo, user_id))
+        _recientes.descartar(modelo, user_id)
+    ejecutar_tras_commit(user_version_key(modelo, user_id), run)
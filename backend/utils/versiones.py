@@ -0,0 +1,67 @@
+import threading
+import time
+from django.core.cache import cache
+from django.db import transaction
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # Partimos de un timestamp para no reutilizar versiones si el
+        # cache se vacía
+        version = time.time_ns()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_version(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = time.time_ns()
+        cache.set(key, version, timeout=None)
+        # Callbacks programados por conexión y clave, que aún no se ejecutaron
+_pendientes = threading.local()
+
+
+def _pendientes_de(alias):
+    if not hasattr(_pendientes, alias):
+        setattr(_pendientes, alias, {})
+    return getattr(_pendientes, alias)
+
+
+def ejecutar_tras_commit(clave, funcion):
+    """
+    Ejecuta funcion() tras el commit una sola vez por clave aunque se
+    guarden cientos de filas en la transacción. Devuelve el callback
+    programado (o el que ya estaba).
+
+    Cada llamada deja en on_commit un disparador liviano; el primero que
+    corre saca el callback de los pendientes y lo ejecuta, los demás no
+    hacen nada. Si un savepoint se revierte, Django descarta sus
+    disparadores pero sobreviven los de llamadas posteriores. Si se
+    revierte toda la transacción, el callback queda pendiente y la próxima
+    llamada con la misma clave lo vuelve a disparar.
+    """
+    alias = transaction.get_connection().alias
+    pendientes = _pendientes_de(alias)
+    run = pendientes.get(clave)
+    if run is None:
+        def run():
+            funcion()
+        pendientes[clave] = run
+
+    def disparar():
+        if pendientes.get(clave) is run:
+            del pendientes[clave]
+            run()
+    transaction.on_commit(disparar, using=alias)
+    return run
+
+
+    return run
+
+
+def bump_on_commit(key):
+    ejecutar_tras_commit(key, lambda: bump_version(key))